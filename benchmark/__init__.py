@@ -0,0 +1,4 @@
+"""
+Offline crawl benchmark: a local mock Douyin site (mock_site) and a runner
+(run_benchmark) that crawls it under several crawler configurations.
+"""
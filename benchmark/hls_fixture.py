@@ -0,0 +1,98 @@
+import os
+import sys
+import argparse
+import tempfile
+import threading
+from functools import partial
+from http.server import ThreadingHTTPServer, SimpleHTTPRequestHandler
+
+# Variants written by build_fixture: (directory, bandwidth, resolution)
+VARIANTS = [("low", 400000, "640x360"), ("high", 1200000, "1280x720")]
+KEY = bytes(range(16))
+
+def segment_bytes(variant, n, size):
+    """Deterministic payload for one segment (distinct per variant and index)"""
+    pattern = f"{variant}-{n:04d}|".encode()
+    return (pattern * (size // len(pattern) + 1))[:size]
+
+def expected_bytes(variant, segments, segment_size):
+    return b''.join(segment_bytes(variant, n, segment_size) for n in range(segments))
+
+def encrypt_aes128(data, key, iv):
+    from Crypto.Cipher import AES
+    pad = 16 - len(data) % 16
+    return AES.new(key, AES.MODE_CBC, iv).encrypt(data + bytes([pad]) * pad)
+
+def build_fixture(directory, segments=8, segment_size=64 * 1024, encrypted=False, media_sequence=0):
+    """
+    Write a static HLS tree: master.m3u8 -> <variant>/index.m3u8 -> seg*.ts.
+    With encrypted, segments are AES-128 encrypted with key.bin; the first
+    half carries an explicit IV, the second half uses the media sequence.
+    """
+    lines = ["#EXTM3U"]
+    for name, bandwidth, resolution in VARIANTS:
+        lines.append(f"#EXT-X-STREAM-INF:BANDWIDTH={bandwidth},RESOLUTION={resolution},CODECS=\"avc1.64001f,mp4a.40.2\"")
+        lines.append(f"{name}/index.m3u8")
+    with open(os.path.join(directory, "master.m3u8"), "w") as f:
+        f.write("\n".join(lines) + "\n")
+    if encrypted:
+        with open(os.path.join(directory, "key.bin"), "wb") as f:
+            f.write(KEY)
+
+    for name, _, _ in VARIANTS:
+        variant_dir = os.path.join(directory, name)
+        os.makedirs(variant_dir, exist_ok=True)
+        lines = ["#EXTM3U", "#EXT-X-VERSION:3", "#EXT-X-TARGETDURATION:2", f"#EXT-X-MEDIA-SEQUENCE:{media_sequence}"]
+        for n in range(segments):
+            data = segment_bytes(name, n, segment_size)
+            if encrypted:
+                if n < segments // 2:
+                    iv = bytes([n]) * 16
+                    lines.append(f"#EXT-X-KEY:METHOD=AES-128,URI=\"../key.bin\",IV=0x{iv.hex()}")
+                else:
+                    if n == segments // 2:
+                        lines.append("#EXT-X-KEY:METHOD=AES-128,URI=\"../key.bin\"")
+                    iv = (media_sequence + n).to_bytes(16, 'big')
+                data = encrypt_aes128(data, KEY, iv)
+            with open(os.path.join(variant_dir, f"seg{n:04d}.ts"), "wb") as f:
+                f.write(data)
+            lines.append("#EXTINF:2.000,")
+            lines.append(f"seg{n:04d}.ts")
+        lines.append("#EXT-X-ENDLIST")
+        with open(os.path.join(variant_dir, "index.m3u8"), "w") as f:
+            f.write("\n".join(lines) + "\n")
+
+class QuietHandler(SimpleHTTPRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+def serve(directory):
+    """Serve directory on a free localhost port; returns (server, base_url)"""
+    server = ThreadingHTTPServer(("127.0.0.1", 0), partial(QuietHandler, directory=directory))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}"
+
+def main():
+    parser = argparse.ArgumentParser(description="Download a local static HLS fixture with hls_downloader and verify it")
+    parser.add_argument("--segments", type=int, default=8)
+    parser.add_argument("--segment-size", type=int, default=64 * 1024)
+    parser.add_argument("--encrypted", action="store_true", help="AES-128 segments (needs pycryptodome)")
+    args = parser.parse_args()
+
+    from hls_downloader import download_hls
+
+    with tempfile.TemporaryDirectory(prefix="hls_fixture_") as directory:
+        build_fixture(directory, args.segments, args.segment_size, args.encrypted, media_sequence=5)
+        server, base_url = serve(directory)
+        output_path = os.path.join(directory, "out.ts")
+        try:
+            download_hls(f"{base_url}/master.m3u8", output_path)
+        finally:
+            server.shutdown()
+        with open(output_path, "rb") as f:
+            ok = f.read() == expected_bytes("high", args.segments, args.segment_size)
+    print("✅ HLS fixture matches" if ok else "❌ HLS output differs from the fixture")
+    sys.exit(0 if ok else 1)
+
+if __name__ == "__main__":
+    main()
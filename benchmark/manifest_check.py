@@ -0,0 +1,111 @@
+import os
+import sys
+import json
+import threading
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+import requests
+
+FIXTURE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures", "manifest")
+
+# API path -> recorded payload (trimmed responses of the web player's JSON calls)
+ROUTES = {
+    "/aweme/v1/web/aweme/detail/": "aweme_detail.json",
+    "/aweme/v1/web/mix/aweme/": "mix_aweme.json",
+    "/aweme/v1/web/aweme/related/": "aweme_related.json",
+}
+
+MIX_ID = "7301234567890123456"
+OTHER_MIX_ID = "7309876543210987654"
+
+class FixtureHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        path = self.path.split("?")[0]
+        if path == "/aweme/v1/web/comment/list/":
+            # Matches no marker: must be ignored
+            body, content_type = b'{"comments": []}', "application/json"
+        elif path == "/aweme/v1/web/mix/aweme/html/":
+            body, content_type = b"<html></html>", "text/html"
+        elif path in ROUTES:
+            with open(os.path.join(FIXTURE_DIR, ROUTES[path]), "rb") as f:
+                body = f.read()
+            content_type = "application/json; charset=utf-8"
+        else:
+            self.send_error(404)
+            return
+        self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+def serve():
+    """Stub API server on a free localhost port; returns (server, base_url)"""
+    server = ThreadingHTTPServer(("127.0.0.1", 0), FixtureHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}"
+
+class FixtureResponse:
+    """The parts of a Playwright Response that ManifestHarvester.on_response uses"""
+    def __init__(self, response):
+        self.url = response.url
+        self.status = response.status_code
+        self.headers = {k.lower(): v for k, v in response.headers.items()}
+        self.body = response.content
+
+    def json(self):
+        return json.loads(self.body)
+
+def run_checks(base_url):
+    """Feed the stub's responses to a ManifestHarvester; returns [(name, ok)]"""
+    from manifest_harvester import ManifestHarvester
+
+    harvester = ManifestHarvester()
+    fetch = lambda path: FixtureResponse(requests.get(base_url + path, timeout=10))
+    checks = []
+
+    added = harvester.on_response(fetch("/aweme/v1/web/comment/list/?aweme_id=1"))
+    added += harvester.on_response(fetch("/aweme/v1/web/mix/aweme/html/"))
+    checks.append(("non-API and non-JSON responses are ignored", added == 0))
+
+    added = harvester.on_response(fetch("/aweme/v1/web/aweme/detail/?aweme_id=7301000000000000003"))
+    checks.append(("detail adds its episode", added == 1))
+    checks.append(("detail sets the current collection", harvester.current_mix_id == MIX_ID))
+
+    added = harvester.on_response(fetch(f"/aweme/v1/web/mix/aweme/?mix_id={MIX_ID}&cursor=0&count=20"))
+    checks.append(("mix list adds the other five episodes", added == 5))
+    checks.append(("episodes 1-6 listed", harvester.episodes() == [1, 2, 3, 4, 5, 6]))
+    checks.append(("covers 1-6", harvester.covers(range(1, 7))))
+
+    added = harvester.on_response(fetch("/aweme/v1/web/aweme/related/?aweme_id=7301000000000000003"))
+    checks.append(("related adds only the other collection's episode", added == 1))
+    checks.append(("episode without play URLs is skipped", not harvester.covers(range(1, 8))))
+    checks.append(("ad without an episode number is skipped", harvester.episodes(OTHER_MIX_ID) == [1]))
+    checks.append(("other collection does not leak into the current one", harvester.episodes() == [1, 2, 3, 4, 5, 6]))
+
+    entry = harvester.get(3)
+    checks.append(("episode 3 ids and title", entry is not None and entry["aweme_id"] == "7301000000000000003" and entry["title"].startswith("第3集") and entry["mix_name"] == "重生之我在豪门当保姆"))
+    checks.append(("highest bitrate variant first", entry is not None and "720p" in entry["play_urls"][0] and "540p" in entry["play_urls"][1]))
+    checks.append(("play URLs are deduplicated", entry is not None and len(entry["play_urls"]) == len(set(entry["play_urls"])) == 4))
+    entry = harvester.get(5)
+    checks.append(("episode number from the description", entry is not None and entry["aweme_id"] == "7301000000000000005"))
+    checks.append(("lookup by collection", (harvester.get(1, OTHER_MIX_ID) or {}).get("aweme_id") == "7309000000000000001"))
+    checks.append(("unknown episode is None", harvester.get(42) is None))
+    return checks
+
+def main():
+    server, base_url = serve()
+    try:
+        checks = run_checks(base_url)
+    finally:
+        server.shutdown()
+    for name, ok in checks:
+        print(f"{'✅' if ok else '❌'} {name}")
+    failed = sum(1 for _, ok in checks if not ok)
+    print(f"\n{len(checks) - failed}/{len(checks)} manifest checks passed")
+    sys.exit(1 if failed else 0)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,249 @@
+import re
+import sys
+import json
+import time
+import struct
+import threading
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlparse, parse_qs
+
+DRAMA_NAME = "基准测试短剧：本地模拟站点"
+MIX_ID = "7000000000000000001"
+
+def make_wav(size):
+    """
+    A silent 8 kHz 8-bit mono WAV of exactly `size` bytes. Chromium loads its
+    metadata in a <video> element without needing any video codec, so the
+    benchmark runs on stock headless builds.
+    """
+    data_size = max(size - 44, 0)
+    header = b'RIFF' + struct.pack('<I', 36 + data_size) + b'WAVE'
+    header += b'fmt ' + struct.pack('<IHHIIHH', 16, 1, 1, 8000, 8000, 1, 8)
+    header += b'data' + struct.pack('<I', data_size)
+    return header + b'\x80' * data_size
+
+FEED_PAGE = """<!DOCTYPE html>
+<html><head><meta charset="utf-8"><title>Mock Douyin</title>
+<style>body{margin:0;background:#111;color:#eee;font-family:sans-serif} video{width:100%;height:70vh;background:#000}</style>
+</head><body>
+<div id="player"><video id="v" autoplay muted playsinline></video></div>
+<h1 id="title"></h1>
+<div data-e2e="video-desc" id="desc"></div>
+<div class="mix"><span id="collection"></span></div>
+<script>
+const CONFIG = __CONFIG__;
+let current = CONFIG.start;
+let objectUrl = null;
+
+function mediaUrl(n) {
+    return '/media/tos-cn-ve-15/v' + n + '/ep' + n + '.mp4';
+}
+
+async function show(n) {
+    current = n;
+    document.getElementById('title').innerText = '第' + n + '集 | ' + CONFIG.drama + ' 模拟剧情简介';
+    document.getElementById('desc').innerText = '第' + n + '集 ' + CONFIG.drama;
+    document.getElementById('collection').innerText = '短剧 · ' + CONFIG.drama;
+    history.replaceState(null, '', '/video/' + (CONFIG.awemeBase + n));
+    const video = document.getElementById('v');
+    if (CONFIG.source === 'blob') {
+        const response = await fetch(mediaUrl(n));
+        const blob = await response.blob();
+        if (n !== current) return;
+        if (objectUrl) URL.revokeObjectURL(objectUrl);
+        objectUrl = URL.createObjectURL(blob);
+        video.src = objectUrl;
+    } else {
+        video.src = mediaUrl(n);
+    }
+}
+
+document.addEventListener('keydown', (e) => {
+    if (e.key === 'ArrowDown' && current < CONFIG.episodes) show(current + 1);
+    if (e.key === 'ArrowUp' && current > 1) show(current - 1);
+});
+
+if (CONFIG.api) {
+    fetch('/aweme/v1/web/aweme/detail/?aweme_id=' + (CONFIG.awemeBase + current));
+    fetch('/aweme/v1/web/mix/aweme/?mix_id=' + CONFIG.mixId + '&cursor=0&count=' + CONFIG.episodes);
+}
+show(current);
+</script>
+</body></html>
+"""
+
+class MockDouyinHandler(BaseHTTPRequestHandler):
+    server_version = "MockDouyin/1.0"
+
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        site = self.server.site
+        parsed = urlparse(self.path)
+        site.delay()
+
+        match = re.match(r'^/video/(\d+)$', parsed.path)
+        if match:
+            return self.send_page(int(match.group(1)) - site.aweme_base)
+        match = re.match(r'^/media/tos-cn-ve-15/v(\d+)/ep\d+\.mp4$', parsed.path)
+        if match:
+            return self.send_media(int(match.group(1)))
+        if parsed.path.startswith('/aweme/v1/web/aweme/detail/'):
+            aweme_id = int(parse_qs(parsed.query).get('aweme_id', ['0'])[0])
+            return self.send_json({"aweme_detail": site.aweme(aweme_id - site.aweme_base)})
+        if parsed.path.startswith('/aweme/v1/web/mix/aweme/'):
+            awemes = [site.aweme(n) for n in range(1, site.episodes + 1)]
+            return self.send_json({"aweme_list": awemes, "has_more": 0, "cursor": site.episodes})
+        self.send_error(404)
+
+    def send_page(self, start):
+        site = self.server.site
+        start = min(max(start, 1), site.episodes)
+        config = {
+            "start": start,
+            "episodes": site.episodes,
+            "drama": DRAMA_NAME,
+            "source": site.source,
+            "api": site.api,
+            "mixId": MIX_ID,
+            "awemeBase": site.aweme_base,
+        }
+        body = FEED_PAGE.replace("__CONFIG__", json.dumps(config, ensure_ascii=False)).encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/html; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def send_json(self, payload):
+        body = json.dumps(payload, ensure_ascii=False).encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def send_media(self, n):
+        site = self.server.site
+        data = site.media(n)
+        start, end = 0, len(data) - 1
+        range_header = self.headers.get('Range')
+        match = re.match(r'bytes=(\d+)-(\d*)', range_header or '')
+        if match:
+            start = int(match.group(1))
+            end = min(int(match.group(2)) if match.group(2) else end, len(data) - 1)
+            if start > end:
+                self.send_response(416)
+                self.send_header('Content-Range', f'bytes */{len(data)}')
+                self.end_headers()
+                return
+            self.send_response(206)
+            self.send_header('Content-Range', f'bytes {start}-{end}/{len(data)}')
+        else:
+            self.send_response(200)
+        self.send_header('Content-Type', 'video/mp4')
+        self.send_header('Accept-Ranges', 'bytes')
+        self.send_header('Content-Length', str(end - start + 1))
+        self.end_headers()
+        try:
+            site.send_throttled(self.wfile, data, start, end + 1)
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+
+class MockDouyinSite:
+    """
+    Local stand-in for the Douyin web player.
+
+    Serves a feed page (/video/<id>) with <video>, <h1> and "短剧 · <name>"
+    collection markup, switches episodes on ArrowDown, and plays media either
+    directly (video.src = mp4 URL) or through a fetched blob. Media supports
+    Range requests. latency_ms is added to every request and bandwidth
+    (bytes/s, shared across connections) throttles media bodies. api=True
+    also serves the aweme detail / mix list JSON the manifest harvester reads.
+    """
+    def __init__(self, episodes=20, media_size=2 * 1024 * 1024, source="direct", latency_ms=0, bandwidth=0, api=False, sample_video=None, port=0):
+        self.episodes = episodes
+        self.source = source
+        self.latency_ms = latency_ms
+        self.bandwidth = bandwidth
+        self.api = api
+        self.aweme_base = 7100000000000000000
+        self.port = port
+        self.lock = threading.Lock()
+        self.next_send_at = 0.0
+        self.bytes_served = 0
+        if sample_video:
+            with open(sample_video, 'rb') as f:
+                self.media_bytes = f.read()
+        else:
+            self.media_bytes = make_wav(media_size)
+        self.server = None
+
+    def media(self, n):
+        return self.media_bytes
+
+    def aweme(self, n):
+        return {
+            "aweme_id": str(self.aweme_base + n),
+            "desc": f"第{n}集 | {DRAMA_NAME} 模拟剧情简介",
+            "mix_info": {"mix_id": MIX_ID, "mix_name": DRAMA_NAME, "statis": {"current_episode": n, "updated_to_episode": self.episodes}},
+            "video": {
+                "duration": 1000,
+                "play_addr": {"url_list": [f"{self.url}/media/tos-cn-ve-15/v{n}/ep{n}.mp4"]},
+            },
+        }
+
+    def delay(self):
+        if self.latency_ms:
+            time.sleep(self.latency_ms / 1000.0)
+
+    def send_throttled(self, wfile, data, start, end, chunk_size=64 * 1024):
+        """Write data[start:end], keeping the whole server under self.bandwidth"""
+        pos = start
+        while pos < end:
+            chunk = data[pos:min(pos + chunk_size, end)]
+            if self.bandwidth:
+                with self.lock:
+                    now = time.monotonic()
+                    send_at = max(self.next_send_at, now)
+                    self.next_send_at = send_at + len(chunk) / float(self.bandwidth)
+                if send_at > now:
+                    time.sleep(send_at - now)
+            wfile.write(chunk)
+            pos += len(chunk)
+            with self.lock:
+                self.bytes_served += len(chunk)
+
+    @property
+    def url(self):
+        return f"http://127.0.0.1:{self.port}"
+
+    def start_url(self, episode=1):
+        return f"{self.url}/video/{self.aweme_base + episode}"
+
+    def start(self):
+        self.server = ThreadingHTTPServer(('127.0.0.1', self.port), MockDouyinHandler)
+        self.server.daemon_threads = True
+        self.server.site = self
+        self.port = self.server.server_address[1]
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self):
+        if self.server:
+            self.server.shutdown()
+            self.server.server_close()
+
+if __name__ == "__main__":
+    # python -m benchmark.mock_site [port] [episodes] [direct|blob]
+    port = int(sys.argv[1]) if len(sys.argv) > 1 else 8765
+    episodes = int(sys.argv[2]) if len(sys.argv) > 2 else 20
+    source = sys.argv[3] if len(sys.argv) > 3 else "direct"
+    site = MockDouyinSite(episodes=episodes, source=source, api=True, port=port).start()
+    print(f"Mock Douyin site: {site.start_url()}")
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        site.stop()
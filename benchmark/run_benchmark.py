@@ -0,0 +1,162 @@
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import resource
+import tempfile
+import subprocess
+
+from benchmark.mock_site import MockDouyinSite
+
+# Crawler configurations to compare; keys are crawl_collections() options
+CONFIGS = {
+    "inline": {"download_workers": 0, "use_manifest": False, "profile": "headless"},
+    "workers": {"download_workers": 3, "use_manifest": False, "profile": "headless"},
+    "tee": {"download_workers": 3, "use_manifest": False, "profile": "headless", "capture_mode": "tee"},
+    "lean": {"download_workers": 3, "use_manifest": False, "profile": "lean"},
+    "manifest": {"download_workers": 3, "use_manifest": True, "profile": "headless"},
+}
+
+def dir_bytes(path):
+    total = 0
+    for root, dirs, files in os.walk(path):
+        dirs[:] = [d for d in dirs if not d.startswith('.')]
+        for name in files:
+            if not name.endswith('.part') and not name.endswith('.json'):
+                total += os.path.getsize(os.path.join(root, name))
+    return total
+
+def run_single(config_name, start_url, episodes):
+    """Crawl the mock site once with one configuration (runs in its own process)"""
+    import crawl_douyin
+    from crawl_metrics import metrics
+
+    options = dict(CONFIGS[config_name])
+    profile = options.pop("profile", "headless")
+
+    workdir = tempfile.mkdtemp(prefix=f"bench_{config_name}_")
+    crawl_douyin.BROWSER_DATA_DIR = os.path.join(workdir, "browser_data")
+    output_file = os.path.join(workdir, "crawled_data.json")
+    videos_dir = os.path.join(workdir, "videos")
+
+    started = time.perf_counter()
+    try:
+        crawl_douyin.crawl_collections(
+            [start_url],
+            start_index=1,
+            count=episodes,
+            max_tabs=1,
+            profile=profile,
+            output_file=output_file,
+            videos_dir=videos_dir,
+            trace_file=os.path.join(workdir, "trace.jsonl"),
+            **options
+        )
+        wall = time.perf_counter() - started
+
+        with open(output_file, "r", encoding='utf-8') as f:
+            records = json.load(f)
+        downloaded_bytes = dir_bytes(videos_dir)
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    return {
+        "config": config_name,
+        "episodes": len(records),
+        "downloaded": sum(1 for r in records if r.get("downloaded")),
+        "wall_seconds": wall,
+        "episodes_per_minute": len(records) / wall * 60 if wall else 0,
+        "bytes_per_second": downloaded_bytes / wall if wall else 0,
+        "downloaded_bytes": downloaded_bytes,
+        # ru_maxrss is in KB on Linux
+        "peak_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+        "peak_child_rss_mb": resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss / 1024,
+        "stages": metrics.stage_summary(),
+        "counters": {name + "".join(f"[{k}={v}]" for k, v in labels): value for (name, labels), value in metrics.counters.items()},
+    }
+
+def run_in_subprocess(config_name, start_url, episodes, verbose=False):
+    """Run one configuration in a fresh interpreter so RSS and state don't leak"""
+    repo_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    cmd = [sys.executable, "-m", "benchmark.run_benchmark", "--single", config_name, "--start-url", start_url, "--episodes", str(episodes)]
+    proc = subprocess.run(cmd, cwd=repo_root, capture_output=True, text=True)
+    if verbose:
+        sys.stdout.write(proc.stdout)
+    for line in proc.stdout.splitlines():
+        if line.startswith("BENCH_RESULT "):
+            return json.loads(line[len("BENCH_RESULT "):])
+    sys.stderr.write(proc.stderr[-2000:])
+    return {"config": config_name, "error": f"exit code {proc.returncode}"}
+
+def print_report(results):
+    print("\n" + "=" * 78)
+    print(f"{'config':<10}{'episodes':>9}{'ok':>5}{'wall s':>9}{'ep/min':>9}{'MB/s':>8}{'RSS MB':>9}{'child MB':>10}")
+    print("-" * 78)
+    for r in results:
+        if "error" in r:
+            print(f"{r['config']:<10}  failed: {r['error']}")
+            continue
+        print(f"{r['config']:<10}{r['episodes']:>9}{r['downloaded']:>5}{r['wall_seconds']:>9.1f}"
+              f"{r['episodes_per_minute']:>9.1f}{r['bytes_per_second'] / 1024 / 1024:>8.2f}"
+              f"{r['peak_rss_mb']:>9.1f}{r['peak_child_rss_mb']:>10.1f}")
+    print("=" * 78)
+    for r in results:
+        if "error" in r:
+            continue
+        print(f"\n[{r['config']}] per-stage timings")
+        for stage, s in sorted(r["stages"].items()):
+            print(f"  {stage:<16} n={s['count']:<4} total={s['total']:7.2f}s mean={s['mean']:6.3f}s")
+        for name, value in sorted(r["counters"].items()):
+            print(f"  {name} = {value}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark crawl_douyin against a local mock Douyin site")
+    parser.add_argument("--configs", default=",".join(CONFIGS), help="comma-separated configs: " + ", ".join(CONFIGS))
+    parser.add_argument("--episodes", type=int, default=10)
+    parser.add_argument("--media-size", type=int, default=2 * 1024 * 1024, help="bytes per episode")
+    parser.add_argument("--source", choices=["direct", "blob"], default="direct")
+    parser.add_argument("--latency-ms", type=int, default=50)
+    parser.add_argument("--bandwidth", type=int, default=5 * 1024 * 1024, help="bytes/s for the whole mock site, 0 = unlimited")
+    parser.add_argument("--sample-video", help="serve this file instead of the generated silent WAV")
+    parser.add_argument("--json", help="also write the results to this file")
+    parser.add_argument("--verbose", action="store_true", help="show crawler output")
+    # Internal: run one configuration and print its result
+    parser.add_argument("--single", help=argparse.SUPPRESS)
+    parser.add_argument("--start-url", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.single:
+        result = run_single(args.single, args.start_url, args.episodes)
+        print("BENCH_RESULT " + json.dumps(result))
+        return
+
+    site = MockDouyinSite(
+        episodes=args.episodes,
+        media_size=args.media_size,
+        source=args.source,
+        latency_ms=args.latency_ms,
+        bandwidth=args.bandwidth,
+        api=True,
+        sample_video=args.sample_video,
+    ).start()
+
+    results = []
+    try:
+        for name in [c.strip() for c in args.configs.split(",") if c.strip()]:
+            if name not in CONFIGS:
+                print(f"Unknown config: {name}")
+                continue
+            print(f"▶️  Running {name}...")
+            results.append(run_in_subprocess(name, site.start_url(1), args.episodes, args.verbose))
+    finally:
+        site.stop()
+
+    print_report(results)
+    if args.json:
+        with open(args.json, "w", encoding='utf-8') as f:
+            json.dump(results, f, indent=2)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,128 @@
+import time
+import threading
+from urllib.parse import urlparse, parse_qs
+
+# Query parameters Douyin / TOS play URLs use for the media id
+VIDEO_ID_PARAMS = ['video_id', '__vid', 'vid', 'file_id']
+
+def parse_video_id(url):
+    """
+    Best-effort stable id for a captured media URL.
+    Signed CDN URLs change per request, but the object id does not:
+      .../video/tos/cn/tos-cn-ve-15/<object_id>/?...  -> <object_id>
+      .../aweme/v1/play/?video_id=v0200f...           -> v0200f...
+    """
+    parsed = urlparse(url)
+    query = parse_qs(parsed.query)
+    for param in VIDEO_ID_PARAMS:
+        if query.get(param):
+            return query[param][0]
+
+    parts = [p for p in parsed.path.split('/') if p]
+    for i, part in enumerate(parts):
+        if part.startswith('tos-') and i + 1 < len(parts):
+            return parts[i + 1]
+    # Bare file names (play, index, ...) collide across videos; keep the whole path
+    return parsed.netloc + parsed.path
+
+def parse_bitrate(url):
+    """Bitrate hint (br/bt query params, kbps) or 0"""
+    query = parse_qs(urlparse(url).query)
+    for param in ('br', 'bt'):
+        value = query.get(param, [''])[0]
+        if value.isdigit():
+            return int(value)
+    return 0
+
+class CaptureEntry:
+    """One captured video and every URL variant (bitrate/quality) seen for it"""
+    def __init__(self, video_id):
+        self.video_id = video_id
+        self.first_seen = time.time()
+        self.variants = {}  # url -> {"bitrate", "bytes_seen", "content_type"}
+        self.episode_index = None
+        self.claimed_by = None  # "match" (tied to the active video) or "fifo" (oldest unclaimed)
+
+    def add_variant(self, url, bitrate=0, nbytes=0, content_type=None):
+        variant = self.variants.setdefault(url, {"bitrate": bitrate, "bytes_seen": 0, "content_type": content_type})
+        variant["bytes_seen"] += nbytes
+
+    def has_aweme_id(self, aweme_id):
+        """CDN URLs carry the aweme id as __vid"""
+        return any(parse_qs(urlparse(u).query).get('__vid', [None])[0] == aweme_id for u in self.variants)
+
+    def best_url(self):
+        """The variant the player actually streamed the most of, then the highest bitrate"""
+        return max(self.variants, key=lambda u: (self.variants[u]["bytes_seen"], self.variants[u]["bitrate"]))
+
+class CaptureRegistry:
+    """
+    Captured video responses grouped by video id, in first-seen order.
+
+    The player prefetches the next episode while the current one plays, so
+    entries are not thrown away after a download: claim() hands the entry
+    matching the active video to the episode, and whatever was prefetched
+    stays queued for the next one.
+    """
+    def __init__(self, keep_claimed=20):
+        self.entries = {}  # video_id -> CaptureEntry (insertion = first-seen order)
+        self.keep_claimed = keep_claimed
+        self.lock = threading.Lock()
+
+    def add(self, url, headers=None):
+        """Record a video response; returns (entry, is_new_video)"""
+        headers = headers or {}
+        length = headers.get('content-length', '')
+        with self.lock:
+            video_id = parse_video_id(url)
+            entry = self.entries.get(video_id)
+            is_new = entry is None
+            if is_new:
+                entry = CaptureEntry(video_id)
+                self.entries[video_id] = entry
+            entry.add_variant(url, parse_bitrate(url), int(length) if length.isdigit() else 0, headers.get('content-type'))
+            return entry, is_new
+
+    def __contains__(self, url):
+        with self.lock:
+            entry = self.entries.get(parse_video_id(url))
+            return entry is not None and url in entry.variants
+
+    def unclaimed(self):
+        with self.lock:
+            return [e for e in self.entries.values() if e.episode_index is None]
+
+    def claim(self, episode_index, urls=(), aweme_id=None):
+        """
+        Link the capture of the active video to episode_index: the entry whose
+        id or variants match one of urls (the <video> src, the manifest's play
+        URLs) or whose URLs carry aweme_id. Without a match the oldest
+        unclaimed entry is used and marked claimed_by "fifo". None if nothing
+        is captured yet.
+        """
+        urls = [u for u in urls if u and u.startswith("http")]
+        ids = {parse_video_id(u) for u in urls}
+        if aweme_id:
+            ids.add(aweme_id)
+        with self.lock:
+            for entry in self.entries.values():
+                if entry.episode_index == episode_index:
+                    return entry
+            unclaimed = [e for e in self.entries.values() if e.episode_index is None]
+            for entry in unclaimed:
+                if entry.video_id in ids or any(u in entry.variants for u in urls) or (aweme_id and entry.has_aweme_id(aweme_id)):
+                    return self._claim(entry, episode_index, "match")
+            if unclaimed:
+                return self._claim(unclaimed[0], episode_index, "fifo")
+        return None
+
+    def _claim(self, entry, episode_index, claimed_by):
+        entry.episode_index = episode_index
+        entry.claimed_by = claimed_by
+        self._prune()
+        return entry
+
+    def _prune(self):
+        claimed = [vid for vid, e in self.entries.items() if e.episode_index is not None]
+        for vid in claimed[:max(0, len(claimed) - self.keep_claimed)]:
+            del self.entries[vid]
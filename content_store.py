@@ -0,0 +1,153 @@
+import os
+import time
+import shutil
+import sqlite3
+import hashlib
+import threading
+
+HASH_CHUNK_SIZE = 1024 * 1024
+LINK_MODES = ("hardlink", "symlink")
+
+def hash_file(path):
+    """Streaming SHA-256 of a file"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK_SIZE), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+class ContentStore:
+    """
+    Content-addressed video store under <root>/objects/<aa>/<sha256><ext>.
+
+    index.sqlite maps content hashes to objects, video ids (capture ids,
+    aweme ids) to hashes, and every human-readable path to the object it
+    points at. The videos/<drama>/<episode>.mp4 files are hardlinks (or
+    symlinks) to the objects, so the same clip reached through different
+    titles or collections is stored once, and a clip whose id is already
+    known is linked without fetching it again. Queue worker processes share
+    the index; writers wait up to busy_timeout seconds for each other.
+    """
+    def __init__(self, root, link_mode="hardlink", busy_timeout=30):
+        if link_mode not in LINK_MODES:
+            raise ValueError(f"Unknown link mode: {link_mode} (choose from {', '.join(LINK_MODES)})")
+        self.root = root
+        self.link_mode = link_mode
+        self.objects_dir = os.path.join(root, "objects")
+        if not os.path.exists(self.objects_dir):
+            os.makedirs(self.objects_dir)
+        self.lock = threading.Lock()
+        self.bytes_deduplicated = 0
+        self.conn = sqlite3.connect(os.path.join(root, "index.sqlite"), timeout=busy_timeout, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.executescript("""
+            CREATE TABLE IF NOT EXISTS objects (
+                sha256 TEXT PRIMARY KEY,
+                size INTEGER NOT NULL,
+                path TEXT NOT NULL,
+                created REAL NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS video_ids (
+                video_id TEXT PRIMARY KEY,
+                sha256 TEXT NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS links (
+                path TEXT PRIMARY KEY,
+                sha256 TEXT NOT NULL
+            );
+        """)
+        self.conn.commit()
+
+    def object_path(self, sha256, ext=".mp4"):
+        return os.path.join(self.objects_dir, sha256[:2], sha256 + ext)
+
+    def lookup(self, video_ids):
+        """sha256 of the first id that maps to an object still on disk, else None"""
+        with self.lock:
+            for video_id in video_ids:
+                if not video_id:
+                    continue
+                row = self.conn.execute(
+                    "SELECT o.sha256, o.path FROM video_ids v JOIN objects o ON o.sha256 = v.sha256 WHERE v.video_id = ?",
+                    (video_id,)
+                ).fetchone()
+                if row and os.path.exists(row[1]):
+                    return row[0]
+        return None
+
+    def extension(self, sha256):
+        """File extension of the stored object (".mp4", ".ts", ...), or None if unknown"""
+        with self.lock:
+            row = self.conn.execute("SELECT path FROM objects WHERE sha256 = ?", (sha256,)).fetchone()
+        return os.path.splitext(row[0])[1] if row else None
+
+    def _link(self, object_path, link_path):
+        """Point link_path at object_path, replacing whatever is there"""
+        if os.path.lexists(link_path):
+            if self.link_mode == "hardlink" and os.path.exists(link_path) and os.path.samefile(object_path, link_path):
+                return
+            os.remove(link_path)
+        if self.link_mode == "symlink":
+            os.symlink(os.path.relpath(object_path, os.path.dirname(link_path) or "."), link_path)
+            return
+        try:
+            os.link(object_path, link_path)
+        except OSError:
+            # Filesystem without hardlinks: fall back to a symlink
+            os.symlink(os.path.abspath(object_path), link_path)
+
+    def materialize(self, sha256, link_path, video_ids=()):
+        """Create link_path for known content and remember the ids; returns the object path"""
+        with self.lock:
+            row = self.conn.execute("SELECT path FROM objects WHERE sha256 = ?", (sha256,)).fetchone()
+            if row is None:
+                raise KeyError(sha256)
+            self._link(row[0], link_path)
+            self._remember(sha256, link_path, video_ids)
+            self.conn.commit()
+        return row[0]
+
+    def ingest(self, path, video_ids=(), sha256=None):
+        """
+        Move a finished download into the store and leave a link in its place.
+        Content that is already stored is not kept twice. Returns the sha256.
+        """
+        sha256 = sha256 or hash_file(path)
+        size = os.path.getsize(path)
+        with self.lock:
+            row = self.conn.execute("SELECT path FROM objects WHERE sha256 = ?", (sha256,)).fetchone()
+            if row and os.path.exists(row[0]):
+                object_path = row[0]
+                if not os.path.samefile(object_path, path):
+                    self.bytes_deduplicated += size
+                    os.remove(path)
+            else:
+                object_path = self.object_path(sha256, os.path.splitext(path)[1] or ".mp4")
+                if not os.path.exists(os.path.dirname(object_path)):
+                    os.makedirs(os.path.dirname(object_path))
+                shutil.move(path, object_path)
+                self.conn.execute(
+                    "INSERT OR REPLACE INTO objects (sha256, size, path, created) VALUES (?, ?, ?, ?)",
+                    (sha256, size, object_path, time.time())
+                )
+            self._link(object_path, path)
+            self._remember(sha256, path, video_ids)
+            self.conn.commit()
+        return sha256
+
+    def _remember(self, sha256, link_path, video_ids):
+        for video_id in video_ids:
+            if video_id:
+                self.conn.execute("INSERT OR REPLACE INTO video_ids (video_id, sha256) VALUES (?, ?)", (video_id, sha256))
+        self.conn.execute("INSERT OR REPLACE INTO links (path, sha256) VALUES (?, ?)", (link_path, sha256))
+
+    def stats(self):
+        with self.lock:
+            objects, size = self.conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM objects").fetchone()
+            links = self.conn.execute("SELECT COUNT(*) FROM links").fetchone()[0]
+        return {"objects": objects, "bytes": size, "links": links, "bytes_deduplicated": self.bytes_deduplicated}
+
+    def close(self):
+        with self.lock:
+            self.conn.commit()
+            self.conn.close()
@@ -0,0 +1,148 @@
+import os
+import json
+import time
+import hashlib
+import tempfile
+import threading
+
+# Signed CDN media URLs stop working after a while; older failed URLs are
+# not retried, the episode's page is revisited for a fresh capture instead
+FAILED_URL_TTL = 30 * 60
+
+class CrawlCheckpoint:
+    """
+    Per-collection crawl progress, keyed by start URL and episode range, so
+    queue workers crawling different ranges of one collection never share a
+    file.
+
+    Records the last confirmed episode (index, video id, aweme id, media URL,
+    the page URL it was on and, if the manifest knows it, the next episode's
+    aweme id), downloads that were queued but not finished, and episodes
+    whose download failed so a resume retries them. Rewritten atomically
+    after every change so a crash loses at most the episode in progress.
+    """
+    def __init__(self, checkpoint_dir, start_url, start_index=1, count=50):
+        self.start_url = start_url
+        self.start_index = start_index
+        self.count = count
+        key = hashlib.sha1(f"{start_url}|{start_index}|{count}".encode('utf-8')).hexdigest()[:16]
+        self.checkpoint_dir = checkpoint_dir
+        self.path = os.path.join(checkpoint_dir, f"{key}.json")
+        self.lock = threading.Lock()
+        self.state = {"start_url": start_url, "start_index": start_index, "count": count, "last_episode": None, "pending": {}, "failed": {}}
+        # Several worker processes may create it at once
+        os.makedirs(checkpoint_dir, exist_ok=True)
+
+    def load(self):
+        """Load the saved state; returns it, or None when there is no usable checkpoint"""
+        if not os.path.exists(self.path):
+            return None
+        try:
+            with open(self.path, "r", encoding='utf-8') as f:
+                state = json.load(f)
+        except Exception as e:
+            print(f"⚠️  Ignoring unreadable checkpoint {self.path}: {e}")
+            return None
+        if (state.get("start_url"), state.get("start_index"), state.get("count")) != (self.start_url, self.start_index, self.count):
+            return None
+        state.setdefault("pending", {})
+        state.setdefault("failed", {})
+        with self.lock:
+            self.state = state
+        return state
+
+    def _save(self):
+        self.state["updated_at"] = time.time()
+        # A unique temp file, so concurrent writers never publish each other's state
+        fd, tmp_path = tempfile.mkstemp(prefix=os.path.basename(self.path) + ".", suffix=".tmp", dir=self.checkpoint_dir)
+        try:
+            with os.fdopen(fd, "w", encoding='utf-8') as f:
+                json.dump(self.state, f, ensure_ascii=False, indent=2)
+            os.chmod(tmp_path, 0o644)
+            os.replace(tmp_path, self.path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+    def confirm_episode(self, video_info, page_url=None, next_aweme_id=None, failed=None):
+        """
+        Move past an episode. failed=True keeps it in the failed list for the
+        next resume, False clears an earlier failure, None (download still
+        queued) leaves that to the download's outcome.
+        """
+        with self.lock:
+            if failed:
+                self._mark_failed(video_info)
+            elif failed is not None:
+                self.state["failed"].pop(str(video_info["episode_index"]), None)
+            last = self.state.get("last_episode")
+            if last is None or video_info["episode_index"] >= last:
+                self.state.update({
+                    "last_episode": video_info["episode_index"],
+                    "last_url": video_info.get("url"),
+                    "last_video_id": video_info.get("video_id") or video_info.get("aweme_id"),
+                    "last_aweme_id": video_info.get("aweme_id"),
+                    "last_page_url": page_url,
+                    "next_aweme_id": next_aweme_id,
+                    "collection_raw": video_info.get("collection_raw"),
+                })
+            self._save()
+
+    def _mark_failed(self, video_info, url=None, output_path=None):
+        key = str(video_info["episode_index"])
+        url = url or video_info.get("url")
+        previous = self.state["failed"].get(key)
+        if previous and previous.get("url") == url:
+            # The same URL failed again
+            attempts, failed_at = previous.get("attempts", 1) + 1, previous.get("failed_at") or time.time()
+        else:
+            attempts, failed_at = 1, time.time()
+        self.state["failed"][key] = {
+            "url": url,
+            "output_path": output_path,
+            "video_info": dict(video_info),
+            "attempts": attempts,
+            "failed_at": failed_at,
+        }
+
+    def mark_failed(self, video_info, url=None, output_path=None):
+        """A background download of a confirmed episode failed: retry it on resume"""
+        with self.lock:
+            self._mark_failed(video_info, url, output_path)
+            self._save()
+
+    def clear_failed(self, episode_index):
+        with self.lock:
+            if self.state["failed"].pop(str(episode_index), None) is not None:
+                self._save()
+
+    def failed(self):
+        """{episode_index: {"url", "output_path", "video_info", "attempts", "failed_at"}}"""
+        with self.lock:
+            return {int(k): v for k, v in self.state["failed"].items()}
+
+    def retry_url(self, job):
+        """
+        Whether a failed job's stored media URL is worth another try: an http
+        URL that has failed only once and is younger than FAILED_URL_TTL.
+        Otherwise the episode has to be revisited for a fresh capture.
+        """
+        url = job.get("url") or ""
+        if not url.startswith("http") or job.get("attempts", 1) > 1:
+            return False
+        return time.time() - (job.get("failed_at") or 0) < FAILED_URL_TTL
+
+    def add_pending(self, url, output_path, video_info):
+        with self.lock:
+            self.state["pending"][output_path] = {"url": url, "video_info": dict(video_info)}
+            self._save()
+
+    def remove_pending(self, output_path):
+        with self.lock:
+            if self.state["pending"].pop(output_path, None) is not None:
+                self._save()
+
+    def pending(self):
+        with self.lock:
+            return dict(self.state["pending"])
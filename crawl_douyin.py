@@ -2,13 +2,33 @@ from playwright.sync_api import sync_playwright
 import time
 import random
 import sys
-import json
 import os
 import base64
-import requests
+import itertools
+import weakref
+import queue
+import threading
+import re
+from urllib.parse import urlparse
+from video_downloader import download_file
+from rate_control import rate
+from http_client import client, BROWSER_USER_AGENT
+from hls_downloader import download_hls, is_hls_url, is_hls_content_type, is_hls_segment, is_hls_file
+from metadata_store import open_metadata_store, export_json
+from response_tee import ResponseTee
+from capture_registry import CaptureRegistry, parse_video_id
+from dom_extractor import load_selector_rules, extract_episode_metadata
+from manifest_harvester import ManifestHarvester
+from lean_profile import LEAN_LAUNCH_OPTIONS, RequestBlocker
+from crawl_metrics import metrics, SIZE_BUCKETS
+from crawl_checkpoint import CrawlCheckpoint
+from page_waits import WAIT_TIMEOUTS, wait_for_video_ready, wait_for_video_change
+from media_check import MediaValidator, is_truncated_mp4
+from content_store import ContentStore
 
 # Configuration
 BROWSER_DATA_DIR = os.path.join(os.getcwd(), ".browser_data")
+AWEME_URL_RE = re.compile(r'/video/(\d+)')
 
 def sanitize_filename(name):
     """Remove invalid characters from filename"""
@@ -53,6 +73,133 @@ def extract_episode_title(title):
 
     return sanitize_filename(episode_title)
 
+def already_downloaded(output_path):
+    """A reasonably sized file that isn't a truncated MP4"""
+    return os.path.exists(output_path) and os.path.getsize(output_path) > 102400 and not is_truncated_mp4(output_path)
+
+def existing_download(output_path):
+    """Path of an earlier finished download of output_path (or its .ts HLS variant), else None"""
+    for path in (output_path, os.path.splitext(output_path)[0] + ".ts"):
+        if already_downloaded(path):
+            return path
+    return None
+
+def download_direct(url, output_path, tee=None):
+    """
+    Download a real (non-blob) video URL via the segmented, resumable downloader.
+    With a ResponseTee, bytes the player already fetched are reused first.
+    HLS playlists (.m3u8) are downloaded segment by segment into one file
+    (.ts instead of .mp4 for MPEG-TS streams). Returns the path written, or
+    None when the file is too small to be a video.
+    """
+    with metrics.span("direct_download", tee=tee is not None) as span:
+        source = "download"
+        teed = False
+        written = output_path
+        if is_hls_url(url):
+            source = "hls"
+            written = download_hls(url, output_path)
+        elif tee is not None:
+            try:
+                teed = tee.take(url, output_path)
+                if teed:
+                    source = "tee"
+            except Exception as e:
+                print(f"  ⚠️  Tee reassembly failed, downloading instead: {str(e)[:100]}")
+                metrics.incr("crawl_fallbacks_total", reason="tee_failed")
+        if not teed and source != "hls":
+            download_file(url, output_path)
+            # A playlist served without an .m3u8 path: fetch its segments instead
+            if os.path.getsize(output_path) < 1024 * 1024 and is_hls_file(output_path):
+                source = "hls"
+                written = download_hls(url, output_path)
+                if written != output_path:
+                    os.remove(output_path)
+
+        file_size = os.path.getsize(written)
+        span.set(bytes=file_size, source=source)
+        metrics.incr("crawl_bytes_total", file_size, path="direct")
+        metrics.observe("crawl_download_bytes", file_size, SIZE_BUCKETS, path="direct")
+        return written if file_size > 102400 else None
+
+class DownloadWorkerPool:
+    """
+    Bounded pool of background threads that download captured video URLs
+    while the browser moves on to the next episode.
+
+    Jobs are (url, output_path, video_info) tuples. submit() blocks once
+    max_pending jobs are waiting, so navigation never runs too far ahead.
+    on_done(video_info, updates, output_path) is called from the worker
+    thread after each job with the fields to merge into video_info.
+    download_func(url, path) defaults to download_direct; it returns the path
+    written (or just True) on success.
+    """
+    def __init__(self, num_workers=3, max_pending=10, on_done=None, download_func=None):
+        self.jobs = queue.Queue(maxsize=max_pending)
+        self.download_func = download_func or download_direct
+        self.on_done = on_done
+        self.in_flight = set()
+        self.lock = threading.Lock()
+        self.workers = []
+        for n in range(num_workers):
+            worker = threading.Thread(target=self._run, name=f"download-{n}", daemon=True)
+            worker.start()
+            self.workers.append(worker)
+
+    def submit(self, url, output_path, video_info):
+        with self.lock:
+            if output_path in self.in_flight:
+                print(f"  ⏭️  Already queued: {os.path.basename(output_path)}")
+                return False
+            self.in_flight.add(output_path)
+        self.jobs.put((url, output_path, video_info))
+        print(f"  📨 Queued download ({self.jobs.qsize()} pending): {os.path.basename(output_path)}")
+        return True
+
+    def _run(self):
+        while True:
+            job = self.jobs.get()
+            if job is None:
+                self.jobs.task_done()
+                break
+            url, output_path, video_info = job
+            success = False
+            local_path = output_path
+            try:
+                written = self.download_func(url, output_path)
+                success = bool(written)
+                if isinstance(written, str):
+                    local_path = written
+                if success:
+                    print(f"  ✅ Downloaded: {os.path.basename(local_path)} ({os.path.getsize(local_path) / 1024 / 1024:.2f} MB)")
+                else:
+                    print(f"  ⚠️  File too small: {os.path.basename(output_path)}")
+            except Exception as e:
+                print(f"  ⚠️  Background download failed: {str(e)[:100]}")
+            if not success:
+                metrics.incr("crawl_download_failures_total", path="direct")
+
+            updates = {"downloaded": success}
+            if success:
+                updates["local_path"] = local_path
+            with self.lock:
+                self.in_flight.discard(output_path)
+            if self.on_done:
+                try:
+                    self.on_done(video_info, updates, output_path)
+                except Exception as e:
+                    print(f"  ⚠️  Failed to record download result: {e}")
+            self.jobs.task_done()
+
+    def close(self):
+        """Wait for all queued downloads to finish, then stop the workers"""
+        if self.jobs.unfinished_tasks:
+            print(f"\n⏳ Waiting for {self.jobs.unfinished_tasks} background download(s)...")
+        for _ in self.workers:
+            self.jobs.put(None)
+        for worker in self.workers:
+            worker.join()
+
 def download_blob_video(page, video_url, output_path, max_retries=2):
     """
     Download video from blob URL using multiple methods
@@ -62,58 +209,127 @@ def download_blob_video(page, video_url, output_path, max_retries=2):
         ("Video element capture", download_from_video_element)
     ]
 
-    for method_name, method_func in methods:
+    for method_index, (method_name, method_func) in enumerate(methods):
+        if method_index > 0:
+            metrics.incr("crawl_fallbacks_total", reason=f"blob:{method_name}")
         for attempt in range(max_retries):
-            try:
-                if attempt == 0:
-                    print(f"  📥 Trying {method_name}...")
-                else:
-                    print(f"  🔄 Retry {attempt}/{max_retries}...")
-
-                if method_func(page, video_url, output_path):
-                    file_size = os.path.getsize(output_path)
-                    if file_size > 102400:  # > 100KB (reasonable video size)
-                        print(f"  ✅ Downloaded: {os.path.basename(output_path)} ({file_size / 1024 / 1024:.2f} MB)")
-                        return True
+            if attempt > 0:
+                metrics.incr("crawl_retries_total", method=method_name)
+            with metrics.span("blob_attempt", method=method_name, attempt=attempt) as span:
+                try:
+                    if attempt == 0:
+                        print(f"  📥 Trying {method_name}...")
                     else:
-                        print(f"  ⚠️  File too small ({file_size} bytes), trying next method...")
-                        if os.path.exists(output_path):
-                            os.remove(output_path)
-            except Exception as e:
-                error_msg = str(e)[:150]
-                print(f"  ⚠️  {error_msg}")
-                time.sleep(0.5)
+                        print(f"  🔄 Retry {attempt}/{max_retries}...")
+
+                    if method_func(page, video_url, output_path):
+                        file_size = os.path.getsize(output_path)
+                        span.set(bytes=file_size)
+                        if file_size > 102400:  # > 100KB (reasonable video size)
+                            print(f"  ✅ Downloaded: {os.path.basename(output_path)} ({file_size / 1024 / 1024:.2f} MB)")
+                            span.set(result="ok")
+                            metrics.incr("crawl_bytes_total", file_size, path="blob")
+                            metrics.observe("crawl_download_bytes", file_size, SIZE_BUCKETS, path="blob")
+                            return True
+                        else:
+                            print(f"  ⚠️  File too small ({file_size} bytes), trying next method...")
+                            span.set(result="too_small")
+                            if os.path.exists(output_path):
+                                os.remove(output_path)
+                except Exception as e:
+                    error_msg = str(e)[:150]
+                    print(f"  ⚠️  {error_msg}")
+                    span.set(result="error", error=error_msg)
+                    metrics.incr("crawl_download_failures_total", path="blob", method=method_name)
+                    rate.backoff(attempt)
 
     print(f"  ❌ All download methods failed")
+    metrics.incr("crawl_episode_failures_total", reason="blob_exhausted")
     return False
 
-def download_with_xhr(page, video_url, output_path):
-    """Download using XMLHttpRequest (more compatible than fetch)"""
-    video_data = page.evaluate("""
-        async (url) => {
-            return new Promise((resolve, reject) => {
-                const xhr = new XMLHttpRequest();
-                xhr.open('GET', url, true);
-                xhr.responseType = 'blob';
-                xhr.onload = function() {
-                    if (xhr.status === 200) {
-                        const reader = new FileReader();
-                        reader.onloadend = () => resolve(reader.result.split(',')[1]);
-                        reader.onerror = reject;
-                        reader.readAsDataURL(xhr.response);
-                    } else {
-                        reject(new Error('XHR failed with status ' + xhr.status));
-                    }
-                };
-                xhr.onerror = () => reject(new Error('XHR network error'));
-                xhr.send();
-            });
-        }
-    """, video_url)
+# Blob transfers stream to Python in pieces of this size
+BLOB_CHUNK_SIZE = 1024 * 1024
+
+# Open chunk sinks keyed by transfer id, fed by the exposed __dyBlobChunk binding
+_blob_sinks = {}
+_blob_transfer_ids = itertools.count(1)
+_chunk_binding_pages = weakref.WeakSet()
+
+def _on_blob_chunk(transfer_id, offset, data):
+    """Append one base64 chunk pushed from the browser to its output file"""
+    f = _blob_sinks.get(transfer_id)
+    if f is None:
+        raise Exception(f"Unknown blob transfer {transfer_id}")
+    if f.tell() != offset:
+        raise Exception(f"Out-of-order blob chunk at {offset}, expected {f.tell()}")
+    f.write(base64.b64decode(data))
+    return True
+
+def ensure_chunk_binding(page):
+    """Expose the chunk sink to the page once (expose_function can't be registered twice)"""
+    if page not in _chunk_binding_pages:
+        page.expose_function("__dyBlobChunk", _on_blob_chunk)
+        _chunk_binding_pages.add(page)
+
+def download_with_xhr(page, video_url, output_path, chunk_size=BLOB_CHUNK_SIZE):
+    """
+    Download using XMLHttpRequest (more compatible than fetch)
 
-    video_bytes = base64.b64decode(video_data)
-    with open(output_path, 'wb') as f:
-        f.write(video_bytes)
+    The blob is sliced in the browser and each piece is pushed to Python
+    through an exposed binding and appended to disk, so Python only ever
+    holds one chunk instead of the whole video as a data URL.
+    """
+    ensure_chunk_binding(page)
+
+    transfer_id = next(_blob_transfer_ids)
+    part_path = output_path + ".part"
+    try:
+        with open(part_path, 'wb') as f:
+            _blob_sinks[transfer_id] = f
+            try:
+                total_size = page.evaluate("""
+                    async ({url, transferId, chunkSize}) => {
+                        const blob = await new Promise((resolve, reject) => {
+                            const xhr = new XMLHttpRequest();
+                            xhr.open('GET', url, true);
+                            xhr.responseType = 'blob';
+                            xhr.onload = function() {
+                                if (xhr.status === 200) {
+                                    resolve(xhr.response);
+                                } else {
+                                    reject(new Error('XHR failed with status ' + xhr.status));
+                                }
+                            };
+                            xhr.onerror = () => reject(new Error('XHR network error'));
+                            xhr.send();
+                        });
+
+                        for (let offset = 0; offset < blob.size; offset += chunkSize) {
+                            const bytes = new Uint8Array(await blob.slice(offset, offset + chunkSize).arrayBuffer());
+                            let binary = '';
+                            for (let i = 0; i < bytes.length; i += 0x8000) {
+                                binary += String.fromCharCode.apply(null, bytes.subarray(i, i + 0x8000));
+                            }
+                            // Awaiting the binding gives us backpressure: one chunk in flight
+                            await window.__dyBlobChunk(transferId, offset, btoa(binary));
+                        }
+                        return blob.size;
+                    }
+                """, {"url": video_url, "transferId": transfer_id, "chunkSize": chunk_size})
+            finally:
+                del _blob_sinks[transfer_id]
+            written = f.tell()
+    except BaseException:
+        # Binding rejected or the XHR failed mid-transfer: don't leave the partial file behind
+        if os.path.exists(part_path):
+            os.remove(part_path)
+        raise
+
+    if written != total_size:
+        os.remove(part_path)
+        raise Exception(f"Blob transfer incomplete: {written}/{total_size} bytes")
+
+    os.replace(part_path, output_path)
     return True
 
 def download_from_video_element(page, video_url, output_path):
@@ -121,8 +337,8 @@ def download_from_video_element(page, video_url, output_path):
     Try to extract real video URL from network requests or video element
     This method looks for the actual mp4/m3u8 URL instead of blob URL
     """
-    # Wait a bit for video to load
-    time.sleep(2)
+    # Wait for the video to load (returns early once metadata is ready)
+    wait_for_video_ready(page)
 
     # Try to find actual video URL from network requests
     real_url = page.evaluate("""
@@ -157,269 +373,896 @@ def download_from_video_element(page, video_url, output_path):
     """)
 
     if real_url and real_url.startswith('http'):
-        # Download using requests
+        # Download with the segmented Range downloader
         print(f"  🔗 Found real URL: {real_url[:60]}...")
-        headers = {
-            'User-Agent': 'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36',
-            'Referer': 'https://www.douyin.com/'
-        }
-
-        response = requests.get(real_url, headers=headers, stream=True, timeout=30)
-        response.raise_for_status()
-
-        with open(output_path, 'wb') as f:
-            for chunk in response.iter_content(chunk_size=8192):
-                if chunk:
-                    f.write(chunk)
+        download_file(real_url, output_path)
         return True
 
     raise Exception("Could not find real video URL")
 
-def crawl_douyin(start_url, start_index=1, count=50, output_file="crawled_data.json", download_videos=True, videos_dir="videos", keep_browser_open=False):
+class CrawlRun:
     """
-    Crawls Douyin videos, extracts metadata, downloads videos, and saves to JSON.
+    State shared by every tab of one crawl: options, selector rules, the
+    metadata store, the download pool, the response tee, the media
+    validator and the content-addressed video store.
     """
-    crawled_data = []
-
-    # Create videos directory
-    if download_videos and not os.path.exists(videos_dir):
-        os.makedirs(videos_dir)
-
-    # Load existing data if file exists to avoid overwriting
-    if os.path.exists(output_file):
+    def __init__(self, output_file="crawled_data.json", download_videos=True, videos_dir="videos", download_workers=3, metadata_backend="jsonl", capture_mode="download", wait_timeouts=None, use_manifest=True, resume=True, checkpoint_dir=None, validate_media=True, faststart=False, validation_workers=2, dedupe=True, link_mode="hardlink", max_download_concurrency=8, bandwidth_limit=0, metadata_shared=False, export_metadata=True):
+        self.output_file = output_file
+        self.export_metadata = export_metadata
+        self.use_manifest = use_manifest
+        self.resume = resume
+        # Per-collection checkpoints live next to the metadata by default
+        self.checkpoint_dir = checkpoint_dir or os.path.join(os.path.dirname(output_file) or ".", ".crawl_checkpoints")
+        self.pending_owners = {}  # output_path -> (CrawlCheckpoint of the tab that queued it, url)
+        self.validation_retries = {}  # output_path -> redownloads after failed validation
+        self.download_videos = download_videos
+        self.videos_dir = videos_dir
+        self.wait_timeouts = dict(WAIT_TIMEOUTS, **(wait_timeouts or {}))
+
+        # All HTTP downloads share one adaptive concurrency limit and bandwidth cap (bytes/s, 0 = none)
+        rate.configure(initial=min(4, max_download_concurrency), max_concurrency=max_download_concurrency, bandwidth=bandwidth_limit)
+        # ...over one pooled keep-alive session; the adaptive limit, not the pool, is what binds
+        client.configure(max_per_host=max_download_concurrency)
+        self.cookies_synced_at = 0
+
+        # Create videos directory
+        if download_videos and not os.path.exists(videos_dir):
+            os.makedirs(videos_dir)
+
+        # Declarative DOM selector rules (selector_rules.json); locators are the fallback
         try:
-            with open(output_file, "r", encoding='utf-8') as f:
-                crawled_data = json.load(f)
-        except:
-            pass
-
-    # Storage for captured video URLs
-    captured_video_urls = []
-
-    # Create user data directory to persist login state
-    if not os.path.exists(BROWSER_DATA_DIR):
-        os.makedirs(BROWSER_DATA_DIR)
-        print("📁 Created browser data directory for persistent login")
-
-    with sync_playwright() as p:
-        print("Launching browser with persistent session...")
-
-        # Launch browser with persistent context
-        context = p.chromium.launch_persistent_context(
-            BROWSER_DATA_DIR,
-            headless=False,
-            args=["--start-maximized"],
-            user_agent="Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36",
-            viewport={"width": 1280, "height": 720}
-        )
-
-        page = context.pages[0] if context.pages else context.new_page()
+            self.selector_rules = load_selector_rules()
+        except Exception as e:
+            print(f"⚠️  Could not load selector rules ({e}), using locator extraction")
+            self.selector_rules = None
+
+        # Existing records in output_file are imported the first time;
+        # a shared store (several worker processes) commits every record
+        self.metadata_store = open_metadata_store(output_file, backend=metadata_backend, shared=metadata_shared)
+        self.store_lock = threading.Lock()
+
+        self.tee = None
+        if download_videos and capture_mode == "tee":
+            self.tee = ResponseTee(os.path.join(videos_dir, ".tee"))
+
+        # videos/<drama>/<episode>.mp4 become links into videos/.store
+        self.content_store = None
+        if download_videos and dedupe:
+            self.content_store = ContentStore(os.path.join(videos_dir, ".store"), link_mode=link_mode)
+
+        # Started before the download threads; workers are spawned, not forked
+        self.validator = None
+        if download_videos and validate_media:
+            self.validator = MediaValidator(self.on_media_checked, max_workers=validation_workers, faststart=faststart)
+
+        self.download_pool = None
+        if download_videos and download_workers > 0:
+            self.download_pool = DownloadWorkerPool(num_workers=download_workers, on_done=self.on_download_done, download_func=self.download_captured)
+
+    def sync_cookies(self, context, max_age=60):
+        """Refresh the download session's cookies from the browser (Playwright thread only)"""
+        if time.time() - self.cookies_synced_at < max_age:
+            return
+        try:
+            n = client.sync_cookies(context)
+            if not self.cookies_synced_at:
+                print(f"🍪 Download session uses {n} cookie(s) from the browser")
+        except Exception as e:
+            print(f"⚠️  Could not copy browser cookies: {str(e)[:100]}")
+        self.cookies_synced_at = time.time()
+
+    def record_video_info(self, video_info, updates=None):
+        """Upsert the record by URL (thread-safe)"""
+        with self.store_lock:
+            if updates:
+                video_info.update(updates)
+            self.metadata_store.upsert(video_info)
+
+    def submit_download(self, url, output_path, video_info, checkpoint=None):
+        """Queue a background download, tracking it as pending in the tab's checkpoint"""
+        with self.store_lock:
+            self.pending_owners[output_path] = (checkpoint, url)
+        if checkpoint:
+            checkpoint.add_pending(url, output_path, video_info)
+        queued = self.download_pool.submit(url, output_path, video_info)
+        if not queued:
+            with self.store_lock:
+                self.pending_owners.pop(output_path, None)
+        return queued
+
+    def on_download_done(self, video_info, updates, output_path):
+        self.record_video_info(video_info, updates)
+        with self.store_lock:
+            checkpoint, url = self.pending_owners.pop(output_path, (None, None))
+        if checkpoint:
+            checkpoint.remove_pending(output_path)
+            # A failed download is retried on the next resume
+            if updates.get("downloaded"):
+                checkpoint.clear_failed(video_info["episode_index"])
+            else:
+                checkpoint.mark_failed(video_info, url, output_path)
+        if updates.get("downloaded"):
+            self.check_media(video_info, updates.get("local_path") or output_path, url, checkpoint)
+
+    def check_media(self, video_info, output_path, url=None, checkpoint=None):
+        """Hand a finished download to the validator (url allows one redownload), then the store"""
+        if self.validator:
+            self.validator.submit(output_path, (video_info, url, checkpoint))
+        else:
+            self.store_content(video_info, output_path)
+
+    def content_ids(self, video_info):
+        return [video_info.get("video_id"), video_info.get("aweme_id")]
+
+    def link_known_content(self, video_info, output_path):
+        """If the store already has this video (by id), link it to output_path instead of downloading"""
+        if not self.content_store:
+            return False
+        sha256 = self.content_store.lookup(self.content_ids(video_info))
+        if not sha256:
+            return False
+        # Keep the stored format's extension (an HLS MPEG-TS object is a .ts)
+        ext = self.content_store.extension(sha256)
+        if ext:
+            output_path = os.path.splitext(output_path)[0] + ext
+        self.content_store.materialize(sha256, output_path, self.content_ids(video_info))
+        print(f"  🔗 Already stored as {sha256[:12]}, linked: {os.path.basename(output_path)}")
+        metrics.incr("crawl_dedup_hits_total", stage="id")
+        video_info.update({"downloaded": True, "local_path": output_path, "content_sha256": sha256})
+        return True
 
-        # Intercept network requests to capture real video URLs
-        def handle_response(response):
+    def store_content(self, video_info, output_path):
+        """Move a verified download into the content store (hashing it) and record the hash"""
+        if not self.content_store or not os.path.exists(output_path):
+            return
+        try:
+            before = self.content_store.bytes_deduplicated
+            sha256 = self.content_store.ingest(output_path, self.content_ids(video_info))
+        except Exception as e:
+            print(f"  ⚠️  Could not add {os.path.basename(output_path)} to the content store: {e}")
+            return
+        if self.content_store.bytes_deduplicated > before:
+            print(f"  ♻️  Same content already stored ({sha256[:12]}): {os.path.basename(output_path)}")
+            metrics.incr("crawl_dedup_hits_total", stage="hash")
+        self.record_video_info(video_info, {"content_sha256": sha256})
+
+    def on_media_checked(self, output_path, result, context):
+        """Validator callback: store the media summary, drop and retry broken files"""
+        video_info, url, checkpoint = context
+        name = os.path.basename(output_path)
+        media = {k: result.get(k) for k in ("valid", "error", "duration", "faststart")}
+        media["tracks"] = [t.get("type") for t in result.get("tracks", [])]
+        if result.get("faststart_applied"):
+            print(f"  🎞️  Moved moov to the front: {name}")
+            metrics.incr("crawl_media_faststart_total")
+        updates = {"media": media}
+
+        if result["valid"] is False:
+            print(f"  ❌ Invalid media ({result['error']}): {name}")
+            metrics.incr("crawl_media_invalid_total")
             try:
-                url = response.url
-                # Look for video file requests (mp4, m3u8, etc.)
-                if any(ext in url for ext in ['.mp4', '.m3u8', '/video/', 'tos-cn', 'douyinvod']):
-                    if response.status == 200 and 'video' in response.headers.get('content-type', '').lower():
-                        if url not in captured_video_urls:
-                            captured_video_urls.append(url)
-                            print(f"  🎥 Captured video URL: {url[:80]}...")
-            except:
+                os.remove(output_path)
+            except OSError:
                 pass
+            updates.update({"downloaded": False, "local_path": None})
+            with self.store_lock:
+                retries = self.validation_retries.get(output_path, 0)
+                retry = bool(url and self.download_pool and retries < 1)
+                if retry:
+                    self.validation_retries[output_path] = retries + 1
+            self.record_video_info(video_info, updates)
+            if retry:
+                print(f"  🔁 Redownloading: {name}")
+                metrics.incr("crawl_retries_total", method="media_check")
+                self.submit_download(url, output_path, video_info, checkpoint)
+            elif checkpoint:
+                checkpoint.mark_failed(video_info, url, output_path)
+            return
+
+        if result["valid"]:
+            metrics.incr("crawl_media_valid_total")
+        self.record_video_info(video_info, updates)
+        self.store_content(video_info, output_path)
+
+    def download_captured(self, url, output_path):
+        return download_direct(url, output_path, tee=self.tee)
+
+    def episode_output_path(self, video_info):
+        """videos/<drama>/<episode title>.mp4, creating the drama folder"""
+        # Extract drama name and episode title
+        drama_name = extract_drama_name(video_info["collection_raw"])
+        episode_title = extract_episode_title(video_info["title"])
+
+        # Create drama folder
+        drama_folder = os.path.join(self.videos_dir, drama_name)
+        if not os.path.exists(drama_folder):
+            os.makedirs(drama_folder)
+            print(f"  📁 Created folder: {drama_name}/")
+
+        # Generate filename
+        return os.path.join(drama_folder, f"{episode_title}.mp4")
+
+    def finish(self):
+        """Wait for queued downloads and media checks, then export the metadata"""
+        # A failed check can requeue a download, so wait until both are idle
+        while self.validator:
+            if self.download_pool:
+                self.download_pool.jobs.join()
+            self.validator.drain()
+            if not (self.download_pool and self.download_pool.jobs.unfinished_tasks):
+                break
+        # Let queued downloads finish before the session goes away
+        if self.download_pool:
+            self.download_pool.close()
+        if self.validator:
+            self.validator.close()
+        if self.content_store:
+            stats = self.content_store.stats()
+            print(f"🗄️  Content store: {stats['objects']} video(s), {stats['links']} link(s), {stats['bytes_deduplicated'] / 1024 / 1024:.2f} MB deduplicated this run")
+            self.content_store.close()
+        client.report()
+        if self.tee:
+            print(f"🪝 Reused {self.tee.bytes_teed / 1024 / 1024:.2f} MB of player traffic")
+            self.tee.discard_all()
+
+        self.metadata_store.flush()
+        if self.export_metadata:
+            export_json(self.metadata_store, self.output_file)
+            print(f"📄 Exported {len(self.metadata_store)} records to {self.output_file}")
+        self.metadata_store.close()
+        metrics.flush()
+
+class CrawlTab:
+    """
+    One page crawling one collection, with its own episode position and
+    capture registry. The crawl loop calls process_episode(), advance() and
+    wait_for_next() in turn, so several tabs can be interleaved.
+    """
+    def __init__(self, run, page, start_url, start_index=1, count=50, label=""):
+        self.run = run
+        self.page = page
+        self.start_url = start_url
+        self.start_index = start_index
+        self.count = count
+        self.label = label
+        self.i = 0
+        self.video_element = None
+        self.previous_src = None
+        self.previous_aweme_id = None
+
+        # Captured video responses keyed by video id, kept across episodes
+        self.capture_registry = CaptureRegistry()
+        # Episode manifest harvested from the detail / mix list JSON APIs
+        self.manifest = ManifestHarvester()
+
+        self.checkpoint = CrawlCheckpoint(run.checkpoint_dir, start_url, start_index, count)
+        self.resume_steps = 0     # episodes to step forward after opening the resume URL
+        self.resume_seek = None   # episode to seek to from the start URL
+        self.errors = set()       # episodes whose extraction raised
+
+    @property
+    def done(self):
+        return self.i >= self.count
+
+    def handle_response(self, response):
+        """Intercept network requests to capture real video URLs"""
+        try:
+            url = response.url
+            content_type = response.headers.get('content-type', '').lower()
+            # HLS segments belong to their playlist, which is what gets captured
+            if is_hls_segment(url, content_type):
+                return
+            # Look for video file requests (mp4, m3u8, etc.)
+            if any(ext in url for ext in ['.mp4', '.m3u8', '/video/', 'tos-cn', 'douyinvod']):
+                if is_hls_url(url) or is_hls_content_type(content_type):
+                    if response.status == 200:
+                        entry, is_new = self.capture_registry.add(url, response.headers)
+                        if is_new:
+                            print(f"  📺 {self.label}Captured HLS playlist {entry.video_id[:24]}: {url[:60]}...")
+                elif response.status in (200, 206) and 'video' in content_type:
+                    entry, is_new = self.capture_registry.add(url, response.headers)
+                    if is_new:
+                        print(f"  🎥 {self.label}Captured video {entry.video_id[:24]}: {url[:60]}...")
+                    if self.run.tee:
+                        # body() often fails on large or streamed media; the URL
+                        # is captured either way and downloaded normally
+                        try:
+                            self.run.tee.on_response(response)
+                        except Exception as e:
+                            print(f"  ⚠️  {self.label}Could not tee response body: {str(e)[:100]}")
+                            metrics.incr("crawl_fallbacks_total", reason="tee_body")
+            if self.run.use_manifest:
+                added = self.manifest.on_response(response)
+                if added:
+                    print(f"  📜 {self.label}Manifest +{added} episode(s): {self.manifest.episodes()}")
+        except:
+            pass
 
-        page.on("response", handle_response)
-
-        print(f"Navigating to start URL: {start_url}")
+    def open(self):
+        """Attach the response hook and start loading the collection (no settle wait)"""
+        self.page.on("response", self.handle_response)
+        target_url = self.start_url
+        if self.run.resume:
+            target_url = self.resume_from_checkpoint() or target_url
+            if self.done:
+                return
+        print(f"{self.label}Navigating to start URL: {target_url}")
         # Increase timeout and use domcontentloaded instead of load
-        page.goto(start_url, timeout=60000, wait_until="domcontentloaded")
-        time.sleep(5)
-
+        self.page.goto(target_url, timeout=60000, wait_until="domcontentloaded")
+
+    def resume_from_checkpoint(self):
+        """
+        Skip episodes the checkpoint already confirmed, requeue its pending
+        downloads and retry failed ones. Returns the URL to open instead of
+        start_url, or None.
+        """
+        state = self.checkpoint.load()
+        if not state:
+            return None
+
+        for output_path, job in self.checkpoint.pending().items():
+            if not self.run.download_pool:
+                break
+            print(f"  ↩️  {self.label}Requeueing unfinished download: {os.path.basename(output_path)}")
+            self.run.submit_download(job["url"], output_path, job["video_info"], self.checkpoint)
+
+        # Failed downloads with a fresh media URL are requeued once; the rest
+        # (blob sources, URLs that failed again or may have expired) need
+        # their episode revisited for a new capture
+        failed = self.checkpoint.failed()
+        revisit = []
+        for episode, job in sorted(failed.items()):
+            if not self.start_index <= episode < self.start_index + self.count:
+                continue
+            if self.run.download_pool and self.checkpoint.retry_url(job):
+                output_path = job.get("output_path") or self.run.episode_output_path(job["video_info"])
+                print(f"  ↩️  {self.label}Retrying failed download of episode {episode}: {os.path.basename(output_path)}")
+                self.run.submit_download(job["url"], output_path, job["video_info"], self.checkpoint)
+            else:
+                revisit.append(episode)
+
+        last = state.get("last_episode")
+        target = last + 1 if last is not None and last >= self.start_index else self.start_index
+        if revisit:
+            target = min(target, revisit[0])
+        if target <= self.start_index:
+            return None
+        self.i = min(target - self.start_index, self.count)
+        if self.done:
+            print(f"✓ {self.label}Checkpoint: episodes up to {last} already done for {self.start_url}")
+            return None
+
+        print(f"↩️  {self.label}Checkpoint: resuming at episode {target}" + (f" ({len(revisit)} failed episode(s) to revisit)" if revisit else ""))
+        metrics.incr("crawl_resumes_total")
+        origin = urlparse(self.start_url)
+        resuming_after_last = last is not None and target == last + 1
+        aweme_id = state.get("next_aweme_id") if resuming_after_last else (failed[target]["video_info"].get("aweme_id") if target in failed else None)
+        if aweme_id:
+            # The manifest / checkpoint knows the episode's id: open it directly
+            return f"{origin.scheme}://{origin.netloc}/video/{aweme_id}"
+        page_url = state.get("last_page_url") or ""
+        match = AWEME_URL_RE.search(page_url)
+        if resuming_after_last and match and match.group(1) == state.get("last_aweme_id"):
+            # The saved URL really is the last confirmed episode: reopen it and step once past it
+            self.resume_steps = 1
+            return page_url
+        # The player often leaves the URL unchanged, so a saved URL can point at an
+        # earlier episode: open the start URL and seek from there
+        self.resume_seek = target
+        return None
+
+    def finish_resume(self):
+        """After the page settled: step or seek to the episode the checkpoint resumes at"""
+        steps, self.resume_steps = self.resume_steps, 0
+        seek, self.resume_seek = self.resume_seek, None
+        if seek is not None:
+            entry = self.manifest.get(seek)
+            if entry:
+                origin = urlparse(self.start_url)
+                print(f"  ↩️  {self.label}Opening episode {seek} from the manifest")
+                self.page.goto(f"{origin.scheme}://{origin.netloc}/video/{entry['aweme_id']}", timeout=60000, wait_until="domcontentloaded")
+                return
+            # Not in the manifest: the start URL is episode start_index, step from there
+            steps = seek - self.start_index
+            print(f"  ↩️  {self.label}Stepping {steps} episode(s) from the start URL")
+        for _ in range(steps):
+            try:
+                self.previous_src = wait_for_video_ready(self.page, self.run.wait_timeouts["video_ready"])
+            except Exception:
+                self.previous_src = None
+            self.advance()
+            self.wait_for_next()
+
+    def confirm_episode(self, video_info, failed=None, page_url=None):
+        """
+        Move the checkpoint past the episode. The metadata store is flushed
+        first so a resume never starts past records that were not written.
+        failed: True when its download failed (retried on resume), None
+        while the download is still queued.
+        """
+        self.run.metadata_store.flush()
+        next_entry = self.manifest.get(video_info["episode_index"] + 1)
+        self.checkpoint.confirm_episode(video_info, page_url, next_entry["aweme_id"] if next_entry else None, failed)
+
+    def outstanding(self):
+        """Episodes of this tab's range that failed to extract or download (after the downloads finished)"""
+        failed = {e for e in self.checkpoint.failed() if self.start_index <= e < self.start_index + self.count}
+        return sorted(failed | self.errors)
+
+    def current_aweme_id(self, episode_index):
+        """The episode's aweme id from the manifest, else from the /video/<id> page URL"""
+        entry = self.manifest.get(episode_index)
+        if entry:
+            aweme_id = entry["aweme_id"]
+        else:
+            try:
+                match = AWEME_URL_RE.search(self.page.url)
+            except Exception:
+                match = None
+            aweme_id = match.group(1) if match else None
+            # The player doesn't always update the URL; a repeat belongs to the previous episode
+            if aweme_id == self.previous_aweme_id:
+                aweme_id = None
+        self.previous_aweme_id = aweme_id or self.previous_aweme_id
+        return aweme_id
+
+    def dismiss_login_popup(self):
         try:
-            close_btn = page.locator(".dy-account-close")
+            close_btn = self.page.locator(".dy-account-close")
             if close_btn.is_visible():
                 close_btn.click()
         except:
             pass
 
-        for i in range(count):
-            current_index = start_index + i
-            print(f"\n[Episode {current_index}] Processing...")
-
+    def process_from_manifest(self):
+        """
+        If the manifest already lists every remaining episode, schedule them
+        straight from it and finish the tab without navigating.
+        """
+        run = self.run
+        remaining = range(self.start_index + self.i, self.start_index + self.count)
+        if not run.use_manifest or not self.manifest.covers(remaining):
+            return False
+
+        print(f"\n📜 {self.label}Manifest covers episodes {remaining.start}-{remaining.stop - 1}, skipping navigation")
+        for episode in remaining:
+            entry = self.manifest.get(episode)
             video_info = {
-                "episode_index": current_index,
-                "url": None,
-                "title": f"Episode_{current_index}", # Default
-                "collection_raw": "Unknown"
+                "episode_index": episode,
+                "url": entry["play_urls"][0],
+                "title": entry["title"] or f"Episode_{episode}",
+                "collection_raw": f"短剧 · {entry['mix_name']}" if entry["mix_name"] else "Unknown",
+                "aweme_id": entry["aweme_id"],
+                "video_id": parse_video_id(entry["play_urls"][0]),
+                "source": "manifest"
             }
-
-            try:
-                page.wait_for_selector('video', timeout=10000)
-                time.sleep(2)
-
-                # 1. Extract Video Source
-                video_element = page.locator("video").first
-                video_src = video_element.get_attribute("src")
-                if not video_src:
-                     src_element = video_element.locator("source").first
-                     if src_element.count() > 0:
-                         video_src = src_element.get_attribute("src")
-
-                if video_src:
-                    video_info["url"] = video_src
-                    print(f"  URL: {video_src[:40]}...")
-
-                # 2. Extract Title (Episode Name)
-                # Try h1 first, then fallback
-                try:
-                    title_el = page.locator("h1").first
-                    if title_el.count() > 0:
-                        video_info["title"] = title_el.inner_text().strip()
-                    else:
-                        # Fallback to data-e2e
-                        desc_el = page.locator("[data-e2e='video-desc']").first
-                        if desc_el.count() > 0:
-                             video_info["title"] = desc_el.inner_text().strip()
-                except:
+            print(f"[{self.label}Episode {episode}] {video_info['title'][:40]}...")
+
+            failed = False
+            check_path = None
+            if run.download_videos:
+                output_path = run.episode_output_path(video_info)
+                existing = existing_download(output_path)
+                if existing:
+                    print(f"  ✓ Video already exists: {os.path.basename(existing)}")
+                    video_info["local_path"] = existing
+                    video_info["downloaded"] = True
+                elif run.link_known_content(video_info, output_path):
                     pass
-                print(f"  Title: {video_info['title'][:40]}...")
-
-                # 3. Extract Collection Info (Theater/Drama Name)
-                try:
-                    # Look for elements containing the middle dot
-                    collection_els = page.get_by_text("·").all()
-                    for el in collection_els:
-                        text = el.inner_text()
-                        if "短剧" in text or "剧场" in text or len(text) < 50:
-                            video_info["collection_raw"] = text.strip()
-                            break
-
-                    if video_info["collection_raw"] == "Unknown":
-                         mix_el = page.get_by_text("短剧").first
-                         if mix_el.count() > 0:
-                             parent_text = mix_el.locator("..").inner_text()
-                             if "·" in parent_text:
-                                 video_info["collection_raw"] = parent_text.strip()
-                except:
-                    pass
-                print(f"  Collection: {video_info['collection_raw']}")
-
-                # Download video if enabled
-                if video_src and download_videos:
-                    # Extract drama name and episode title
-                    drama_name = extract_drama_name(video_info["collection_raw"])
-                    episode_title = extract_episode_title(video_info["title"])
-
-                    # Create drama folder
-                    drama_folder = os.path.join(videos_dir, drama_name)
-                    if not os.path.exists(drama_folder):
-                        os.makedirs(drama_folder)
-                        print(f"  📁 Created folder: {drama_name}/")
-
-                    # Generate filename
-                    filename = f"{episode_title}.mp4"
-                    output_path = os.path.join(drama_folder, filename)
-
-                    # Check if already downloaded
-                    if os.path.exists(output_path) and os.path.getsize(output_path) > 102400:
-                        print(f"  ✓ Video already exists: {filename}")
-                        video_info["local_path"] = output_path
-                        video_info["downloaded"] = True
+                elif run.download_pool:
+                    video_info["downloaded"] = False
+                    failed = None if run.submit_download(video_info["url"], output_path, video_info, self.checkpoint) else True
+                else:
+                    try:
+                        written = run.download_captured(video_info["url"], output_path)
+                    except Exception as e:
+                        print(f"  ⚠️  Direct download failed: {str(e)[:100]}")
+                        written = None
+                    video_info["downloaded"] = bool(written)
+                    if written:
+                        video_info["local_path"] = written
+                        check_path = written
                     else:
-                        print(f"  ⬇️  Downloading video: {filename}")
+                        failed = True
 
-                        # Method 1: Try captured video URLs first
-                        download_success = False
-                        if captured_video_urls:
-                            real_url = captured_video_urls[-1]  # Get the latest captured URL
-                            print(f"  🔗 Using captured URL: {real_url[:60]}...")
-                            try:
-                                headers = {
-                                    'User-Agent': 'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36',
-                                    'Referer': 'https://www.douyin.com/'
-                                }
-                                response = requests.get(real_url, headers=headers, stream=True, timeout=30)
-                                response.raise_for_status()
+            run.record_video_info(video_info)
+            self.confirm_episode(video_info, failed)
+            if check_path:
+                # After confirming, so a failed validation stays in the checkpoint
+                run.check_media(video_info, check_path, video_info["url"], self.checkpoint)
+            metrics.incr("crawl_episodes_total")
+            metrics.incr("crawl_manifest_episodes_total")
 
-                                with open(output_path, 'wb') as f:
-                                    for chunk in response.iter_content(chunk_size=8192):
-                                        if chunk:
-                                            f.write(chunk)
+        self.i = self.count
+        return True
 
-                                if os.path.getsize(output_path) > 102400:
+    def process_episode(self):
+        """Extract, record and (queue the) download of the current episode"""
+        if self.process_from_manifest():
+            return
+        with metrics.span("episode", episode=self.start_index + self.i):
+            self._process_episode()
+
+    def _process_episode(self):
+        run = self.run
+        page = self.page
+        current_index = self.start_index + self.i
+        print(f"\n[{self.label}Episode {current_index}] Processing...")
+
+        video_info = {
+            "episode_index": current_index,
+            "url": None,
+            "title": f"Episode_{current_index}", # Default
+            "collection_raw": "Unknown"
+        }
+
+        try:
+            with metrics.span("wait_ready"):
+                page.wait_for_selector('video', timeout=run.wait_timeouts["video_ready"])
+                if not wait_for_video_ready(page, run.wait_timeouts["video_ready"]):
+                    print("  ⚠️  Video metadata not ready, extracting anyway")
+                    metrics.incr("crawl_wait_timeouts_total", stage="video_ready")
+
+            # Extract src, title, description and collection in one round-trip
+            self.video_element = page.locator("video").first
+            with metrics.span("extract"):
+                metadata = extract_episode_metadata(page, run.selector_rules)
+
+            video_src = metadata["src"]
+            if video_src:
+                video_info["url"] = video_src
+                print(f"  URL: {video_src[:40]}...")
+
+            if metadata["title"]:
+                video_info["title"] = metadata["title"]
+            print(f"  Title: {video_info['title'][:40]}...")
+
+            if metadata["description"]:
+                video_info["description"] = metadata["description"]
+            if metadata["collection"]:
+                video_info["collection_raw"] = metadata["collection"]
+            print(f"  Collection: {video_info['collection_raw']}")
+
+            aweme_id = self.current_aweme_id(current_index)
+            if aweme_id:
+                video_info["aweme_id"] = aweme_id
+            page_url = page.url
+
+            # Link the capture of the active <video> to this episode, even if
+            # we skip the download, so prefetched captures stay aligned
+            manifest_entry = self.manifest.get(current_index)
+            hint_urls = [video_src] + (manifest_entry["play_urls"] if manifest_entry else [])
+            capture = self.capture_registry.claim(current_index, hint_urls, aweme_id)
+            if capture and capture.claimed_by == "fifo":
+                # Not tied to the active video: use the URL, but not the id as a content key
+                print(f"  ⚠️  {self.label}No capture matches the active video, using the oldest unclaimed one")
+                metrics.incr("crawl_fallbacks_total", reason="capture_fifo")
+            elif capture:
+                video_info["video_id"] = capture.video_id
+
+            # Download video if enabled; failed is None while it is queued
+            failed = False
+            check_path = None
+            if video_src and run.download_videos:
+                output_path = run.episode_output_path(video_info)
+                filename = os.path.basename(output_path)
+
+                # Check if already downloaded
+                existing = existing_download(output_path)
+                if existing:
+                    print(f"  ✓ Video already exists: {os.path.basename(existing)}")
+                    video_info["local_path"] = existing
+                    video_info["downloaded"] = True
+                elif run.link_known_content(video_info, output_path):
+                    pass
+                else:
+                    print(f"  ⬇️  Downloading video: {filename}")
+
+                    # Method 1: Try captured video URLs first
+                    download_success = False
+                    queued = False
+                    if capture:
+                        real_url = capture.best_url()
+                        prefetched = len(self.capture_registry.unclaimed())
+                        print(f"  🔗 Using captured URL ({len(capture.variants)} variant(s), {prefetched} prefetched): {real_url[:60]}...")
+                        if run.download_pool:
+                            # Hand off to a background worker and keep navigating
+                            video_info["downloaded"] = False
+                            queued = run.submit_download(real_url, output_path, video_info, self.checkpoint)
+                        else:
+                            try:
+                                written = run.download_captured(real_url, output_path)
+                                if written:
                                     download_success = True
-                                    print(f"  ✅ Downloaded: {filename} ({os.path.getsize(output_path) / 1024 / 1024:.2f} MB)")
+                                    output_path = written
+                                    print(f"  ✅ Downloaded: {os.path.basename(written)} ({os.path.getsize(written) / 1024 / 1024:.2f} MB)")
                             except Exception as e:
                                 print(f"  ⚠️  Direct download failed: {str(e)[:100]}")
+                                metrics.incr("crawl_download_failures_total", path="direct")
 
-                        # Method 2: Fallback to blob download methods
-                        if not download_success:
+                    # Method 2: Fallback to blob download methods
+                    # (needs the page, so it always runs inline before navigating)
+                    if not download_success and not queued:
+                        metrics.incr("crawl_fallbacks_total", reason="blob" if capture else "blob_no_capture")
+                        with metrics.span("blob_fallback"):
                             if download_blob_video(page, video_src, output_path):
                                 download_success = True
 
-                        if download_success:
-                            video_info["local_path"] = output_path
-                            video_info["downloaded"] = True
-                        else:
-                            video_info["downloaded"] = False
+                    if download_success:
+                        video_info["local_path"] = output_path
+                        video_info["downloaded"] = True
+                        # Validated in the background once confirmed; an inline
+                        # redownload is not retried, a failure is kept for the resume
+                        check_path = output_path
+                    elif queued:
+                        failed = None
+                    else:
+                        video_info["downloaded"] = False
+                        failed = True
+
+            # Save to the metadata store and move the checkpoint forward
+            if video_src:
+                run.record_video_info(video_info)
+                self.confirm_episode(video_info, failed, page_url)
+                if check_path:
+                    run.check_media(video_info, check_path, checkpoint=self.checkpoint)
+
+        except Exception as e:
+            print(f"  Error extracting info: {e}")
+            metrics.incr("crawl_episode_failures_total", reason="extract")
+            self.errors.add(current_index)
+
+        metrics.incr("crawl_episodes_total")
+        self.previous_src = video_info["url"]
+        self.i += 1
+
+    def advance(self):
+        """Ask the player for the next episode without waiting for it"""
+        print(f"  {self.label}Navigating...")
+        page = self.page
+        with metrics.span("navigate"):
+            try:
+                page.mouse.click(100, 100)
+                if self.video_element: self.video_element.click()
+                page.keyboard.press("ArrowDown")
+            except:
+                page.mouse.wheel(0, 1000)
 
-                        # Clear captured URLs for next video
-                        captured_video_urls.clear()
+    def wait_for_next(self):
+        """Wait for change (resolves as soon as the new src has metadata)"""
+        try:
+            with metrics.span("wait_change"):
+                changed = wait_for_video_change(self.page, self.previous_src, self.run.wait_timeouts["src_change"])
+            if not changed:
+                print(f"  ⚠️  {self.label}Timed out waiting for the next episode")
+                metrics.incr("crawl_wait_timeouts_total", stage="src_change")
+        except Exception as e:
+            print(f"  ⚠️  {self.label}Wait for next episode failed: {str(e)[:100]}")
+
+def launch_context(p, profile="default"):
+    """
+    Launch the persistent (logged-in) browser context.
+    profile="lean" launches headless with a small viewport and muted audio;
+    request blocking is installed separately by RequestBlocker.
+    profile="headless" is the default profile without a window.
+    """
+    # Create user data directory to persist login state
+    if not os.path.exists(BROWSER_DATA_DIR):
+        os.makedirs(BROWSER_DATA_DIR)
+        print("📁 Created browser data directory for persistent login")
 
-                # Save to list and file
-                if video_src:
-                    # Remove duplicates by URL
-                    crawled_data = [x for x in crawled_data if x.get('url') != video_src]
-                    crawled_data.append(video_info)
+    print("Launching browser with persistent session...")
+
+    launch_options = {
+        "headless": False,
+        "args": ["--start-maximized"],
+        "viewport": {"width": 1280, "height": 720},
+    }
+    if profile == "lean":
+        launch_options.update(LEAN_LAUNCH_OPTIONS)
+    elif profile == "headless":
+        launch_options["headless"] = True
+
+    # Launch browser with persistent context
+    return p.chromium.launch_persistent_context(
+        BROWSER_DATA_DIR,
+        user_agent=BROWSER_USER_AGENT,
+        **launch_options
+    )
 
-                    # Atomic write
-                    with open(output_file, "w", encoding='utf-8') as f:
-                        json.dump(crawled_data, f, ensure_ascii=False, indent=2)
+def run_tabs(context, run, collections, max_tabs=3):
+    """
+    Crawl collections in up to max_tabs pages of one context; returns the
+    CrawlTabs.
 
-            except Exception as e:
-                print(f"  Error extracting info: {e}")
+    The sync Playwright API is single-threaded, so tabs are stepped
+    round-robin: every tab extracts its episode and presses ArrowDown, then
+    each waits for its next video. A tab's navigation overlaps with the
+    other tabs' extraction and waits, and downloads run on the worker pool.
+    """
+    pending = list(collections)
+    active = []
+    tabs = []
+    tab_number = 0
+
+    while pending or active:
+        # Open new tabs up to the concurrency cap
+        opened = []
+        while pending and len(active) < max_tabs:
+            start_url, start_index, count = pending.pop(0)
+            tab_number += 1
+            reuse_first = tab_number == 1 and context.pages
+            page = context.pages[0] if reuse_first else context.new_page()
+            label = f"Tab {tab_number} " if max_tabs > 1 else ""
+            tab = CrawlTab(run, page, start_url, start_index, count, label)
+            tab.open()
+            active.append(tab)
+            tabs.append(tab)
+            opened.append(tab)
+        if opened:
+            time.sleep(5)
+            for tab in opened:
+                tab.dismiss_login_popup()
+                tab.finish_resume()
+        # Downloads run off the Playwright thread, so cookies are copied here
+        run.sync_cookies(context)
+
+        for tab in active:
+            if not tab.done:
+                tab.process_episode()
+            if not tab.done:
+                tab.advance()
+        for tab in active:
+            if not tab.done:
+                tab.wait_for_next()
+
+        for tab in [t for t in active if t.done]:
+            active.remove(tab)
+            print(f"\n✅ {tab.label}Finished {tab.start_url}")
+            if len(context.pages) > 1:
+                tab.page.close()
+    return tabs
+
+def keep_browser_open_until_interrupted():
+    print("\n⏸️  Browser will remain open. You can:")
+    print("   - Continue browsing manually")
+    print("   - Close the browser when done")
+    print("   - Next run will reuse this login session")
+    print("\n   Press Ctrl+C to exit script (browser stays open)...")
+    try:
+        # Keep script running but allow Ctrl+C to exit
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        print("\n✅ Script exited, browser remains open")
+
+def crawl_collections(start_urls, start_index=1, count=50, max_tabs=3, keep_browser_open=False, profile="default", trace_file=None, prometheus_file=None, **run_options):
+    """
+    Crawl several collections at once in up to max_tabs pages of the same
+    logged-in persistent context.
 
-            # Navigation
-            if i < count - 1:
-                print("  Navigating...")
-                try:
-                    page.mouse.click(100, 100)
-                    if video_element: video_element.click()
-                    time.sleep(0.5)
-                    page.keyboard.press("ArrowDown")
-                except:
-                    page.mouse.wheel(0, 1000)
-
-                # Wait for change
-                previous_src = video_info["url"]
-                for _ in range(15):
-                    time.sleep(1)
-                    try:
-                        new_video = page.locator("video").first
-                        new_src = new_video.get_attribute("src")
-                        if not new_src:
-                            s = new_video.locator("source").first
-                            if s.count() > 0: new_src = s.get_attribute("src")
+    start_urls items are URLs (crawled from start_index for count episodes)
+    or (url, start_index, count) tuples. run_options are passed to CrawlRun
+    (output_file, download_videos, videos_dir, download_workers, ...).
 
-                        if new_src and new_src != previous_src:
-                            break
-                    except: pass
+    profile="lean" runs headless with a small viewport, muted/paused video
+    and a request filter that aborts images, fonts, trackers, comments and
+    ads; it reports what it blocked at the end.
+
+    trace_file / prometheus_file turn on crawl_metrics: a JSONL line per
+    stage span and a Prometheus text snapshot of counters and histograms.
+
+    Returns the number of episodes that failed to extract or download (the
+    checkpoint keeps them for the next run).
+    """
+    collections = []
+    for item in start_urls:
+        if isinstance(item, str):
+            collections.append((item, start_index, count))
+        else:
+            collections.append(tuple(item))
+
+    if trace_file or prometheus_file:
+        metrics.configure(trace_file=trace_file, prometheus_file=prometheus_file)
+
+    run = CrawlRun(**run_options)
+
+    with sync_playwright() as p:
+        context = launch_context(p, profile)
+        blocker = None
+        if profile == "lean":
+            blocker = RequestBlocker()
+            blocker.install(context)
+
+        tabs = run_tabs(context, run, collections, max_tabs=max_tabs)
+        run.finish()
+        outstanding = 0
+        for tab in tabs:
+            episodes = tab.outstanding()
+            if episodes:
+                print(f"⚠️  {tab.label}{len(episodes)} episode(s) of {tab.start_url} still failed: {episodes}")
+                outstanding += len(episodes)
+        if blocker:
+            blocker.report()
 
         # Close browser or keep it open
         if keep_browser_open:
-            print("\n⏸️  Browser will remain open. You can:")
-            print("   - Continue browsing manually")
-            print("   - Close the browser when done")
-            print("   - Next run will reuse this login session")
-            print("\n   Press Ctrl+C to exit script (browser stays open)...")
-            try:
-                # Keep script running but allow Ctrl+C to exit
-                while True:
-                    time.sleep(1)
-            except KeyboardInterrupt:
-                print("\n✅ Script exited, browser remains open")
+            keep_browser_open_until_interrupted()
         else:
             context.close()
+    return outstanding
+
+def crawl_douyin(start_url, start_index=1, count=50, output_file="crawled_data.json", download_videos=True, videos_dir="videos", keep_browser_open=False, download_workers=3, metadata_backend="jsonl", capture_mode="download", wait_timeouts=None, use_manifest=True, profile="default", trace_file=None, prometheus_file=None, resume=True, validate_media=True, faststart=False, dedupe=True, max_download_concurrency=8, bandwidth_limit=0, metadata_shared=False, export_metadata=True):
+    """
+    Crawls Douyin videos, extracts metadata, downloads videos, and saves to JSON.
+
+    Captured video URLs are downloaded by download_workers background threads
+    while the browser moves on; set download_workers=0 to download inline.
+
+    Records go to an incremental metadata store next to output_file
+    (metadata_backend "jsonl" or "sqlite"); output_file itself is exported
+    in the usual layout when the crawl finishes (unless export_metadata is
+    False). metadata_shared is for worker processes writing one sqlite store.
+
+    capture_mode="tee" saves the media responses the player already fetched
+    (reassembling its ranged partials) and only downloads what it skipped;
+    "download" fetches every captured URL again.
+
+    wait_timeouts overrides the per-stage wait timeouts (ms) from
+    page_waits.WAIT_TIMEOUTS.
+
+    With use_manifest, episodes listed in the detail / mix list JSON the page
+    fetches are downloaded straight from that manifest once it covers the
+    rest of the run, instead of navigating to each one.
+
+    profile="lean" is the headless, request-blocking profile (see
+    crawl_collections). trace_file / prometheus_file enable per-stage
+    timing spans and metrics export.
+
+    With resume, a per-collection checkpoint (.crawl_checkpoints/ next to
+    output_file) remembers the last confirmed episode, queued downloads and
+    failed episodes; a rerun with the same start_url jumps to the next
+    unfinished episode, requeues the pending and failed downloads (their
+    .part files resume) and revisits failed episodes that need the page.
+
+    With validate_media, finished downloads are checked in a process pool
+    (MP4 box structure, duration, tracks; see media_check). Broken files are
+    deleted and redownloaded once; faststart also moves moov to the front.
+
+    With dedupe, videos are kept once in videos/.store (by content hash) and
+    the drama/episode paths are hardlinks to them; episodes whose video or
+    aweme id is already stored are linked without downloading.
+
+    HTTP downloads share an adaptive concurrency limit (up to
+    max_download_concurrency requests, lowered on 403/429/5xx/timeouts),
+    an optional bandwidth_limit in bytes/s and jittered retries.
+
+    Returns the number of episodes that failed to extract or download.
+    """
+    return crawl_collections(
+        [(start_url, start_index, count)],
+        max_tabs=1,
+        keep_browser_open=keep_browser_open,
+        profile=profile,
+        trace_file=trace_file,
+        prometheus_file=prometheus_file,
+        output_file=output_file,
+        download_videos=download_videos,
+        videos_dir=videos_dir,
+        download_workers=download_workers,
+        metadata_backend=metadata_backend,
+        capture_mode=capture_mode,
+        wait_timeouts=wait_timeouts,
+        use_manifest=use_manifest,
+        resume=resume,
+        validate_media=validate_media,
+        faststart=faststart,
+        dedupe=dedupe,
+        max_download_concurrency=max_download_concurrency,
+        bandwidth_limit=bandwidth_limit,
+        metadata_shared=metadata_shared,
+        export_metadata=export_metadata
+    )
 
 if __name__ == "__main__":
     # Default values
@@ -441,15 +1284,18 @@ if __name__ == "__main__":
     if len(sys.argv) > 4:
         if sys.argv[4] == "keep-open":
             keep_open = True
+    # "lean" as any trailing flag selects the headless request-blocking profile
+    profile = "lean" if "lean" in sys.argv[3:] else "default"
 
     print("=" * 60)
     print("🎬 Douyin Video Crawler with Auto Download")
     print("=" * 60)
-    print(f"📍 Start URL: {target_url}")
+    print(f"📍 Start URL(s): {target_url}")
     print(f"📊 Start Episode: {start_idx}")
     print(f"⬇️  Download Videos: {'Yes' if enable_download else 'No'}")
     print(f"🔓 Persistent Login: Yes (cookies saved in .browser_data/)")
     print(f"⏸️  Keep Browser Open: {'Yes' if keep_open else 'No'}")
+    print(f"🪶 Profile: {profile}")
     print("=" * 60)
     print()
 
@@ -459,13 +1305,26 @@ if __name__ == "__main__":
     else:
         print("✅ Using saved login session from previous run\n")
 
-    crawl_douyin(
-        target_url,
-        start_index=start_idx,
-        count=50,
-        download_videos=enable_download,
-        keep_browser_open=keep_open
-    )
+    # Several comma-separated URLs are crawled in parallel tabs
+    target_urls = [u.strip() for u in target_url.split(",") if u.strip()]
+    if len(target_urls) > 1:
+        crawl_collections(
+            target_urls,
+            start_index=start_idx,
+            count=50,
+            download_videos=enable_download,
+            keep_browser_open=keep_open,
+            profile=profile
+        )
+    else:
+        crawl_douyin(
+            target_url,
+            start_index=start_idx,
+            count=50,
+            download_videos=enable_download,
+            keep_browser_open=keep_open,
+            profile=profile
+        )
 
     if not keep_open:
         print("\n" + "=" * 60)
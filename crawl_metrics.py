@@ -0,0 +1,181 @@
+import os
+import json
+import time
+import threading
+
+# Histogram bucket upper bounds
+LATENCY_BUCKETS = [0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60]
+SIZE_BUCKETS = [100 * 1024, 1024 * 1024, 5 * 1024 * 1024, 10 * 1024 * 1024, 50 * 1024 * 1024, 100 * 1024 * 1024]
+
+class _NoopSpan:
+    """Shared do-nothing span returned while metrics are disabled"""
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+    def set(self, **attrs):
+        pass
+
+_NOOP_SPAN = _NoopSpan()
+
+class Span:
+    """Times one stage; on exit it lands in the trace file and the stage histogram"""
+    def __init__(self, metrics, name, attrs):
+        self.metrics = metrics
+        self.name = name
+        self.attrs = attrs
+
+    def set(self, **attrs):
+        self.attrs.update(attrs)
+
+    def __enter__(self):
+        self.started_at = time.time()
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        duration = time.perf_counter() - self.started
+        self.metrics.observe("crawl_stage_seconds", duration, LATENCY_BUCKETS, stage=self.name)
+        record = {
+            "ts": self.started_at,
+            "span": self.name,
+            "duration": round(duration, 6),
+            "thread": threading.current_thread().name,
+        }
+        if self.attrs:
+            record["attrs"] = self.attrs
+        if exc_type is not None:
+            record["error"] = f"{exc_type.__name__}: {str(exc)[:200]}"
+            self.metrics.incr("crawl_stage_errors_total", stage=self.name)
+        self.metrics.trace(record)
+        return False
+
+class Metrics:
+    """
+    Spans, counters and histograms for the crawler.
+
+    Disabled by default: span() then returns a shared no-op context manager
+    and incr()/observe() return immediately, so instrumented code pays one
+    attribute check. configure() turns it on and picks the outputs: a JSONL
+    trace (one line per finished span) and a Prometheus text snapshot.
+    """
+    def __init__(self):
+        self.enabled = False
+        self.lock = threading.Lock()
+        self.counters = {}    # (name, labels) -> value
+        self.histograms = {}  # (name, labels) -> {"buckets", "counts", "sum", "count"}
+        self.trace_file = None
+        self.prometheus_file = None
+
+    def configure(self, trace_file=None, prometheus_file=None):
+        with self.lock:
+            if self.trace_file:
+                self.trace_file.close()
+            self.trace_file = open(trace_file, "a", encoding='utf-8') if trace_file else None
+            self.prometheus_file = prometheus_file
+            self.enabled = True
+
+    def reset(self):
+        with self.lock:
+            self.counters.clear()
+            self.histograms.clear()
+
+    def span(self, name, **attrs):
+        if not self.enabled:
+            return _NOOP_SPAN
+        return Span(self, name, attrs)
+
+    def incr(self, name, n=1, **labels):
+        if not self.enabled:
+            return
+        key = (name, tuple(sorted(labels.items())))
+        with self.lock:
+            self.counters[key] = self.counters.get(key, 0) + n
+
+    def observe(self, name, value, buckets=LATENCY_BUCKETS, **labels):
+        if not self.enabled:
+            return
+        key = (name, tuple(sorted(labels.items())))
+        with self.lock:
+            h = self.histograms.get(key)
+            if h is None:
+                h = {"buckets": list(buckets), "counts": [0] * len(buckets), "sum": 0.0, "count": 0}
+                self.histograms[key] = h
+            for i, bound in enumerate(h["buckets"]):
+                if value <= bound:
+                    h["counts"][i] += 1
+            h["sum"] += value
+            h["count"] += 1
+
+    def trace(self, record):
+        if self.trace_file is None:
+            return
+        line = json.dumps(record, ensure_ascii=False)
+        with self.lock:
+            self.trace_file.write(line + "\n")
+
+    def stage_summary(self):
+        """{stage: {"count", "total", "mean"}} from the stage histogram"""
+        summary = {}
+        with self.lock:
+            for (name, labels), h in self.histograms.items():
+                if name == "crawl_stage_seconds":
+                    stage = dict(labels)["stage"]
+                    summary[stage] = {"count": h["count"], "total": h["sum"], "mean": h["sum"] / h["count"] if h["count"] else 0}
+        return summary
+
+    def prometheus_text(self):
+        def fmt_labels(labels, extra=None):
+            items = list(labels) + (extra or [])
+            if not items:
+                return ""
+            return "{" + ",".join(f'{k}="{v}"' for k, v in items) + "}"
+
+        lines = []
+        with self.lock:
+            typed = set()
+            for (name, labels), value in sorted(self.counters.items()):
+                if name not in typed:
+                    lines.append(f"# TYPE {name} counter")
+                    typed.add(name)
+                lines.append(f"{name}{fmt_labels(labels)} {value}")
+            for (name, labels), h in sorted(self.histograms.items()):
+                if name not in typed:
+                    lines.append(f"# TYPE {name} histogram")
+                    typed.add(name)
+                for bound, count in zip(h["buckets"], h["counts"]):
+                    lines.append(f"{name}_bucket{fmt_labels(labels, [('le', bound)])} {count}")
+                lines.append(f"{name}_bucket{fmt_labels(labels, [('le', '+Inf')])} {h['count']}")
+                lines.append(f"{name}_sum{fmt_labels(labels)} {h['sum']}")
+                lines.append(f"{name}_count{fmt_labels(labels)} {h['count']}")
+        return "\n".join(lines) + "\n"
+
+    def write_prometheus(self, path=None):
+        path = path or self.prometheus_file
+        if not path:
+            return
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "w", encoding='utf-8') as f:
+            f.write(self.prometheus_text())
+        os.replace(tmp_path, path)
+
+    def flush(self):
+        """Flush the trace and rewrite the Prometheus snapshot"""
+        if not self.enabled:
+            return
+        with self.lock:
+            if self.trace_file:
+                self.trace_file.flush()
+        self.write_prometheus()
+
+    def close(self):
+        self.flush()
+        with self.lock:
+            if self.trace_file:
+                self.trace_file.close()
+                self.trace_file = None
+
+# Process-wide instance used by the crawler
+metrics = Metrics()
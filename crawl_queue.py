@@ -0,0 +1,356 @@
+import os
+import sys
+import json
+import time
+import shutil
+import socket
+import sqlite3
+import argparse
+import threading
+import multiprocessing
+
+DEFAULT_QUEUE_PATH = "crawl_queue.sqlite"
+DEFAULT_LEASE_SECONDS = 300
+WORKER_BROWSER_DIR = ".browser_data_workers"
+
+# Job states
+QUEUED, LEASED, DONE, FAILED = "queued", "leased", "done", "failed"
+
+class _Transaction:
+    """Connection context manager: BEGIN IMMEDIATE ... COMMIT/ROLLBACK, then close"""
+    def __init__(self, conn):
+        self.conn = conn
+
+    def __enter__(self):
+        self.conn.execute("BEGIN IMMEDIATE")
+        return self.conn
+
+    def __exit__(self, exc_type, exc, tb):
+        try:
+            self.conn.execute("ROLLBACK" if exc_type else "COMMIT")
+        finally:
+            self.conn.close()
+        return False
+
+class JobQueue:
+    """
+    SQLite-backed queue of crawl jobs (start_url, start_index, count, options).
+
+    lease() hands a queued job, or one whose lease expired, to exactly one
+    worker (BEGIN IMMEDIATE serializes concurrent leases across processes).
+    The worker extends the lease with heartbeat() while it crawls and ends
+    it with complete() or fail(). A worker that dies simply stops
+    heartbeating; once lease_until passes the job goes to the next worker,
+    until max_attempts is used up.
+    Each call opens its own connection, so one JobQueue can be shared by
+    threads and the file by processes.
+    """
+    def __init__(self, path=DEFAULT_QUEUE_PATH):
+        self.path = path
+        conn = sqlite3.connect(path, timeout=30)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.close()
+        with self._connect() as conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS jobs (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    start_url TEXT NOT NULL,
+                    start_index INTEGER NOT NULL,
+                    count INTEGER NOT NULL,
+                    options TEXT NOT NULL DEFAULT '{}',
+                    status TEXT NOT NULL,
+                    attempts INTEGER NOT NULL DEFAULT 0,
+                    max_attempts INTEGER NOT NULL,
+                    worker TEXT,
+                    lease_until REAL,
+                    error TEXT,
+                    created REAL NOT NULL,
+                    updated REAL NOT NULL
+                )
+            """)
+            conn.execute("CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status, lease_until)")
+
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        return _Transaction(conn)
+
+    def enqueue(self, start_url, start_index=1, count=50, options=None, max_attempts=3):
+        """Add a job; returns its id, or None if the same job is already queued or running"""
+        now = time.time()
+        with self._connect() as conn:
+            existing = conn.execute(
+                "SELECT id FROM jobs WHERE start_url = ? AND start_index = ? AND count = ? AND status IN (?, ?)",
+                (start_url, start_index, count, QUEUED, LEASED)
+            ).fetchone()
+            if existing:
+                return None
+            cursor = conn.execute(
+                "INSERT INTO jobs (start_url, start_index, count, options, status, max_attempts, created, updated) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (start_url, start_index, count, json.dumps(options or {}), QUEUED, max_attempts, now, now)
+            )
+            return cursor.lastrowid
+
+    def lease(self, worker, lease_seconds=DEFAULT_LEASE_SECONDS):
+        """Claim the oldest available job for worker; returns the job dict or None"""
+        now = time.time()
+        with self._connect() as conn:
+            # Expired leases that used their last attempt are given up
+            conn.execute(
+                "UPDATE jobs SET status = ?, error = COALESCE(error, 'lease expired'), updated = ? WHERE status = ? AND lease_until < ? AND attempts >= max_attempts",
+                (FAILED, now, LEASED, now)
+            )
+            row = conn.execute(
+                "SELECT * FROM jobs WHERE status = ? OR (status = ? AND lease_until < ?) ORDER BY id LIMIT 1",
+                (QUEUED, LEASED, now)
+            ).fetchone()
+            if row is None:
+                return None
+            if row["status"] == LEASED:
+                print(f"⏰ Lease of job {row['id']} held by {row['worker']} expired, taking it over")
+            conn.execute(
+                "UPDATE jobs SET status = ?, worker = ?, lease_until = ?, attempts = attempts + 1, updated = ? WHERE id = ?",
+                (LEASED, worker, now + lease_seconds, now, row["id"])
+            )
+            job = dict(row)
+        job.update({"status": LEASED, "worker": worker, "attempts": job["attempts"] + 1, "options": json.loads(job["options"])})
+        return job
+
+    def heartbeat(self, job_id, worker, lease_seconds=DEFAULT_LEASE_SECONDS):
+        """Extend the lease; False if the job is no longer leased to worker"""
+        now = time.time()
+        with self._connect() as conn:
+            cursor = conn.execute(
+                "UPDATE jobs SET lease_until = ?, updated = ? WHERE id = ? AND worker = ? AND status = ?",
+                (now + lease_seconds, now, job_id, worker, LEASED)
+            )
+            return cursor.rowcount == 1
+
+    def complete(self, job_id, worker):
+        with self._connect() as conn:
+            cursor = conn.execute(
+                "UPDATE jobs SET status = ?, lease_until = NULL, error = NULL, updated = ? WHERE id = ? AND worker = ? AND status = ?",
+                (DONE, time.time(), job_id, worker, LEASED)
+            )
+            return cursor.rowcount == 1
+
+    def fail(self, job_id, worker, error):
+        """Release the job for a retry, or mark it failed after max_attempts"""
+        with self._connect() as conn:
+            cursor = conn.execute(
+                """
+                UPDATE jobs SET
+                    status = CASE WHEN attempts >= max_attempts THEN ? ELSE ? END,
+                    lease_until = NULL, error = ?, updated = ?
+                WHERE id = ? AND worker = ? AND status = ?
+                """,
+                (FAILED, QUEUED, str(error)[:500], time.time(), job_id, worker, LEASED)
+            )
+            return cursor.rowcount == 1
+
+    def requeue(self, job_ids=None, statuses=(FAILED,), reset_attempts=True):
+        """Put jobs (by id, or every job in statuses) back in the queue; returns how many"""
+        now = time.time()
+        with self._connect() as conn:
+            if job_ids:
+                placeholders = ",".join("?" * len(job_ids))
+                where, args = f"id IN ({placeholders})", list(job_ids)
+            else:
+                placeholders = ",".join("?" * len(statuses))
+                where, args = f"status IN ({placeholders})", list(statuses)
+            attempts = "0" if reset_attempts else "attempts"
+            cursor = conn.execute(
+                f"UPDATE jobs SET status = ?, worker = NULL, lease_until = NULL, attempts = {attempts}, updated = ? WHERE {where}",
+                [QUEUED, now] + args
+            )
+            return cursor.rowcount
+
+    def jobs(self, status=None):
+        with self._connect() as conn:
+            if status:
+                rows = conn.execute("SELECT * FROM jobs WHERE status = ? ORDER BY id", (status,)).fetchall()
+            else:
+                rows = conn.execute("SELECT * FROM jobs ORDER BY id").fetchall()
+        return [dict(row) for row in rows]
+
+    def counts(self):
+        with self._connect() as conn:
+            rows = conn.execute("SELECT status, COUNT(*) FROM jobs GROUP BY status").fetchall()
+        return {row[0]: row[1] for row in rows}
+
+class LeaseHeartbeat:
+    """Background thread that keeps a job's lease alive while it is being crawled"""
+    def __init__(self, queue, job_id, worker, lease_seconds=DEFAULT_LEASE_SECONDS):
+        self.queue = queue
+        self.job_id = job_id
+        self.worker = worker
+        self.lease_seconds = lease_seconds
+        self.lost = False
+        self.stopped = threading.Event()
+        self.thread = threading.Thread(target=self._run, name=f"heartbeat-{job_id}", daemon=True)
+
+    def _run(self):
+        while not self.stopped.wait(self.lease_seconds / 3):
+            try:
+                if not self.queue.heartbeat(self.job_id, self.worker, self.lease_seconds):
+                    print(f"⚠️  Lost the lease on job {self.job_id}; another worker may take it over")
+                    self.lost = True
+                    return
+            except sqlite3.Error as e:
+                print(f"⚠️  Heartbeat for job {self.job_id} failed: {e}")
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.stopped.set()
+        self.thread.join()
+        return False
+
+def worker_browser_dir(worker_index):
+    """
+    Persistent Chromium profiles can't be shared by running browsers, so
+    each worker process gets its own copy, seeded from the login in
+    .browser_data the first time.
+    """
+    import crawl_douyin
+    path = os.path.join(os.getcwd(), WORKER_BROWSER_DIR, f"worker-{worker_index}")
+    if not os.path.exists(path) and os.path.exists(crawl_douyin.BROWSER_DATA_DIR):
+        shutil.copytree(crawl_douyin.BROWSER_DATA_DIR, path, ignore=shutil.ignore_patterns("Singleton*", "*.lock", "Cache", "Code Cache"))
+    return path
+
+def run_worker(queue_path=DEFAULT_QUEUE_PATH, worker_index=0, lease_seconds=DEFAULT_LEASE_SECONDS, poll_interval=5, exit_when_empty=True, crawl_options=None):
+    """Lease and crawl jobs until the queue is empty (or forever if exit_when_empty is False)"""
+    import crawl_douyin
+
+    queue = JobQueue(queue_path)
+    worker = f"{socket.gethostname()}:{os.getpid()}:{worker_index}"
+    if worker_index > 0:
+        crawl_douyin.BROWSER_DATA_DIR = worker_browser_dir(worker_index)
+
+    while True:
+        job = queue.lease(worker, lease_seconds)
+        if job is None:
+            if exit_when_empty:
+                print(f"✅ Worker {worker}: queue is empty")
+                return
+            time.sleep(poll_interval)
+            continue
+
+        print(f"\n▶️  Worker {worker}: job {job['id']} (attempt {job['attempts']}/{job['max_attempts']}) {job['start_url']} episodes {job['start_index']}+{job['count']}")
+        options = dict(crawl_options or {})
+        options.update(job["options"])
+        try:
+            with LeaseHeartbeat(queue, job["id"], worker, lease_seconds):
+                failed = crawl_douyin.crawl_douyin(job["start_url"], start_index=job["start_index"], count=job["count"], **options)
+        except Exception as e:
+            print(f"❌ Job {job['id']} failed: {e}")
+            queue.fail(job["id"], worker, f"{type(e).__name__}: {e}")
+            continue
+        if failed:
+            # The next attempt resumes from the checkpoint and retries only those episodes
+            print(f"❌ Job {job['id']}: {failed} episode(s) failed")
+            queue.fail(job["id"], worker, f"{failed} episode(s) failed")
+            continue
+        if queue.complete(job["id"], worker):
+            print(f"✅ Job {job['id']} done")
+        else:
+            print(f"⚠️  Job {job['id']} finished after its lease was lost")
+
+def export_shared_metadata(output_file):
+    """Export the workers' shared SQLite store to output_file"""
+    from metadata_store import open_metadata_store, export_json
+
+    store = open_metadata_store(output_file, backend="sqlite", shared=True)
+    try:
+        export_json(store, output_file)
+        print(f"📄 Exported {len(store)} records to {output_file}")
+    finally:
+        store.close()
+
+def print_jobs(jobs):
+    print(f"{'id':>5}  {'status':<8}{'try':>5}  {'episodes':<12}{'lease left':>11}  url")
+    now = time.time()
+    for job in jobs:
+        lease = ""
+        if job["status"] == LEASED and job["lease_until"]:
+            lease = f"{job['lease_until'] - now:.0f}s"
+        episodes = f"{job['start_index']}+{job['count']}"
+        print(f"{job['id']:>5}  {job['status']:<8}{job['attempts']:>2}/{job['max_attempts']:<2}  {episodes:<12}{lease:>11}  {job['start_url']}")
+        if job["error"] and job["status"] != DONE:
+            print(f"       {job['error'][:100]}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Local crawl job queue for crawl_douyin")
+    parser.add_argument("--queue", default=DEFAULT_QUEUE_PATH, help="queue database (default: %(default)s)")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    enqueue = commands.add_parser("enqueue", help="add crawl jobs")
+    enqueue.add_argument("urls", nargs="+")
+    enqueue.add_argument("--start", type=int, default=1, help="first episode")
+    enqueue.add_argument("--count", type=int, default=50, help="episodes per job")
+    enqueue.add_argument("--max-attempts", type=int, default=3)
+    enqueue.add_argument("--no-download", action="store_true")
+    enqueue.add_argument("--profile", choices=["default", "lean", "headless"], default="default")
+
+    listing = commands.add_parser("list", help="show jobs")
+    listing.add_argument("--status", choices=[QUEUED, LEASED, DONE, FAILED])
+
+    requeue = commands.add_parser("requeue", help="put jobs back in the queue")
+    requeue.add_argument("ids", nargs="*", type=int, help="job ids (default: every failed job)")
+    requeue.add_argument("--status", action="append", choices=[LEASED, DONE, FAILED], help="requeue every job with this status")
+
+    work = commands.add_parser("work", help="run worker processes until the queue is empty")
+    work.add_argument("--processes", type=int, default=1)
+    work.add_argument("--lease", type=int, default=DEFAULT_LEASE_SECONDS, help="lease length in seconds")
+    work.add_argument("--forever", action="store_true", help="keep polling when the queue is empty")
+    work.add_argument("--output", default="crawled_data.json", help="shared metadata export")
+
+    args = parser.parse_args()
+    queue = JobQueue(args.queue)
+
+    if args.command == "enqueue":
+        options = {"profile": args.profile}
+        if args.no_download:
+            options["download_videos"] = False
+        for url in args.urls:
+            job_id = queue.enqueue(url, args.start, args.count, options, args.max_attempts)
+            print(f"📥 Job {job_id}: {url}" if job_id else f"⏭️  Already queued: {url}")
+    elif args.command == "list":
+        print_jobs(queue.jobs(args.status))
+        print("\n" + ", ".join(f"{status}: {n}" for status, n in sorted(queue.counts().items())))
+    elif args.command == "requeue":
+        n = queue.requeue(job_ids=args.ids, statuses=tuple(args.status or [FAILED]))
+        print(f"↩️  Requeued {n} job(s)")
+    elif args.command == "work":
+        # Processes share one SQLite metadata store (committed per record);
+        # output is exported once, here, after the workers are done
+        crawl_options = {"output_file": args.output, "metadata_backend": "sqlite", "metadata_shared": True, "export_metadata": False}
+        if args.processes <= 1:
+            try:
+                run_worker(args.queue, 0, args.lease, exit_when_empty=not args.forever, crawl_options=crawl_options)
+            finally:
+                export_shared_metadata(args.output)
+            return
+        context = multiprocessing.get_context("spawn")
+        processes = [
+            context.Process(target=run_worker, args=(args.queue, n, args.lease, 5, not args.forever, crawl_options), name=f"crawl-worker-{n}")
+            for n in range(args.processes)
+        ]
+        for process in processes:
+            process.start()
+        try:
+            for process in processes:
+                process.join()
+        except KeyboardInterrupt:
+            print("\n⏹️  Stopping workers (their leases will expire and be picked up later)")
+            for process in processes:
+                process.terminate()
+            for process in processes:
+                process.join()
+        export_shared_metadata(args.output)
+        sys.exit(1 if any(p.exitcode for p in processes) else 0)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,143 @@
+import os
+import json
+
+SELECTOR_RULES_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "selector_rules.json")
+
+# Evaluates every field's rules in one round-trip. For each field the first
+# rule that yields a non-empty value wins. A rule is either
+#   {"selector": css, "attr": name?}      -> attribute (or innerText) of the first match
+#   {"text_contains": s, "parent": n?}    -> innerText of elements whose own text contains s
+# optionally filtered by "require" (all must pass) and "accept" (any must pass)
+# conditions of the form {"contains": s} / {"max_length": n}.
+EXTRACT_JS = """
+(rules) => {
+    const passes = (text, cond) => {
+        if (cond.contains !== undefined && !text.includes(cond.contains)) return false;
+        if (cond.max_length !== undefined && text.length >= cond.max_length) return false;
+        return true;
+    };
+    const keep = (text, rule) => {
+        if (!text) return false;
+        if (rule.require && !rule.require.every(c => passes(text, c))) return false;
+        if (rule.accept && !rule.accept.some(c => passes(text, c))) return false;
+        return true;
+    };
+    const climb = (el, n) => {
+        for (let i = 0; i < (n || 0) && el; i++) el = el.parentElement;
+        return el;
+    };
+    const candidates = (rule) => {
+        if (rule.text_contains === undefined) {
+            const el = document.querySelector(rule.selector);
+            return el ? [climb(el, rule.parent)] : [];
+        }
+        const root = rule.selector ? document.querySelector(rule.selector) : document.body;
+        if (!root) return [];
+        const found = [];
+        const walker = document.createTreeWalker(root, NodeFilter.SHOW_TEXT);
+        while (walker.nextNode()) {
+            const node = walker.currentNode;
+            if (node.nodeValue.includes(rule.text_contains) && node.parentElement) {
+                const el = climb(node.parentElement, rule.parent);
+                if (el && !found.includes(el)) found.push(el);
+            }
+        }
+        return found;
+    };
+    const result = {};
+    for (const [field, fieldRules] of Object.entries(rules)) {
+        result[field] = null;
+        for (const rule of fieldRules) {
+            for (const el of candidates(rule)) {
+                if (!el) continue;
+                let value = rule.attr ? el.getAttribute(rule.attr) : el.innerText;
+                value = value ? value.trim() : value;
+                if (keep(value, rule)) {
+                    result[field] = value;
+                    break;
+                }
+            }
+            if (result[field]) break;
+        }
+    }
+    return result;
+}
+"""
+
+def load_selector_rules(path=SELECTOR_RULES_FILE):
+    """Load the declarative selector rules; edit the JSON file to follow page changes"""
+    with open(path, "r", encoding='utf-8') as f:
+        return json.load(f)
+
+def extract_with_rules(page, rules):
+    """
+    Extract src/title/description/collection in a single page.evaluate.
+    Returns a dict with None for fields no rule matched.
+    """
+    return page.evaluate(EXTRACT_JS, rules)
+
+def extract_with_locators(page):
+    """
+    Original Playwright locator chain, one IPC call per step.
+    Kept as a fallback for when the rules stop matching.
+    """
+    result = {"src": None, "title": None, "description": None, "collection": None}
+
+    # 1. Extract Video Source
+    video_element = page.locator("video").first
+    video_src = video_element.get_attribute("src")
+    if not video_src:
+        src_element = video_element.locator("source").first
+        if src_element.count() > 0:
+            video_src = src_element.get_attribute("src")
+    result["src"] = video_src
+
+    # 2. Extract Title (Episode Name)
+    # Try h1 first, then fallback
+    try:
+        title_el = page.locator("h1").first
+        if title_el.count() > 0:
+            result["title"] = title_el.inner_text().strip()
+        else:
+            # Fallback to data-e2e
+            desc_el = page.locator("[data-e2e='video-desc']").first
+            if desc_el.count() > 0:
+                result["title"] = desc_el.inner_text().strip()
+    except:
+        pass
+
+    # 3. Extract Collection Info (Theater/Drama Name)
+    try:
+        # Look for elements containing the middle dot
+        collection_els = page.get_by_text("·").all()
+        for el in collection_els:
+            text = el.inner_text()
+            if "短剧" in text or "剧场" in text or len(text) < 50:
+                result["collection"] = text.strip()
+                break
+
+        if not result["collection"]:
+            mix_el = page.get_by_text("短剧").first
+            if mix_el.count() > 0:
+                parent_text = mix_el.locator("..").inner_text()
+                if "·" in parent_text:
+                    result["collection"] = parent_text.strip()
+    except:
+        pass
+
+    return result
+
+def extract_episode_metadata(page, rules=None):
+    """
+    Batched extraction with the rules, falling back to the locator chain
+    when the rules are unavailable, the evaluate fails or no src is found.
+    """
+    if rules:
+        try:
+            result = extract_with_rules(page, rules)
+            if result.get("src"):
+                return result
+            print("  ⚠️  Selector rules found no video src, using locator fallback")
+        except Exception as e:
+            print(f"  ⚠️  Batched extraction failed, using locator fallback: {str(e)[:100]}")
+    return extract_with_locators(page)
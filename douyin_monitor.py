@@ -0,0 +1,196 @@
+# -*- coding: utf-8 -*-
+import sys
+import time
+import asyncio
+import argparse
+from itertools import cycle
+from concurrent.futures import ThreadPoolExecutor
+from playwright.async_api import async_playwright
+
+from screen_detector import IncrementalMatcher, make_clear_detector
+from screencast_source import ScreencastFrameSource
+from episode_tracker import EpisodeTracker
+from http_client import BROWSER_USER_AGENT
+from open_douyin import BROWSER_DATA_DIR, CLEAR_BUTTON_ON, CLEAR_BUTTON_OFF, stop_screen_recording
+
+DOUYIN_URL = "https://www.douyin.com"
+
+def clear_state(matches):
+    """True 已清屏，False 未清屏（需要按 J），None 没看到按钮"""
+    on = matches.get("on", {}).get("found", False)
+    off = matches.get("off", {}).get("found", False)
+    if on:
+        # 两个都匹配到时说明阈值太低，优先认为是打开状态
+        return True
+    if off:
+        return False
+    return None
+
+def stop_recording(tab):
+    stop_screen_recording()
+
+class TabMonitor:
+    """
+    一个标签页的监控：清屏状态、各集清屏次数和停止条件，以及该页自己的
+    帧源、集数跟踪和增量匹配器（模板来自所有标签页共享的检测器）。
+    解码和模板匹配都交给线程池（OpenCV 计算时释放 GIL），事件循环只做等待。
+    """
+    def __init__(self, name, page, detector, executor, stop_at=(2, 2), on_stop=stop_recording, use_screencast=True, interval=1):
+        self.name = name
+        self.page = page
+        self.detector = detector
+        self.executor = executor
+        self.stop_at = stop_at      # (集数, 清屏次数)：达到后调用 on_stop 并停止监控该页；None 不停止
+        self.on_stop = on_stop
+        self.use_screencast = use_screencast
+        self.interval = interval
+        self.matcher = IncrementalMatcher(detector)
+        self.tracker = EpisodeTracker(page, on_change=self.on_episode_change)
+        self.source = None
+        self.clip = None
+        self.scale = None
+        self.clear_mode = None      # True 已清屏 / False 未清屏 / None 未知
+        self.counter = {}           # 集数 -> 清屏次数
+        self.clears = 0
+        self.done = False
+
+    def log(self, message):
+        print(f"[{time.strftime('%H:%M:%S')}] [{self.name}] {message}")
+
+    def on_episode_change(self, episode, previous):
+        self.log(f"当前第{episode}集")
+        if episode not in self.counter:
+            self.counter[episode] = 0
+
+    async def start(self):
+        viewport = self.page.viewport_size or await self.page.evaluate("() => ({width: window.innerWidth, height: window.innerHeight})")
+        self.scale = await self.page.evaluate("() => window.devicePixelRatio") or 1
+        self.clip = self.detector.clip_for(viewport, self.scale)
+        try:
+            await self.tracker.install_async()
+        except Exception as e:
+            self.log(f"集数跟踪启动失败: {e}")
+        if self.use_screencast:
+            try:
+                source = ScreencastFrameSource(self.page, region=self.clip, max_fps=2, lazy=True)
+                self.source = await source.start_async()
+            except Exception as e:
+                self.log(f"Screencast 启动失败，改用截图: {e}")
+                self.source = None
+
+    def match_latest(self):
+        """在线程池里运行：解码帧源的最新帧并匹配；还没有帧时返回 None"""
+        frame, clip, scale = self.source.latest()
+        if frame is None:
+            return None
+        return self.matcher.match(frame, clip, scale)
+
+    def match_screenshot(self, data):
+        """在线程池里运行：解码截图并匹配"""
+        return self.matcher.match(self.detector.decode(data), self.clip, self.scale)
+
+    async def detect(self):
+        loop = asyncio.get_running_loop()
+        if self.source is not None:
+            matches = await loop.run_in_executor(self.executor, self.match_latest)
+            if matches is not None:
+                return matches
+        data = await self.page.screenshot(clip=self.clip)
+        return await loop.run_in_executor(self.executor, self.match_screenshot, data)
+
+    async def tick(self):
+        state = clear_state(await self.detect())
+        if state is not None and state != self.clear_mode:
+            self.log("已清屏" if state else "未清屏")
+        self.clear_mode = state
+        if state is not False:
+            return
+
+        episode = self.tracker.episode
+        self.log(f"第{episode}集 - 需要清屏，发送 'J' 键" if episode is not None else "需要清屏，发送 'J' 键")
+        await self.page.keyboard.press("j")
+        self.clears += 1
+        if episode is not None:
+            self.counter[episode] = self.counter.get(episode, 0) + 1
+            self.log(f"第{episode}集 - 第{self.counter[episode]}次清屏")
+            if self.stop_at and (episode, self.counter[episode]) == tuple(self.stop_at):
+                self.log(f"第{episode}集第{self.counter[episode]}次清屏，停止监控该页")
+                self.done = True
+                await asyncio.sleep(1)  # 等待清屏完成
+                if self.on_stop is not None:
+                    # osascript 等阻塞调用放到默认线程池
+                    await asyncio.get_running_loop().run_in_executor(None, self.on_stop, self)
+                return
+        # 等待界面更新
+        await asyncio.sleep(3)
+
+    async def run(self, stop_event):
+        await self.start()
+        try:
+            while not self.done and not stop_event.is_set():
+                try:
+                    await self.tick()
+                except Exception as e:
+                    if self.page.is_closed():
+                        self.log("页面已关闭，停止监控")
+                        break
+                    self.log(f"Monitor loop error: {e}")
+                await asyncio.sleep(self.interval)
+        finally:
+            self.log(f"清屏统计: {self.counter}")
+            self.matcher.report()
+            if self.source is not None:
+                await self.source.stop_async()
+
+async def monitor_tabs(pages, stop_event=None, workers=None, **options):
+    """
+    在一个事件循环上并发监控多个页面（可来自不同 context），
+    共享模板检测器和匹配线程池；返回各页的 TabMonitor
+    """
+    detector = make_clear_detector(CLEAR_BUTTON_ON, CLEAR_BUTTON_OFF, threshold=0.95)
+    stop_event = stop_event or asyncio.Event()
+    executor = ThreadPoolExecutor(max_workers=workers or max(1, min(4, len(pages))))
+    tabs = [TabMonitor(f"tab{i + 1}", page, detector, executor, **options) for i, page in enumerate(pages)]
+    try:
+        await asyncio.gather(*(tab.run(stop_event) for tab in tabs))
+    finally:
+        executor.shutdown(wait=False)
+    return tabs
+
+async def run(urls, tabs=1, headless=False, workers=None, use_screencast=True):
+    async with async_playwright() as p:
+        print("Launching browser with persistent session...")
+        context = await p.chromium.launch_persistent_context(
+            BROWSER_DATA_DIR,
+            headless=headless,
+            args=["--start-maximized"],
+            user_agent=BROWSER_USER_AGENT,
+            viewport={"width": 1024, "height": 576}
+        )
+        pages = list(context.pages)
+        count = max(tabs, len(urls))
+        while len(pages) < count:
+            pages.append(await context.new_page())
+        pages = pages[:count]
+        for page, url in zip(pages, cycle(urls)):
+            if "douyin.com" not in page.url:
+                await page.goto(url)
+        print(f"监控 {len(pages)} 个标签页，按 Ctrl+C 停止")
+        await monitor_tabs(pages, workers=workers, use_screencast=use_screencast)
+
+def main():
+    parser = argparse.ArgumentParser(description="并发监控多个抖音标签页的清屏状态")
+    parser.add_argument("urls", nargs="*", default=[DOUYIN_URL], help="每个标签页打开的地址（不足时循环使用）")
+    parser.add_argument("--tabs", type=int, default=1, help="标签页数量")
+    parser.add_argument("--workers", type=int, default=None, help="模板匹配线程数")
+    parser.add_argument("--headless", action="store_true")
+    parser.add_argument("--no-screencast", action="store_true", help="用截图代替 screencast 帧流")
+    args = parser.parse_args()
+    try:
+        asyncio.run(run(args.urls or [DOUYIN_URL], args.tabs, args.headless, args.workers, not args.no_screencast))
+    except KeyboardInterrupt:
+        print("\n[退出] 脚本已停止")
+        sys.exit(0)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,127 @@
+# -*- coding: utf-8 -*-
+import time
+
+BINDING_NAME = "__onEpisodeChange"
+
+# 页面内脚本：找到第一个可见的、包含 "第N集" 的文本节点，只对它所在的元素挂
+# MutationObserver；集数变化时通过 binding 推送给 Python。页面替换节点
+# （切换视频）时只检查新增的子树，不会每次导出整页文本。
+TRACKER_SCRIPT = r"""
+(() => {
+  if (window.__episodeTracker) { window.__episodeTracker.rescan(); return; }
+  const PATTERN = /第(\d+)集/;
+  let last = null, target = null, scoped = null, pendingRescan = false;
+
+  function report() {
+    const text = target ? target.textContent : "";
+    const m = text.match(PATTERN);
+    if (!m) return;
+    const episode = parseInt(m[1], 10);
+    if (episode === last) return;
+    last = episode;
+    window.__onEpisodeChange({ episode, text: text.trim().slice(0, 100) });
+  }
+
+  // 和 innerText 一样跳过脚本、样式等不渲染的文本和隐藏元素（SSR 数据脚本里也有 "第N集"）
+  function rendered(node) {
+    const el = node.parentElement;
+    return !!el && !el.closest('script,style,noscript,template') && el.getClientRects().length > 0;
+  }
+
+  function findIn(root) {
+    if (root.nodeType === Node.TEXT_NODE) return PATTERN.test(root.data) && rendered(root) ? root.parentElement : null;
+    if (root.nodeType !== Node.ELEMENT_NODE) return null;
+    const walker = document.createTreeWalker(root, NodeFilter.SHOW_TEXT, {
+      acceptNode: n => !PATTERN.test(n.data) ? NodeFilter.FILTER_SKIP
+        : rendered(n) ? NodeFilter.FILTER_ACCEPT : NodeFilter.FILTER_REJECT,
+    });
+    const node = walker.nextNode();
+    return node ? node.parentElement : null;
+  }
+
+  function scope(el) {
+    if (scoped) scoped.disconnect();
+    target = el;
+    scoped = new MutationObserver(report);
+    scoped.observe(target, { characterData: true, childList: true, subtree: true });
+    report();
+  }
+
+  function rescan() {
+    pendingRescan = false;
+    const el = document.body && findIn(document.body);
+    if (el && el !== target) scope(el);
+  }
+
+  // 只看新增节点：新的集数标题出现在当前节点之前，或当前节点已被移除时重新定位
+  const watcher = new MutationObserver(mutations => {
+    for (const m of mutations) {
+      for (const n of m.addedNodes) {
+        const el = findIn(n);
+        if (!el) continue;
+        if (!target || !target.isConnected ||
+            (target.compareDocumentPosition(el) & Node.DOCUMENT_POSITION_PRECEDING)) {
+          scope(el);
+        }
+      }
+    }
+    if (target && !target.isConnected && !pendingRescan) {
+      pendingRescan = true;
+      setTimeout(rescan, 200);
+    }
+  });
+
+  function start() {
+    watcher.observe(document.body, { childList: true, subtree: true });
+    rescan();
+  }
+
+  window.__episodeTracker = { rescan };
+  if (document.body) start();
+  else document.addEventListener("DOMContentLoaded", start);
+})();
+"""
+
+class EpisodeTracker:
+    """
+    事件驱动的集数跟踪：页面内 MutationObserver 只盯着集数标题节点，
+    集数变化时经 expose_binding 推送过来，episode 始终是当前集数（未知为 None）。
+    同步 API 下推送在 Playwright 调用期间派发（截图、按键、等待等）。
+    """
+    def __init__(self, page, on_change=None):
+        self.page = page
+        self.on_change = on_change  # on_change(新集数, 旧集数)
+        self.episode = None
+        self.text = None
+        self.updated = None
+        self.changes = 0
+
+    def install(self):
+        """注册 binding 和脚本（以后每次导航自动注入），并立即在当前页面运行"""
+        try:
+            self.page.expose_binding(BINDING_NAME, self._on_event)
+        except Exception as e:
+            # 同一页面只能注册一次
+            print(f"集数 binding 注册失败: {e}")
+        self.page.add_init_script(TRACKER_SCRIPT)
+        self.page.evaluate(TRACKER_SCRIPT)
+        return self
+
+    async def install_async(self):
+        """同 install（异步 API）"""
+        try:
+            await self.page.expose_binding(BINDING_NAME, self._on_event)
+        except Exception as e:
+            print(f"集数 binding 注册失败: {e}")
+        await self.page.add_init_script(TRACKER_SCRIPT)
+        await self.page.evaluate(TRACKER_SCRIPT)
+        return self
+
+    def _on_event(self, source, payload):
+        previous = self.episode
+        self.episode = payload.get("episode")
+        self.text = payload.get("text")
+        self.updated = time.time()
+        self.changes += 1
+        if self.on_change is not None and self.episode != previous:
+            self.on_change(self.episode, previous)
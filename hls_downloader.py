@@ -0,0 +1,257 @@
+import os
+import re
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urljoin, urlparse
+
+from http_client import client, DEFAULT_HEADERS
+from video_downloader import part_paths
+from rate_control import rate
+
+HLS_CONTENT_TYPES = ('application/vnd.apple.mpegurl', 'application/x-mpegurl', 'audio/mpegurl')
+HLS_SEGMENT_CONTENT_TYPES = ('video/mp2t', 'video/iso.segment')
+HLS_SEGMENT_EXTENSIONS = ('.ts', '.m4s')
+MAX_HLS_WORKERS = 6
+
+_ATTRIBUTE_RE = re.compile(r'([A-Z0-9-]+)=("[^"]*"|[^,]*)')
+
+class HlsError(Exception):
+    """Playlist could not be parsed or downloaded"""
+
+def is_hls_url(url):
+    return urlparse(url).path.lower().endswith('.m3u8')
+
+def is_hls_content_type(content_type):
+    return (content_type or '').split(';')[0].strip().lower() in HLS_CONTENT_TYPES
+
+def is_hls_segment(url, content_type=None):
+    """A media segment of some playlist rather than a standalone video"""
+    if (content_type or '').split(';')[0].strip().lower() in HLS_SEGMENT_CONTENT_TYPES:
+        return True
+    return urlparse(url).path.lower().endswith(HLS_SEGMENT_EXTENSIONS)
+
+def is_hls_file(path):
+    """True if the file on disk is a playlist (starts with #EXTM3U)"""
+    with open(path, 'rb') as f:
+        return f.read(16).lstrip(b'\xef\xbb\xbf').startswith(b'#EXTM3U')
+
+def parse_attributes(text):
+    """'BANDWIDTH=800000,CODECS="avc1,mp4a"' -> {"BANDWIDTH": "800000", "CODECS": "avc1,mp4a"}"""
+    return {k: v.strip('"') for k, v in _ATTRIBUTE_RE.findall(text)}
+
+def parse_byterange(value, previous_end):
+    """EXT-X-BYTERANGE "<length>[@<offset>]" -> (start, end inclusive)"""
+    length, _, offset = value.partition('@')
+    start = int(offset) if offset else previous_end
+    return start, start + int(length) - 1
+
+def parse_playlist(text, base_url):
+    """
+    Parse a master or media playlist.
+
+    Master: {"type": "master", "variants": [{"url", "bandwidth", "resolution"}]}
+    Media:  {"type": "media", "segments": [{"url", "sequence", "duration",
+             "key", "byterange"}], "init": {"url", "byterange"} or None,
+             "endlist": bool}
+    Each segment carries the key in effect for it (None or {"method", "url",
+    "iv"}).
+    """
+    lines = [line.strip() for line in text.splitlines() if line.strip()]
+    if not lines or not lines[0].startswith('#EXTM3U'):
+        raise HlsError("Not an HLS playlist (missing #EXTM3U)")
+
+    variants = []
+    segments = []
+    init = None
+    key = None
+    sequence = 0
+    duration = None
+    byterange = None
+    range_end = 0
+    endlist = False
+    pending_variant = None
+
+    for line in lines[1:]:
+        if line.startswith('#EXT-X-STREAM-INF:'):
+            attrs = parse_attributes(line.split(':', 1)[1])
+            resolution = attrs.get('RESOLUTION', '')
+            width, _, height = resolution.partition('x')
+            pending_variant = {
+                "bandwidth": int(attrs.get('BANDWIDTH', 0) or 0),
+                "resolution": (int(width), int(height)) if width.isdigit() and height.isdigit() else (0, 0),
+            }
+        elif line.startswith('#EXT-X-MEDIA-SEQUENCE:'):
+            sequence = int(line.split(':', 1)[1])
+        elif line.startswith('#EXTINF:'):
+            duration = float(line.split(':', 1)[1].split(',')[0] or 0)
+        elif line.startswith('#EXT-X-BYTERANGE:'):
+            byterange = parse_byterange(line.split(':', 1)[1], range_end)
+            range_end = byterange[1] + 1
+        elif line.startswith('#EXT-X-KEY:'):
+            attrs = parse_attributes(line.split(':', 1)[1])
+            method = attrs.get('METHOD', 'NONE')
+            if method == 'NONE':
+                key = None
+            elif method == 'AES-128':
+                iv = attrs.get('IV')
+                key = {
+                    "method": method,
+                    "url": urljoin(base_url, attrs['URI']),
+                    "iv": bytes.fromhex(iv[2:] if iv.lower().startswith('0x') else iv) if iv else None,
+                }
+            else:
+                raise HlsError(f"Unsupported encryption method: {method}")
+        elif line.startswith('#EXT-X-MAP:'):
+            attrs = parse_attributes(line.split(':', 1)[1])
+            init = {"url": urljoin(base_url, attrs['URI']), "byterange": None}
+            if attrs.get('BYTERANGE'):
+                init["byterange"] = parse_byterange(attrs['BYTERANGE'], 0)
+        elif line.startswith('#EXT-X-ENDLIST'):
+            endlist = True
+        elif line.startswith('#'):
+            continue
+        elif pending_variant is not None:
+            pending_variant["url"] = urljoin(base_url, line)
+            variants.append(pending_variant)
+            pending_variant = None
+        else:
+            segments.append({
+                "url": urljoin(base_url, line),
+                "sequence": sequence,
+                "duration": duration,
+                "key": key,
+                "byterange": byterange,
+            })
+            sequence += 1
+            duration = None
+            byterange = None
+
+    if variants:
+        return {"type": "master", "variants": variants}
+    return {"type": "media", "segments": segments, "init": init, "endlist": endlist}
+
+def best_variant(variants):
+    """Highest bandwidth, then highest resolution"""
+    return max(variants, key=lambda v: (v["bandwidth"], v["resolution"][0] * v["resolution"][1]))
+
+def _fetch(url, headers, timeout=None, byterange=None, http=client):
+    request_headers = dict(headers)
+    if byterange:
+        request_headers['Range'] = f'bytes={byterange[0]}-{byterange[1]}'
+    response = http.get(url, headers=request_headers, timeout=timeout)
+    response.raise_for_status()
+    rate.throttle(len(response.content))
+    return response
+
+def fetch(url, headers, timeout=None, byterange=None, http=client):
+    """GET through the shared rate controller (concurrency slot, bandwidth cap, retries)"""
+    return rate.call(_fetch, url, headers, timeout, byterange, http)
+
+def load_media_playlist(url, headers, timeout=None, http=client):
+    """Follow a master playlist to its best variant; returns (media playlist, its url)"""
+    for _ in range(3):
+        playlist = parse_playlist(fetch(url, headers, timeout, http=http).text, url)
+        if playlist["type"] == "media":
+            return playlist, url
+        variant = best_variant(playlist["variants"])
+        print(f"  📺 HLS variant: {variant['bandwidth'] // 1000} kbps {variant['resolution'][0]}x{variant['resolution'][1]} ({len(playlist['variants'])} available)")
+        url = variant["url"]
+    raise HlsError("Too many nested master playlists")
+
+def decrypt_aes128(data, key, iv):
+    """AES-128-CBC with PKCS7 padding (needs pycryptodome)"""
+    try:
+        from Crypto.Cipher import AES
+    except ImportError:
+        raise HlsError("Encrypted HLS needs pycryptodome: pip3 install pycryptodome")
+    plain = AES.new(key, AES.MODE_CBC, iv).decrypt(data)
+    pad = plain[-1] if plain else 0
+    if 1 <= pad <= 16 and plain.endswith(bytes([pad]) * pad):
+        plain = plain[:-pad]
+    return plain
+
+class KeyCache:
+    """Fetches each AES key URI once per download"""
+    def __init__(self, headers, timeout=None, http=client):
+        self.headers = headers
+        self.timeout = timeout
+        self.http = http
+        self.keys = {}
+
+    def get(self, url):
+        if url not in self.keys:
+            key = fetch(url, self.headers, self.timeout, http=self.http).content
+            if len(key) != 16:
+                raise HlsError(f"AES-128 key must be 16 bytes, got {len(key)}")
+            self.keys[url] = key
+        return self.keys[url]
+
+def download_hls_segment(segment, key, headers, timeout=None, http=client):
+    """Fetch (and decrypt) one segment"""
+    data = fetch(segment["url"], headers, timeout, segment["byterange"], http).content
+    if key is not None:
+        iv = segment["key"]["iv"] or segment["sequence"].to_bytes(16, 'big')
+        data = decrypt_aes128(data, key, iv)
+    return data
+
+def hls_output_path(output_path, playlist):
+    """MPEG-TS streams (no EXT-X-MAP init section) are saved as .ts, not under an .mp4 name"""
+    root, ext = os.path.splitext(output_path)
+    if playlist["init"] is None and ext.lower() == ".mp4":
+        return root + ".ts"
+    return output_path
+
+def download_hls(url, output_path, headers=None, timeout=None, max_workers=MAX_HLS_WORKERS, http=client):
+    """
+    Download an HLS stream into one file.
+
+    A master playlist is resolved to its best variant. Segments are fetched
+    by max_workers threads but written strictly in playlist order; at most
+    2 * max_workers segments are held in memory at once. AES-128 segments
+    are decrypted (key per EXT-X-KEY, IV from the tag or the media sequence
+    number). An EXT-X-MAP init section is written first, so fMP4 streams
+    come out as a fragmented MP4 and MPEG-TS streams as one .ts stream.
+    Returns the path written: an MPEG-TS stream asked for as .mp4 goes to
+    the matching .ts path instead.
+    """
+    headers = headers or DEFAULT_HEADERS
+    playlist, _ = load_media_playlist(url, headers, timeout, http)
+    output_path = hls_output_path(output_path, playlist)
+    segments = playlist["segments"]
+    if not segments:
+        raise HlsError("Media playlist has no segments")
+    if not playlist["endlist"]:
+        print("  ⚠️  HLS playlist has no #EXT-X-ENDLIST (live?), saving the segments listed now")
+
+    keys = KeyCache(headers, timeout, http)
+    part_path, _ = part_paths(output_path)
+    total = len(segments)
+    written = 0
+
+    with open(part_path, 'wb') as f, ThreadPoolExecutor(max_workers=max_workers) as executor:
+        if playlist["init"]:
+            f.write(fetch(playlist["init"]["url"], headers, timeout, playlist["init"]["byterange"], http).content)
+
+        window = deque()
+        queued = iter(segments)
+        try:
+            while True:
+                while len(window) < 2 * max_workers:
+                    segment = next(queued, None)
+                    if segment is None:
+                        break
+                    key = keys.get(segment["key"]["url"]) if segment["key"] else None
+                    window.append(executor.submit(download_hls_segment, segment, key, headers, timeout, http))
+                if not window:
+                    break
+                f.write(window.popleft().result())
+                written += 1
+                if written % 20 == 0 or written == total:
+                    print(f"  🧩 HLS segments {written}/{total}")
+        except Exception:
+            for future in window:
+                future.cancel()
+            raise
+
+    os.replace(part_path, output_path)
+    return output_path
@@ -0,0 +1,101 @@
+import threading
+import requests
+from requests.adapters import HTTPAdapter
+
+# The browser and the downloader present the same identity to the CDN
+BROWSER_USER_AGENT = "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36"
+
+DEFAULT_HEADERS = {
+    'User-Agent': BROWSER_USER_AGENT,
+    'Referer': 'https://www.douyin.com/'
+}
+
+# (connect, read) seconds
+DEFAULT_TIMEOUT = (10, 30)
+MAX_CONNECTIONS_PER_HOST = 8
+MAX_HOSTS = 32
+
+class HttpClient:
+    """
+    One keep-alive requests.Session for every download path.
+
+    Connections are pooled per host (at most max_per_host open at once;
+    further requests wait for a free one), common headers and timeouts are
+    set here, and cookies can be copied from the logged-in Playwright
+    context. stats() reports how many requests reused a pooled connection.
+    """
+    def __init__(self, max_per_host=MAX_CONNECTIONS_PER_HOST, timeout=DEFAULT_TIMEOUT, headers=None):
+        self.lock = threading.Lock()
+        self.configure(max_per_host, timeout, headers)
+
+    def configure(self, max_per_host=MAX_CONNECTIONS_PER_HOST, timeout=DEFAULT_TIMEOUT, headers=None):
+        """(Re)build the session; cookies already synced are kept"""
+        with self.lock:
+            old = getattr(self, "session", None)
+            session = requests.Session()
+            session.headers.update(headers or DEFAULT_HEADERS)
+            adapter = HTTPAdapter(pool_connections=MAX_HOSTS, pool_maxsize=max_per_host, pool_block=True)
+            session.mount("https://", adapter)
+            session.mount("http://", adapter)
+            if old is not None:
+                session.cookies.update(old.cookies)
+                old.close()
+            self.session = session
+            self.adapter = adapter
+            self.timeout = timeout
+            self.max_per_host = max_per_host
+
+    def get(self, url, headers=None, timeout=None, **kwargs):
+        """session.get with the shared timeout when none is given"""
+        return self.session.get(url, headers=headers, timeout=timeout if timeout is not None else self.timeout, **kwargs)
+
+    def sync_cookies(self, context):
+        """Copy the Playwright context's cookies into the session; returns how many"""
+        cookies = context.cookies()
+        jar = self.session.cookies
+        for cookie in cookies:
+            jar.set(
+                cookie["name"],
+                cookie["value"],
+                domain=cookie.get("domain", ""),
+                path=cookie.get("path", "/"),
+                secure=cookie.get("secure", False),
+            )
+        return len(cookies)
+
+    def stats(self):
+        """{"requests", "connections", "reused", "hosts": {host: {...}}} from the urllib3 pools"""
+        hosts = {}
+        pools = self.adapter.poolmanager.pools
+        with pools.lock:
+            entries = list(pools._container.items())
+        for key, pool in entries:
+            host = f"{pool.host}:{pool.port}" if pool.port else pool.host
+            h = hosts.setdefault(host, {"requests": 0, "connections": 0})
+            h["requests"] += pool.num_requests
+            h["connections"] += pool.num_connections
+        for h in hosts.values():
+            h["reused"] = max(0, h["requests"] - h["connections"])
+        total_requests = sum(h["requests"] for h in hosts.values())
+        total_connections = sum(h["connections"] for h in hosts.values())
+        return {
+            "requests": total_requests,
+            "connections": total_connections,
+            "reused": max(0, total_requests - total_connections),
+            "hosts": hosts,
+        }
+
+    def report(self):
+        s = self.stats()
+        if not s["requests"]:
+            return
+        print(f"🔌 HTTP: {s['requests']} request(s) over {s['connections']} connection(s), {s['reused']} reused")
+        for host, h in sorted(s["hosts"].items(), key=lambda kv: -kv[1]["requests"]):
+            print(f"   {host}: {h['requests']} request(s), {h['connections']} connection(s)")
+
+    def close(self):
+        with self.lock:
+            self.session.close()
+
+# Process-wide client used by every download path
+client = HttpClient()
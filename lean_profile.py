@@ -0,0 +1,100 @@
+import threading
+from urllib.parse import urlparse
+
+# Launch options for the lean (headless, small, muted) profile
+LEAN_LAUNCH_OPTIONS = {
+    "headless": True,
+    "args": ["--mute-audio", "--disable-gpu", "--disable-extensions"],
+    "viewport": {"width": 640, "height": 360},
+}
+
+# Resource types the crawler never needs (video, scripts and XHR must load)
+LEAN_BLOCKED_RESOURCE_TYPES = {"image", "font", "texttrack", "manifest"}
+
+# Tracker / telemetry / ad hosts (suffix match)
+LEAN_BLOCKED_HOSTS = [
+    "mcs.zijieapi.com",
+    "mon.zijieapi.com",
+    "mssdk.bytedance.com",
+    "doubleclick.net",
+    "googlesyndication.com",
+    "google-analytics.com",
+]
+
+# XHR endpoints for comments, live chat and ads
+LEAN_BLOCKED_URL_PARTS = [
+    "/aweme/v1/web/comment/",
+    "/aweme/v1/web/im/",
+    "/webcast/",
+    "/aweme/v1/web/ad/",
+]
+
+# Keep videos muted and stop playback once metadata is loaded: the crawler
+# only needs the src and the first media requests, not decoded frames.
+LEAN_INIT_JS = """
+(() => {
+    document.addEventListener('play', (e) => { e.target.muted = true; }, true);
+    document.addEventListener('loadedmetadata', (e) => {
+        const video = e.target;
+        video.muted = true;
+        video.autoplay = false;
+        video.pause();
+    }, true);
+})();
+"""
+
+class RequestBlocker:
+    """
+    context.route() filter for the lean profile. Aborts non-essential
+    resource types, tracker hosts and comment/ad XHRs, and counts what it
+    blocked and how many bytes the allowed responses carried.
+    """
+    def __init__(self, resource_types=None, hosts=None, url_parts=None):
+        self.resource_types = set(resource_types if resource_types is not None else LEAN_BLOCKED_RESOURCE_TYPES)
+        self.hosts = list(hosts if hosts is not None else LEAN_BLOCKED_HOSTS)
+        self.url_parts = list(url_parts if url_parts is not None else LEAN_BLOCKED_URL_PARTS)
+        self.lock = threading.Lock()
+        self.blocked = {}        # reason -> count
+        self.allowed = 0
+        self.bytes_loaded = 0
+
+    def block_reason(self, request):
+        if request.resource_type in self.resource_types:
+            return f"type:{request.resource_type}"
+        host = urlparse(request.url).hostname or ""
+        for blocked_host in self.hosts:
+            if host == blocked_host or host.endswith("." + blocked_host):
+                return f"host:{blocked_host}"
+        for part in self.url_parts:
+            if part in request.url:
+                return f"url:{part}"
+        return None
+
+    def handle_route(self, route):
+        reason = self.block_reason(route.request)
+        with self.lock:
+            if reason:
+                self.blocked[reason] = self.blocked.get(reason, 0) + 1
+            else:
+                self.allowed += 1
+        if reason:
+            route.abort()
+        else:
+            route.continue_()
+
+    def handle_response(self, response):
+        length = response.headers.get('content-length', '')
+        if length.isdigit():
+            with self.lock:
+                self.bytes_loaded += int(length)
+
+    def install(self, context):
+        context.route("**/*", self.handle_route)
+        context.on("response", self.handle_response)
+        context.add_init_script(LEAN_INIT_JS)
+
+    def report(self):
+        total_blocked = sum(self.blocked.values())
+        print(f"🪶 Lean profile: blocked {total_blocked} request(s), allowed {self.allowed} ({self.bytes_loaded / 1024 / 1024:.2f} MB loaded)")
+        for reason, n in sorted(self.blocked.items(), key=lambda kv: -kv[1]):
+            print(f"   {reason}: {n}")
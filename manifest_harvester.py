@@ -0,0 +1,99 @@
+import re
+import threading
+
+# JSON endpoints the web player uses for video details and collection (mix) lists
+API_MARKERS = ['/aweme/v1/web/aweme/detail', '/aweme/v1/web/mix/aweme', '/aweme/v1/web/mix/detail', '/aweme/v1/web/aweme/related']
+
+EPISODE_RE = re.compile(r'第(\d+)集')
+
+def iter_awemes(payload):
+    """Yield every aweme (video) dict found in an API payload"""
+    if isinstance(payload, dict):
+        if payload.get("aweme_id") and isinstance(payload.get("video"), dict):
+            yield payload
+            return
+        for value in payload.values():
+            yield from iter_awemes(value)
+    elif isinstance(payload, list):
+        for item in payload:
+            yield from iter_awemes(item)
+
+def play_urls(aweme):
+    """Candidate play URLs, highest bitrate variant first"""
+    video = aweme.get("video") or {}
+    urls = []
+    variants = sorted(video.get("bit_rate") or [], key=lambda b: b.get("bit_rate") or 0, reverse=True)
+    for variant in variants:
+        urls.extend((variant.get("play_addr") or {}).get("url_list") or [])
+    urls.extend((video.get("play_addr") or {}).get("url_list") or [])
+    seen = set()
+    return [u for u in urls if u.startswith("http") and not (u in seen or seen.add(u))]
+
+def parse_aweme(aweme):
+    """Manifest entry for one aweme, or None if it isn't part of a collection episode"""
+    mix_info = aweme.get("mix_info") or {}
+    desc = aweme.get("desc") or ""
+    episode = (mix_info.get("statis") or {}).get("current_episode")
+    if not episode:
+        match = EPISODE_RE.search(desc)
+        episode = int(match.group(1)) if match else None
+    if not episode:
+        return None
+    return {
+        "aweme_id": aweme["aweme_id"],
+        "mix_id": mix_info.get("mix_id"),
+        "mix_name": mix_info.get("mix_name"),
+        "episode": int(episode),
+        "title": desc,
+        "duration": (aweme.get("video") or {}).get("duration"),
+        "play_urls": play_urls(aweme),
+    }
+
+class ManifestHarvester:
+    """
+    Builds a collection manifest (episode -> ids, title, play URLs) from the
+    JSON the page fetches anyway. Feed it from the page's "response" hook.
+    """
+    def __init__(self):
+        self.entries = {}  # (mix_id, episode) -> entry
+        self.current_mix_id = None
+        self.lock = threading.Lock()
+
+    def on_response(self, response):
+        """Harvest a JSON API response; returns the number of entries added"""
+        if not any(marker in response.url for marker in API_MARKERS):
+            return 0
+        if 'json' not in response.headers.get('content-type', '').lower():
+            return 0
+        return self.add_payload(response.json(), is_detail='/aweme/detail' in response.url)
+
+    def add_payload(self, payload, is_detail=False):
+        added = 0
+        with self.lock:
+            for aweme in iter_awemes(payload):
+                entry = parse_aweme(aweme)
+                if not entry or not entry["play_urls"]:
+                    continue
+                if is_detail and entry["mix_id"]:
+                    # The detail call is for the video the page opened on
+                    self.current_mix_id = entry["mix_id"]
+                key = (entry["mix_id"], entry["episode"])
+                if key not in self.entries:
+                    added += 1
+                self.entries[key] = entry
+        return added
+
+    def get(self, episode, mix_id=None):
+        with self.lock:
+            return self.entries.get((mix_id or self.current_mix_id, episode))
+
+    def covers(self, episodes, mix_id=None):
+        """True if every episode number is in the manifest"""
+        with self.lock:
+            mix_id = mix_id or self.current_mix_id
+            return mix_id is not None and all((mix_id, e) in self.entries for e in episodes)
+
+    def episodes(self, mix_id=None):
+        with self.lock:
+            mix_id = mix_id or self.current_mix_id
+            return sorted(e["episode"] for (m, _), e in self.entries.items() if m == mix_id)
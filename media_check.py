@@ -0,0 +1,291 @@
+import os
+import struct
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+# Boxes whose payload is a list of child boxes
+CONTAINER_BOXES = {b'moov', b'trak', b'mdia', b'minf', b'stbl', b'edts', b'dinf', b'mvex', b'moof', b'traf'}
+
+class Mp4Error(Exception):
+    """File is not a complete, well-formed MP4"""
+
+def iter_boxes(f, start, end):
+    """Yield (type, box_start, header_size, box_size) for boxes in [start, end)"""
+    pos = start
+    while pos + 8 <= end:
+        f.seek(pos)
+        header = f.read(8)
+        if len(header) < 8:
+            raise Mp4Error(f"Truncated box header at {pos}")
+        size, box_type = struct.unpack('>I4s', header)
+        header_size = 8
+        if size == 1:
+            large = f.read(8)
+            if len(large) < 8:
+                raise Mp4Error(f"Truncated large box header at {pos}")
+            size = struct.unpack('>Q', large)[0]
+            header_size = 16
+        elif size == 0:
+            size = end - pos
+        if size < header_size:
+            raise Mp4Error(f"Invalid size {size} for box {box_type!r} at {pos}")
+        if pos + size > end:
+            raise Mp4Error(f"Box {box_type.decode('latin-1')} at {pos} runs past end of file ({pos + size} > {end})")
+        yield box_type, pos, header_size, size
+        pos += size
+    if pos != end:
+        raise Mp4Error(f"{end - pos} trailing bytes after last box")
+
+def top_level_boxes(path):
+    """[(type, start, header_size, size)] for the top level; raises Mp4Error if truncated"""
+    size = os.path.getsize(path)
+    with open(path, 'rb') as f:
+        return list(iter_boxes(f, 0, size))
+
+def is_mp4(path):
+    """True if the file starts with an ftyp box"""
+    with open(path, 'rb') as f:
+        return f.read(8)[4:8] == b'ftyp'
+
+def is_complete_mp4(path):
+    """Cheap structural check (top-level headers only): ftyp, moov and mdat present, nothing truncated"""
+    try:
+        types = {t for t, _, _, _ in top_level_boxes(path)}
+    except (Mp4Error, OSError):
+        return False
+    return {b'ftyp', b'moov', b'mdat'} <= types
+
+def is_truncated_mp4(path):
+    """An MP4 (by its ftyp) whose top-level structure is incomplete; other formats are not judged"""
+    try:
+        return is_mp4(path) and not is_complete_mp4(path)
+    except OSError:
+        return False
+
+def _full_box(data):
+    """(version, payload after version/flags)"""
+    return data[0], data[4:]
+
+def parse_mvhd(data):
+    version, body = _full_box(data)
+    if version == 1:
+        timescale, duration = struct.unpack('>IQ', body[16:28])
+    else:
+        timescale, duration = struct.unpack('>II', body[8:16])
+    return timescale, duration
+
+def parse_tkhd(data):
+    version, body = _full_box(data)
+    if version == 1:
+        track_id = struct.unpack('>I', body[16:20])[0]
+    else:
+        track_id = struct.unpack('>I', body[8:12])[0]
+    width, height = struct.unpack('>II', data[-8:])
+    return track_id, width / 65536.0, height / 65536.0
+
+def parse_moov(moov):
+    """Duration and track info from the moov payload"""
+    info = {"duration": None, "tracks": []}
+
+    def walk(buf):
+        pos = 0
+        while pos + 8 <= len(buf):
+            size, box_type = struct.unpack('>I4s', buf[pos:pos + 8])
+            header = 8
+            if size == 1:
+                size = struct.unpack('>Q', buf[pos + 8:pos + 16])[0]
+                header = 16
+            elif size == 0:
+                size = len(buf) - pos
+            if size < header or pos + size > len(buf):
+                raise Mp4Error(f"Corrupt {box_type!r} inside moov")
+            payload = buf[pos + header:pos + size]
+            if box_type == b'mvhd':
+                timescale, duration = parse_mvhd(payload)
+                if timescale:
+                    info["duration"] = duration / timescale
+            elif box_type == b'trak':
+                info["tracks"].append({})
+                walk(payload)
+            elif box_type == b'tkhd' and info["tracks"]:
+                track_id, width, height = parse_tkhd(payload)
+                info["tracks"][-1].update({"id": track_id, "width": width, "height": height})
+            elif box_type == b'mdhd' and info["tracks"]:
+                timescale, duration = parse_mvhd(payload)
+                if timescale:
+                    info["tracks"][-1]["duration"] = duration / timescale
+            elif box_type == b'hdlr' and info["tracks"]:
+                info["tracks"][-1]["type"] = payload[8:12].decode('latin-1')
+            elif box_type in CONTAINER_BOXES:
+                walk(payload)
+            pos += size
+
+    walk(moov)
+    return info
+
+def validate_mp4(path):
+    """
+    Parse the MP4 box structure. Returns a dict with "valid", "error",
+    "boxes", "duration", "tracks", "faststart" (moov before mdat) and "size".
+    Files that don't start with ftyp (HLS .ts, WebM, ...) get valid=None:
+    they are not MP4, so they are neither accepted nor rejected here.
+    """
+    result = {"valid": False, "error": None, "boxes": [], "duration": None, "tracks": [], "faststart": False, "size": None}
+    try:
+        result["size"] = os.path.getsize(path)
+        if not is_mp4(path):
+            result["valid"] = None
+            result["error"] = "Not an MP4 (no ftyp box), skipped"
+            return result
+        boxes = top_level_boxes(path)
+        result["boxes"] = [t.decode('latin-1') for t, _, _, _ in boxes]
+        by_type = {}
+        for box_type, start, header_size, size in boxes:
+            by_type.setdefault(box_type, (start, header_size, size))
+        for required in (b'ftyp', b'moov', b'mdat'):
+            if required not in by_type:
+                raise Mp4Error(f"Missing {required.decode()} box")
+
+        moov_start, moov_header, moov_size = by_type[b'moov']
+        with open(path, 'rb') as f:
+            f.seek(moov_start + moov_header)
+            moov = f.read(moov_size - moov_header)
+        info = parse_moov(moov)
+        if not info["tracks"]:
+            raise Mp4Error("moov has no tracks")
+        # Fragmented MP4 (e.g. concatenated fMP4 HLS) keeps its duration in the fragments
+        if not info["duration"] and b'moof' not in by_type:
+            raise Mp4Error("Zero duration")
+
+        result.update(info)
+        result["faststart"] = moov_start < by_type[b'mdat'][0]
+        result["valid"] = True
+    except (Mp4Error, OSError, struct.error) as e:
+        result["error"] = str(e)
+    return result
+
+def _patch_chunk_offsets(moov, delta):
+    """Add delta to every stco/co64 entry in a moov payload (bytearray, in place)"""
+    def walk(start, end):
+        pos = start
+        while pos + 8 <= end:
+            size, box_type = struct.unpack('>I4s', moov[pos:pos + 8])
+            header = 8
+            if size == 1:
+                size = struct.unpack('>Q', moov[pos + 8:pos + 16])[0]
+                header = 16
+            elif size == 0:
+                size = end - pos
+            body = pos + header
+            if box_type == b'stco':
+                count = struct.unpack('>I', moov[body + 4:body + 8])[0]
+                for i in range(count):
+                    at = body + 8 + i * 4
+                    offset = struct.unpack('>I', moov[at:at + 4])[0] + delta
+                    if offset > 0xFFFFFFFF:
+                        raise Mp4Error("Chunk offset overflows stco after faststart")
+                    moov[at:at + 4] = struct.pack('>I', offset)
+            elif box_type == b'co64':
+                count = struct.unpack('>I', moov[body + 4:body + 8])[0]
+                for i in range(count):
+                    at = body + 8 + i * 8
+                    moov[at:at + 8] = struct.pack('>Q', struct.unpack('>Q', moov[at:at + 8])[0] + delta)
+            elif box_type in CONTAINER_BOXES:
+                walk(body, pos + size)
+            pos += size
+    walk(0, len(moov))
+
+def faststart_mp4(path):
+    """
+    Move moov in front of mdat so playback can start before the whole file
+    is downloaded. Returns True if the file was rewritten.
+    """
+    boxes = top_level_boxes(path)
+    types = [t for t, _, _, _ in boxes]
+    if b'moov' not in types or b'mdat' not in types or types.index(b'moov') < types.index(b'mdat'):
+        return False
+
+    moov_entry = boxes[types.index(b'moov')]
+    first_mdat = types.index(b'mdat')
+    with open(path, 'rb') as f:
+        f.seek(moov_entry[1])
+        moov = bytearray(f.read(moov_entry[3]))
+    # Everything from the first mdat onwards shifts right by the moov size
+    body = bytearray(moov[moov_entry[2]:])
+    _patch_chunk_offsets(body, moov_entry[3])
+    moov = moov[:moov_entry[2]] + body
+
+    tmp_path = path + ".faststart"
+    with open(path, 'rb') as src, open(tmp_path, 'wb') as dst:
+        for i, (box_type, start, header_size, size) in enumerate(boxes):
+            if i == first_mdat:
+                dst.write(moov)
+            if box_type == b'moov':
+                continue
+            src.seek(start)
+            remaining = size
+            while remaining:
+                chunk = src.read(min(remaining, 1024 * 1024))
+                if not chunk:
+                    raise Mp4Error("File shrank while rewriting")
+                dst.write(chunk)
+                remaining -= len(chunk)
+    os.replace(tmp_path, path)
+    return True
+
+def check_media(path, faststart=False):
+    """Process-pool job: validate, optionally relocate moov, and re-validate"""
+    result = validate_mp4(path)
+    if result["valid"] and faststart and not result["faststart"]:
+        try:
+            if faststart_mp4(path):
+                result = validate_mp4(path)
+                result["faststart_applied"] = True
+        except (Mp4Error, OSError, struct.error) as e:
+            result["faststart_error"] = str(e)
+    return result
+
+class MediaValidator:
+    """
+    Runs check_media() for finished downloads in a process pool so box
+    parsing and moov relocation never block the crawl loop. on_result(path,
+    result, context) is called from a pool callback thread.
+    """
+    def __init__(self, on_result, max_workers=2, faststart=False):
+        # spawn, not fork: the crawler process has Playwright and download threads running
+        self.executor = ProcessPoolExecutor(max_workers=max_workers, mp_context=multiprocessing.get_context("spawn"))
+        self.on_result = on_result
+        self.faststart = faststart
+        self.pending = 0
+        self.idle = threading.Condition()
+
+    def submit(self, path, context=None):
+        with self.idle:
+            self.pending += 1
+        future = self.executor.submit(check_media, path, self.faststart)
+        future.add_done_callback(lambda f: self._done(f, path, context))
+
+    def _done(self, future, path, context):
+        try:
+            try:
+                result = future.result()
+            except Exception as e:
+                result = {"valid": False, "error": f"validator crashed: {e}"}
+            self.on_result(path, result, context)
+        except Exception as e:
+            print(f"  ⚠️  Failed to handle validation of {os.path.basename(path)}: {e}")
+        finally:
+            with self.idle:
+                self.pending -= 1
+                self.idle.notify_all()
+
+    def drain(self):
+        """Block until every submitted check (and its callback) has finished"""
+        with self.idle:
+            while self.pending:
+                self.idle.wait()
+
+    def close(self):
+        self.drain()
+        self.executor.shutdown(wait=True)
@@ -0,0 +1,253 @@
+import os
+import json
+import sqlite3
+import tempfile
+import threading
+
+class JsonlMetadataStore:
+    """
+    Append-only JSONL metadata store with an in-memory URL index.
+
+    Every upsert appends one line; the latest line for a URL wins when the
+    file is reloaded. Writes are buffered and flushed (with fsync) every
+    batch_size records, and a torn last line from a crash is cut off on load.
+    """
+    def __init__(self, path, batch_size=20):
+        self.path = path
+        self.batch_size = batch_size
+        self.lock = threading.Lock()
+        self.index = {}       # url -> record (dict preserves last-upsert order)
+        self.by_episode = {}  # episode_index -> url
+        self.pending = []
+        self.lines = 0
+        self._load()
+        self.f = open(path, "a", encoding='utf-8')
+
+    def _load(self):
+        if not os.path.exists(self.path):
+            return
+        with open(self.path, "rb") as f:
+            data = f.read()
+        end = data.rfind(b"\n") + 1
+        tail = data[end:]
+        if tail.strip():
+            try:
+                json.loads(tail.decode('utf-8'))
+                # Complete record that just lacks its newline: keep it
+                with open(self.path, "ab") as f:
+                    f.write(b"\n")
+                end = len(data)
+            except ValueError:
+                # Partially written line from an interrupted run: cut it off
+                # so the next append starts on a fresh line
+                print(f"⚠️  Dropping torn last line of {self.path}")
+                with open(self.path, "r+b") as f:
+                    f.truncate(end)
+        for line in data[:end].decode('utf-8', errors='replace').splitlines():
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                record = json.loads(line)
+            except ValueError:
+                continue
+            self.lines += 1
+            self._index(record)
+
+    def _index(self, record):
+        url = record.get("url")
+        self.index.pop(url, None)
+        self.index[url] = record
+        if record.get("episode_index") is not None:
+            self.by_episode[record["episode_index"]] = url
+
+    def __len__(self):
+        return len(self.index)
+
+    def __contains__(self, url):
+        return url in self.index
+
+    def get(self, url):
+        return self.index.get(url)
+
+    def find_episode(self, episode_index):
+        url = self.by_episode.get(episode_index)
+        return self.index.get(url) if url is not None else None
+
+    def records(self):
+        with self.lock:
+            return list(self.index.values())
+
+    def upsert(self, record):
+        with self.lock:
+            self._index(dict(record))
+            self.pending.append(json.dumps(record, ensure_ascii=False))
+            if len(self.pending) >= self.batch_size:
+                self._flush()
+
+    def _flush(self):
+        if not self.pending:
+            return
+        self.f.write("\n".join(self.pending) + "\n")
+        self.f.flush()
+        os.fsync(self.f.fileno())
+        self.lines += len(self.pending)
+        self.pending = []
+
+    def flush(self):
+        with self.lock:
+            self._flush()
+
+    def compact(self):
+        """Rewrite the file with one line per URL"""
+        with self.lock:
+            self._flush()
+            self.f.close()
+            tmp_path = self.path + ".tmp"
+            with open(tmp_path, "w", encoding='utf-8') as f:
+                for record in self.index.values():
+                    f.write(json.dumps(record, ensure_ascii=False) + "\n")
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, self.path)
+            self.lines = len(self.index)
+            self.f = open(self.path, "a", encoding='utf-8')
+
+    def close(self):
+        self.flush()
+        # Drop superseded lines once they make up most of the file
+        if self.lines > 2 * len(self.index):
+            self.compact()
+        self.f.close()
+
+class SqliteMetadataStore:
+    """
+    SQLite metadata store with the URL as unique key.
+
+    Upserts are committed every batch_size records. seq records the order
+    of the latest upsert so exports keep the crawl order.
+
+    With shared (several processes on one file) every upsert is committed
+    at once, so no process holds the write lock between records; writers
+    wait up to busy_timeout seconds for each other.
+    """
+    def __init__(self, path, batch_size=20, shared=False, busy_timeout=30):
+        self.path = path
+        self.batch_size = 1 if shared else batch_size
+        self.lock = threading.Lock()
+        self.uncommitted = 0
+        self.conn = sqlite3.connect(path, timeout=busy_timeout, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS records (
+                url TEXT PRIMARY KEY,
+                episode_index INTEGER,
+                seq INTEGER NOT NULL,
+                data TEXT NOT NULL
+            )
+        """)
+        self.conn.execute("CREATE INDEX IF NOT EXISTS records_episode ON records (episode_index)")
+        self.conn.commit()
+        row = self.conn.execute("SELECT COALESCE(MAX(seq), 0) FROM records").fetchone()
+        self.seq = row[0]
+
+    def __len__(self):
+        with self.lock:
+            return self.conn.execute("SELECT COUNT(*) FROM records").fetchone()[0]
+
+    def __contains__(self, url):
+        return self.get(url) is not None
+
+    def get(self, url):
+        with self.lock:
+            row = self.conn.execute("SELECT data FROM records WHERE url = ?", (url,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def find_episode(self, episode_index):
+        with self.lock:
+            row = self.conn.execute(
+                "SELECT data FROM records WHERE episode_index = ? ORDER BY seq DESC LIMIT 1",
+                (episode_index,)
+            ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def records(self):
+        with self.lock:
+            rows = self.conn.execute("SELECT data FROM records ORDER BY seq").fetchall()
+        return [json.loads(row[0]) for row in rows]
+
+    def upsert(self, record):
+        with self.lock:
+            self.seq += 1
+            self.conn.execute(
+                """
+                INSERT INTO records (url, episode_index, seq, data) VALUES (?, ?, ?, ?)
+                ON CONFLICT(url) DO UPDATE SET
+                    episode_index = excluded.episode_index,
+                    seq = excluded.seq,
+                    data = excluded.data
+                """,
+                (record.get("url"), record.get("episode_index"), self.seq, json.dumps(record, ensure_ascii=False))
+            )
+            self.uncommitted += 1
+            if self.uncommitted >= self.batch_size:
+                self.conn.commit()
+                self.uncommitted = 0
+
+    def flush(self):
+        with self.lock:
+            self.conn.commit()
+            self.uncommitted = 0
+
+    def close(self):
+        self.flush()
+        self.conn.close()
+
+METADATA_BACKENDS = {
+    "jsonl": (JsonlMetadataStore, ".jsonl"),
+    "sqlite": (SqliteMetadataStore, ".sqlite"),
+}
+
+def open_metadata_store(output_file, backend="jsonl", batch_size=20, shared=False):
+    """
+    Open the metadata store that sits next to output_file
+    (crawled_data.json -> crawled_data.jsonl / crawled_data.sqlite).
+
+    A fresh store is seeded from an existing output_file so switching
+    backends keeps previously crawled records. shared (sqlite only) is for
+    several processes writing the same store.
+    """
+    if backend not in METADATA_BACKENDS:
+        raise ValueError(f"Unknown metadata backend: {backend} (choose from {', '.join(METADATA_BACKENDS)})")
+    if shared and backend != "sqlite":
+        raise ValueError("Only the sqlite metadata backend can be shared between processes")
+    store_class, ext = METADATA_BACKENDS[backend]
+    store_path = os.path.splitext(output_file)[0] + ext
+    is_new = not os.path.exists(store_path)
+    store = store_class(store_path, batch_size=batch_size, shared=True) if shared else store_class(store_path, batch_size=batch_size)
+
+    if is_new and os.path.exists(output_file):
+        try:
+            with open(output_file, "r", encoding='utf-8') as f:
+                for record in json.load(f):
+                    store.upsert(record)
+            store.flush()
+            print(f"📥 Imported {len(store)} records from {output_file}")
+        except Exception as e:
+            print(f"⚠️  Could not import {output_file}: {e}")
+    return store
+
+def export_json(store, output_file):
+    """Write the store out in the crawled_data.json layout (list, indent=2)"""
+    # A unique temp file, so concurrent exports never write into each other
+    fd, tmp_path = tempfile.mkstemp(prefix=os.path.basename(output_file) + ".", suffix=".tmp", dir=os.path.dirname(output_file) or ".")
+    try:
+        with os.fdopen(fd, "w", encoding='utf-8') as f:
+            json.dump(store.records(), f, ensure_ascii=False, indent=2)
+        # mkstemp creates the file owner-only; keep the usual permissions
+        os.chmod(tmp_path, 0o644)
+        os.replace(tmp_path, output_file)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
@@ -5,10 +5,9 @@ import os
 import threading
 import time
 import subprocess
-import cv2
-import numpy as np
-from PIL import Image
-import io
+from screen_detector import TemplateDetector, IncrementalMatcher, make_clear_detector
+from screencast_source import ScreencastFrameSource
+from episode_tracker import EpisodeTracker
 
 # Configuration
 BROWSER_DATA_DIR = os.path.join(os.getcwd(), ".browser_data")
@@ -18,43 +17,24 @@ CLEAR_BUTTON_ON = "/Users/zhutaoyu/Downloads/clear-open.png"  # 清屏按钮打
 # 清屏计数器：记录每一集的清屏次数
 clear_screen_counter = {}
 
+# 单模板检测器缓存（find_image_on_screen 用），模板只读取一次
+_single_detectors = {}
+
 def find_image_on_screen(page, template_path, threshold=0.8):
     """
     在屏幕截图底部区域中查找模板图片
     返回: True 如果找到, False 如果未找到
+    多个模板请用 TemplateDetector，一次截图匹配全部模板
     """
     try:
-        # 读取模板图片
-        template = cv2.imread(template_path)
-        if template is None:
-            print(f"无法读取模板图片: {template_path}")
-            return False
-
-        template_height = template.shape[0]
-        template_width = template.shape[1]
-
-        # 截取当前页面
-        screenshot = page.screenshot()
-        screenshot_img = Image.open(io.BytesIO(screenshot))
-        screenshot_cv = cv2.cvtColor(np.array(screenshot_img), cv2.COLOR_RGB2BGR)
-
-        # 截取底部区域，高度至少要大于模板图片高度
-        height = screenshot_cv.shape[0]
-        crop_height = max(200, template_height + 50)  # 至少200px或模板高度+50px
-        screenshot_cv = screenshot_cv[height-crop_height:height, :]
-
-        # 确保截图区域大于模板图片
-        if screenshot_cv.shape[0] < template_height or screenshot_cv.shape[1] < template_width:
-            print(f"截图区域 ({screenshot_cv.shape[1]}x{screenshot_cv.shape[0]}) 小于模板图片 ({template_width}x{template_height})")
-            return False
-
-        # 模板匹配
-        result = cv2.matchTemplate(screenshot_cv, template, cv2.TM_CCOEFF_NORMED)
-        min_val, max_val, min_loc, max_loc = cv2.minMaxLoc(result)
-
-        if max_val >= threshold:
-            return True
-        return False
+        detector = _single_detectors.get(template_path)
+        if detector is None:
+            detector = TemplateDetector(grayscale=False)
+            if not detector.add_template("template", template_path, threshold):
+                return False
+            _single_detectors[template_path] = detector
+        detector.templates["template"]["threshold"] = threshold
+        return detector.detect(page)["template"]["found"]
     except Exception as e:
         print(f"图片匹配错误: {e}")
         return False
@@ -74,12 +54,43 @@ def stop_screen_recording():
         print(f"结束录屏失败: {e}")
         return False
 
-def monitor_clear_mode(page, stop_event):
+def on_episode_change(episode, previous):
+    """集数变化（页面推送）时登记清屏计数"""
+    print(f"[{time.strftime('%H:%M:%S')}] 当前第{episode}集")
+    if episode not in clear_screen_counter:
+        clear_screen_counter[episode] = 0
+
+def pause(page, seconds, source=None):
+    """等待；使用 screencast 时用 Playwright 等待，让 CDP 帧事件得以派发"""
+    if source is not None:
+        page.wait_for_timeout(seconds * 1000)
+    else:
+        time.sleep(seconds)
+
+def monitor_clear_mode(page, stop_event, use_screencast=True):
     """
     Periodically checks if 'Clear Mode' (清屏) is enabled.
     If not (i.e., '清屏' button is visible), clicks it to enable.
     """
     print("Auto-Clear Mode Monitor started. Press Ctrl+C to stop script (Browser will stay open).")
+    # 模板只加载一次；每轮一张底部截图同时匹配两个按钮状态
+    detector = make_clear_detector(CLEAR_BUTTON_ON, CLEAR_BUTTON_OFF, threshold=0.95)
+    # 画面没变时跳过匹配，按钮优先在上次位置附近找
+    matcher = IncrementalMatcher(detector)
+    # 帧源：Chromium 推送底部区域的画面，检测时直接读最新帧；失败则退回截图
+    source = None
+    if use_screencast:
+        try:
+            source = ScreencastFrameSource(page, region=detector.region(page), max_fps=2).start()
+        except Exception as e:
+            print(f"Screencast 启动失败，改用截图: {e}")
+            source = None
+    # 集数由页面内 MutationObserver 推送，不再轮询整页文本
+    tracker = EpisodeTracker(page, on_change=on_episode_change)
+    try:
+        tracker.install()
+    except Exception as e:
+        print(f"集数跟踪启动失败: {e}")
     iteration = 0
     while not stop_event.is_set():
         iteration += 1
@@ -90,8 +101,11 @@ def monitor_clear_mode(page, stop_event):
 
             # Check 1: 使用图片匹配检测"清屏"按钮状态
             print(f"[{time.strftime('%H:%M:%S')}] 检测清屏状态...")
-            button_on_found = find_image_on_screen(page, CLEAR_BUTTON_ON, threshold=0.95)
-            button_off_found = find_image_on_screen(page, CLEAR_BUTTON_OFF, threshold=0.95)
+            matches = matcher.detect(page, source)
+            if iteration % 60 == 0:
+                matcher.report()
+            button_on_found = matches.get("on", {}).get("found", False)
+            button_off_found = matches.get("off", {}).get("found", False)
 
             if button_on_found and not button_off_found:
                 # 清屏按钮已打开，已经在清屏模式
@@ -101,17 +115,9 @@ def monitor_clear_mode(page, stop_event):
                 is_cluttered = True
                 clutter_reason = "Found '清屏' button (OFF) in screenshot"
 
-                # 尝试提取集数信息
-                import re
-                page_text = page.evaluate("() => document.body.innerText")
-                episode_match = re.search(r'第(\d+)集', page_text)
-                if episode_match:
-                    episode_num = int(episode_match.group(1))
+                episode_num = tracker.episode
+                if episode_num is not None:
                     print(f"[{time.strftime('%H:%M:%S')}] 第{episode_num}集 - 需要清屏")
-
-                    # 记录清屏次数
-                    if episode_num not in clear_screen_counter:
-                        clear_screen_counter[episode_num] = 0
             elif button_on_found and button_off_found:
                 # 两个都匹配到了，说明阈值太低，优先认为是打开状态
                 is_cluttered = False
@@ -121,7 +127,7 @@ def monitor_clear_mode(page, stop_event):
 
             if not is_cluttered:
                 # If no clutter is visible, we are likely already in Clear Mode.
-                time.sleep(1)
+                pause(page, 1, source)
                 continue
 
             # ACTION: If clutter is detected, press 'J' to toggle Clear Mode
@@ -132,12 +138,9 @@ def monitor_clear_mode(page, stop_event):
                     page.keyboard.press("j")
                     print("Sent 'J' key.")
 
-                    # 获取当前集数并增加清屏计数
-                    import re
-                    page_text = page.evaluate("() => document.body.innerText")
-                    episode_match = re.search(r'第(\d+)集', page_text)
-                    if episode_match:
-                        episode_num = int(episode_match.group(1))
+                    # 当前集数增加清屏计数
+                    episode_num = tracker.episode
+                    if episode_num is not None:
                         if episode_num not in clear_screen_counter:
                             clear_screen_counter[episode_num] = 0
                         clear_screen_counter[episode_num] += 1
@@ -150,7 +153,7 @@ def monitor_clear_mode(page, stop_event):
                             stop_screen_recording()
 
                     # Wait for UI to update
-                    time.sleep(3)
+                    pause(page, 3, source)
                 except Exception as e:
                     print(f"Failed to send 'J' key: {e}")
 
@@ -166,7 +169,11 @@ def monitor_clear_mode(page, stop_event):
                 print("页面已关闭或失效。等待重试...")
                 time.sleep(2)
 
-        time.sleep(1)
+        pause(page, 1, source)
+
+    matcher.report()
+    if source is not None:
+        source.stop()
 
 def open_douyin_landscape():
     # Create user data directory if not exists
@@ -194,19 +201,14 @@ def open_douyin_landscape():
                 page.goto("https://www.douyin.com")
 
             # 3. Start Monitoring
+            # 同步 Playwright 对象只能在创建它的线程使用，所以监控直接跑在主线程；
+            # 多标签页并发监控见 douyin_monitor.py
             stop_event = threading.Event()
-            monitor_thread = threading.Thread(target=monitor_clear_mode, args=(page, stop_event))
-            monitor_thread.daemon = True
-            monitor_thread.start()
-
-            # Keep script running until user interrupts
             try:
-                while True:
-                    time.sleep(1)
+                monitor_clear_mode(page, stop_event)
             except KeyboardInterrupt:
                 print("\n[退出] 脚本已停止，浏览器保持打开状态")
                 stop_event.set()
-                monitor_thread.join(timeout=2)
                 print("浏览器已保持打开，可以继续使用")
                 return
 
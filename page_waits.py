@@ -0,0 +1,62 @@
+# Per-stage timeouts in milliseconds
+WAIT_TIMEOUTS = {
+    "video_ready": 10000,   # first video element has a src and metadata
+    "src_change": 15000,    # next episode's video replaced the previous src
+}
+
+# Resolves with the active video's src as soon as it differs from `previous`
+# and the element has metadata (readyState >= HAVE_METADATA), or null on
+# timeout. Driven by a MutationObserver on src/child changes plus captured
+# loadedmetadata events, so there is no polling.
+WAIT_FOR_VIDEO_JS = """
+({previous, timeout}) => new Promise((resolve) => {
+    const current = () => {
+        const video = document.querySelector('video');
+        if (!video) return null;
+        let src = video.getAttribute('src');
+        if (!src) {
+            const source = video.querySelector('source');
+            src = source ? source.getAttribute('src') : null;
+        }
+        return src && src !== previous && video.readyState >= 1 ? src : null;
+    };
+    let observer = null;
+    let timer = null;
+    const done = (value) => {
+        if (observer) observer.disconnect();
+        document.removeEventListener('loadedmetadata', check, true);
+        clearTimeout(timer);
+        resolve(value);
+    };
+    const check = () => {
+        const src = current();
+        if (src) done(src);
+    };
+    observer = new MutationObserver(check);
+    observer.observe(document.documentElement, {
+        subtree: true, childList: true, attributes: true, attributeFilter: ['src']
+    });
+    // Media events don't bubble, but they can be caught in the capture phase
+    document.addEventListener('loadedmetadata', check, true);
+    timer = setTimeout(() => done(null), timeout);
+    check();
+})
+"""
+
+def wait_for_video(page, previous_src=None, timeout=None):
+    """
+    Wait until the first <video> has a src different from previous_src and
+    its metadata is loaded. Returns the new src, or None on timeout.
+    """
+    if timeout is None:
+        stage = "src_change" if previous_src else "video_ready"
+        timeout = WAIT_TIMEOUTS[stage]
+    return page.evaluate(WAIT_FOR_VIDEO_JS, {"previous": previous_src, "timeout": timeout})
+
+def wait_for_video_ready(page, timeout=None):
+    """Wait for any video with a src and metadata"""
+    return wait_for_video(page, None, timeout if timeout is not None else WAIT_TIMEOUTS["video_ready"])
+
+def wait_for_video_change(page, previous_src, timeout=None):
+    """Wait for the next episode's video to replace previous_src"""
+    return wait_for_video(page, previous_src, timeout if timeout is not None else WAIT_TIMEOUTS["src_change"])
@@ -0,0 +1,183 @@
+import time
+import random
+import threading
+import requests
+
+from crawl_metrics import metrics
+
+# Outcome kinds reported to the controller
+OK, THROTTLED, SERVER_ERROR, TIMEOUT, ERROR = "ok", "throttled", "server_error", "timeout", "error"
+THROTTLE_STATUSES = {403, 429}
+
+class TransientError(IOError):
+    """A transfer that stopped short (connection dropped mid-body); worth retrying"""
+
+def classify(exc):
+    """(kind, retryable, retry_after seconds or None) for a failed request"""
+    if isinstance(exc, requests.HTTPError) and exc.response is not None:
+        status = exc.response.status_code
+        retry_after = exc.response.headers.get('Retry-After', '')
+        retry_after = float(retry_after) if retry_after.replace('.', '', 1).isdigit() else None
+        if status in THROTTLE_STATUSES:
+            return THROTTLED, True, retry_after
+        if status >= 500:
+            return SERVER_ERROR, True, retry_after
+        return ERROR, False, None
+    if isinstance(exc, requests.Timeout):
+        return TIMEOUT, True, None
+    if isinstance(exc, (requests.ConnectionError, requests.exceptions.ChunkedEncodingError)):
+        return TIMEOUT, True, None
+    if isinstance(exc, TransientError):
+        return ERROR, True, None
+    return ERROR, False, None
+
+class TokenBucket:
+    """Bandwidth cap in bytes/s; rate 0 means unlimited"""
+    def __init__(self, rate=0, burst=None):
+        self.lock = threading.Lock()
+        self.configure(rate, burst)
+
+    def configure(self, rate=0, burst=None):
+        with self.lock:
+            self.rate = rate
+            self.capacity = burst or max(rate, 256 * 1024)
+            self.tokens = self.capacity
+            self.updated = time.monotonic()
+
+    def consume(self, n):
+        """Take n bytes worth of tokens, sleeping until they are available"""
+        if not self.rate:
+            return
+        with self.lock:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            # Going negative reserves the bytes; the caller sleeps off the debt
+            self.tokens -= n
+            wait = -self.tokens / self.rate if self.tokens < 0 else 0
+        if wait:
+            time.sleep(wait)
+
+class RateController:
+    """
+    Shared by every download path: limits concurrent HTTP requests with
+    AIMD-style adaptive concurrency, caps bandwidth with a token bucket and
+    retries transient failures with jittered exponential backoff.
+
+    Each window of completed requests is judged on its throttle / error /
+    timeout rate and its throughput (bytes counted by throttle()). A 403 or
+    429 halves the limit at once; an error-heavy window halves it too; a
+    clean window whose throughput kept up with the best seen so far raises
+    it by one. When more concurrency stops adding throughput the limit holds.
+    """
+    def __init__(self, initial=4, min_concurrency=1, max_concurrency=8, bandwidth=0, retries=3, backoff_base=0.5, backoff_cap=30):
+        self.cond = threading.Condition()
+        self.bucket = TokenBucket()
+        self.active = 0
+        self.configure(initial, min_concurrency, max_concurrency, bandwidth, retries, backoff_base, backoff_cap)
+
+    def configure(self, initial=4, min_concurrency=1, max_concurrency=8, bandwidth=0, retries=3, backoff_base=0.5, backoff_cap=30):
+        with self.cond:
+            self.min_concurrency = min_concurrency
+            self.max_concurrency = max_concurrency
+            self.limit = float(max(min_concurrency, min(initial, max_concurrency)))
+            self.retries = retries
+            self.backoff_base = backoff_base
+            self.backoff_cap = backoff_cap
+            self.best_throughput = 0.0
+            self.last_decrease = 0.0
+            self._reset_window()
+            self.cond.notify_all()
+        self.bucket.configure(bandwidth)
+
+    def _reset_window(self):
+        self.window_started = time.monotonic()
+        self.window_bytes = 0
+        self.window = {OK: 0, THROTTLED: 0, SERVER_ERROR: 0, TIMEOUT: 0, ERROR: 0}
+
+    def acquire(self):
+        with self.cond:
+            while self.active >= int(self.limit):
+                self.cond.wait()
+            self.active += 1
+
+    def release(self):
+        with self.cond:
+            self.active -= 1
+            self.cond.notify()
+
+    def throttle(self, nbytes):
+        """Account for nbytes received and wait out the bandwidth cap"""
+        with self.cond:
+            self.window_bytes += nbytes
+        self.bucket.consume(nbytes)
+
+    def backoff(self, attempt, retry_after=None):
+        """Sleep before retry number attempt (0-based): full jitter, or the server's Retry-After"""
+        delay = random.uniform(0, min(self.backoff_cap, self.backoff_base * (2 ** attempt)))
+        if retry_after is not None:
+            delay = max(delay, min(retry_after, self.backoff_cap))
+        time.sleep(delay)
+        return delay
+
+    def record(self, kind):
+        """Feed one request outcome into the AIMD window"""
+        metrics.incr("crawl_http_outcomes_total", kind=kind)
+        with self.cond:
+            self.window[kind] += 1
+            now = time.monotonic()
+            if kind == THROTTLED:
+                # The CDN pushed back: back off right away (once per cooldown)
+                if now - self.last_decrease > 2:
+                    self._set_limit(self.limit / 2, "throttled")
+                    self.last_decrease = now
+                    self._reset_window()
+                return
+
+            done = sum(self.window.values())
+            if done < max(4, int(self.limit)):
+                return
+            elapsed = max(now - self.window_started, 1e-6)
+            throughput = self.window_bytes / elapsed
+            failures = self.window[SERVER_ERROR] + self.window[TIMEOUT] + self.window[ERROR]
+            if failures > 1 and failures / done > 0.2:
+                self._set_limit(self.limit / 2, f"{failures}/{done} failed")
+                self.last_decrease = now
+            elif throughput >= self.best_throughput * 0.9:
+                self._set_limit(self.limit + 1, f"{throughput / 1024 / 1024:.2f} MB/s")
+            # Let an old peak fade so the limit can climb again when conditions improve
+            self.best_throughput = max(throughput, self.best_throughput * 0.95)
+            self._reset_window()
+
+    def _set_limit(self, limit, reason):
+        old = int(self.limit)
+        self.limit = float(max(self.min_concurrency, min(self.max_concurrency, limit)))
+        if int(self.limit) != old:
+            print(f"  🚦 Download concurrency {old} → {int(self.limit)} ({reason})")
+            metrics.incr("crawl_concurrency_changes_total", direction="up" if self.limit > old else "down")
+        self.cond.notify_all()
+
+    def call(self, func, *args, **kwargs):
+        """Run one HTTP request function in a concurrency slot, retrying transient failures"""
+        attempt = 0
+        while True:
+            self.acquire()
+            try:
+                result = func(*args, **kwargs)
+            except Exception as e:
+                kind, retryable, retry_after = classify(e)
+                self.record(kind)
+                if not retryable or attempt >= self.retries:
+                    raise
+            else:
+                self.record(OK)
+                return result
+            finally:
+                self.release()
+            metrics.incr("crawl_retries_total", method=kind)
+            delay = self.backoff(attempt, retry_after)
+            print(f"  🔄 {kind}, retry {attempt + 1}/{self.retries} after {delay:.1f}s")
+            attempt += 1
+
+# Process-wide controller used by every download path
+rate = RateController()
@@ -0,0 +1,163 @@
+import os
+import re
+import hashlib
+import threading
+from video_downloader import DEFAULT_HEADERS, download_segment
+from rate_control import rate
+
+CONTENT_RANGE_RE = re.compile(r'bytes (\d+)-(\d+)/(\d+|\*)')
+
+def parse_content_range(value):
+    """'bytes 0-1023/4096' -> (0, 1023, 4096); total is None for '*'"""
+    m = CONTENT_RANGE_RE.match(value or '')
+    if not m:
+        return None
+    total = int(m.group(3)) if m.group(3) != '*' else None
+    return int(m.group(1)), int(m.group(2)), total
+
+def _count_progress(segment, n):
+    segment["done"] += n
+
+class MediaAssembly:
+    """
+    Reassembles one media file from the (possibly overlapping, out-of-order)
+    byte ranges the player fetched. Bytes go straight into a sparse .part
+    file; covered holds the merged [start, end) intervals.
+    """
+    def __init__(self, url, part_path, total_size=None):
+        self.url = url
+        self.part_path = part_path
+        self.total_size = total_size
+        self.covered = []
+        self.lock = threading.Lock()
+        with open(part_path, 'wb') as f:
+            if total_size:
+                f.truncate(total_size)
+
+    def add(self, start, data):
+        with self.lock:
+            with open(self.part_path, 'r+b') as f:
+                f.seek(start)
+                f.write(data)
+            self._cover(start, start + len(data))
+
+    def _cover(self, start, end):
+        intervals = sorted(self.covered + [[start, end]])
+        merged = []
+        for s, e in intervals:
+            if merged and s <= merged[-1][1]:
+                merged[-1][1] = max(merged[-1][1], e)
+            else:
+                merged.append([s, e])
+        self.covered = merged
+
+    def bytes_covered(self):
+        return sum(e - s for s, e in self.covered)
+
+    def missing_ranges(self):
+        """Inclusive byte ranges the player never fetched"""
+        missing = []
+        pos = 0
+        for s, e in self.covered:
+            if s > pos:
+                missing.append((pos, s - 1))
+            pos = max(pos, e)
+        if self.total_size and pos < self.total_size:
+            missing.append((pos, self.total_size - 1))
+        return missing
+
+class ResponseTee:
+    """
+    Saves the video bytes the browser's player is already pulling instead of
+    downloading them a second time.
+
+    Call on_response() from the page's "response" hook. take() turns the
+    assembly for a URL into output_path, fetching only the ranges the player
+    skipped with Range requests.
+    """
+    def __init__(self, tee_dir, headers=None):
+        self.tee_dir = tee_dir
+        self.headers = headers or DEFAULT_HEADERS
+        self.assemblies = {}
+        self.taken = set()
+        self.lock = threading.Lock()
+        self.bytes_teed = 0
+        if not os.path.exists(tee_dir):
+            os.makedirs(tee_dir)
+
+    def on_response(self, response):
+        """Capture a 200/206 video response body; returns True if it was teed"""
+        url = response.url
+        if response.status == 206:
+            parsed = parse_content_range(response.headers.get('content-range'))
+            if not parsed:
+                return False
+            start, end, total = parsed
+        elif response.status == 200:
+            start, end, total = 0, None, None
+        else:
+            return False
+
+        with self.lock:
+            if url in self.taken:
+                return False
+
+        body = response.body()
+        if not body:
+            return False
+        if total is None and response.status == 200:
+            total = len(body)
+
+        with self.lock:
+            assembly = self.assemblies.get(url)
+            if assembly is None:
+                name = hashlib.sha1(url.encode('utf-8')).hexdigest()[:16]
+                assembly = MediaAssembly(url, os.path.join(self.tee_dir, name + ".part"), total)
+                self.assemblies[url] = assembly
+            elif assembly.total_size is None and total:
+                assembly.total_size = total
+            self.bytes_teed += len(body)
+        assembly.add(start, body)
+        return True
+
+    def has(self, url):
+        with self.lock:
+            return url in self.assemblies
+
+    def take(self, url, output_path, timeout=30):
+        """
+        Finish the assembly for url into output_path.
+        Returns False when nothing was teed for url (caller should download it).
+        """
+        with self.lock:
+            assembly = self.assemblies.pop(url, None)
+            self.taken.add(url)
+        if assembly is None or not assembly.total_size:
+            if assembly:
+                os.remove(assembly.part_path)
+            return False
+
+        with assembly.lock:
+            missing = assembly.missing_ranges()
+            teed = assembly.bytes_covered()
+        print(f"  🪝 Reusing {teed / 1024 / 1024:.2f} MB from the player, fetching {len(missing)} missing range(s)")
+        try:
+            for start, end in missing:
+                segment = {"start": start, "end": end, "done": 0}
+                # Shares the concurrency limit and retries with every other download
+                rate.call(download_segment, url, self.headers, assembly.part_path, segment, _count_progress, timeout)
+        except Exception:
+            os.remove(assembly.part_path)
+            raise
+
+        os.replace(assembly.part_path, output_path)
+        return True
+
+    def discard_all(self):
+        """Drop assemblies that were never claimed (e.g. prefetch of unvisited episodes)"""
+        with self.lock:
+            assemblies = list(self.assemblies.values())
+            self.assemblies.clear()
+        for assembly in assemblies:
+            if os.path.exists(assembly.part_path):
+                os.remove(assembly.part_path)
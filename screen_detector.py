@@ -0,0 +1,296 @@
+# -*- coding: utf-8 -*-
+import os
+import time
+import cv2
+import numpy as np
+
+class TemplateDetector:
+    """
+    模板检测器：模板只读取一次并缓存（彩色 + 灰度），每次检测只截取页面底部
+    区域的一张图，所有已注册的模板都在这一帧上匹配，一次返回全部分数和位置。
+    """
+    def __init__(self, region_height=200, grayscale=True):
+        self.region_height = region_height  # 底部区域高度（截图像素）
+        self.grayscale = grayscale
+        self.templates = {}  # name -> {"path", "color", "gray", "threshold"}
+        self.viewport = None
+        self.scale = None
+
+    def add_template(self, name, path, threshold=0.8):
+        """注册模板；读取失败返回 False"""
+        image = cv2.imread(path, cv2.IMREAD_COLOR)
+        if image is None:
+            print(f"无法读取模板图片: {path}")
+            return False
+        self.templates[name] = {
+            "path": path,
+            "color": image,
+            "gray": cv2.cvtColor(image, cv2.COLOR_BGR2GRAY),
+            "threshold": threshold,
+        }
+        return True
+
+    def crop_height(self):
+        """截图像素高度：至少 region_height，且比最高的模板高 50px"""
+        tallest = max((t["color"].shape[0] for t in self.templates.values()), default=0)
+        return max(self.region_height, tallest + 50)
+
+    def region(self, page):
+        """底部区域的 clip（CSS 像素）；视口和缩放比只查询一次"""
+        if self.viewport is None:
+            self.viewport = page.viewport_size or page.evaluate("() => ({width: window.innerWidth, height: window.innerHeight})")
+            self.scale = page.evaluate("() => window.devicePixelRatio") or 1
+        return self.clip_for(self.viewport, self.scale)
+
+    def clip_for(self, viewport, scale):
+        """给定视口（CSS 像素）和缩放比时的底部区域 clip，供多页面各自计算"""
+        height = min(self.crop_height() / scale, viewport["height"])
+        return {"x": 0, "y": viewport["height"] - height, "width": viewport["width"], "height": height}
+
+    def decode(self, data):
+        """截图字节直接解码为 BGR 数组（不经过 PIL）"""
+        return cv2.imdecode(np.frombuffer(data, np.uint8), cv2.IMREAD_COLOR)
+
+    def capture(self, page):
+        """截取底部区域，返回 (BGR 帧, clip)"""
+        clip = self.region(page)
+        return self.decode(page.screenshot(clip=clip)), clip
+
+    def prepare(self, frame):
+        """匹配用的图像（灰度或彩色）"""
+        return cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY) if self.grayscale else frame
+
+    def pattern(self, name):
+        template = self.templates[name]
+        return template["gray"] if self.grayscale else template["color"]
+
+    def search(self, image, pattern):
+        """一次 matchTemplate，返回 (分数, x, y)；图像比模板小时返回 (0.0, None, None)"""
+        h, w = pattern.shape[:2]
+        if image.shape[0] < h or image.shape[1] < w:
+            return 0.0, None, None
+        _, score, _, (x, y) = cv2.minMaxLoc(cv2.matchTemplate(image, pattern, cv2.TM_CCOEFF_NORMED))
+        return float(score), x, y
+
+    def to_page(self, x, y, clip=None, scale=None):
+        """帧像素坐标换算为页面 CSS 坐标（无 clip 时原样返回）"""
+        if x is None or clip is None:
+            return None if x is None else (x, y)
+        scale = scale or self.scale or 1
+        return (clip["x"] + x / scale, clip["y"] + y / scale)
+
+    def match(self, frame, clip=None, scale=None):
+        """
+        在一帧上匹配全部模板。返回 {name: {"found", "score", "location", "size"}}，
+        location 为匹配区域左上角（有 clip 时换算为页面 CSS 坐标）。
+        scale 为每 CSS 像素对应的帧像素数，默认为 devicePixelRatio。
+        """
+        results = {}
+        if frame is None:
+            return results
+        image = self.prepare(frame)
+        for name, template in self.templates.items():
+            pattern = self.pattern(name)
+            h, w = pattern.shape[:2]
+            score, x, y = self.search(image, pattern)
+            results[name] = {
+                "found": x is not None and score >= template["threshold"],
+                "score": score,
+                "location": self.to_page(x, y, clip, scale),
+                "size": (w, h),
+            }
+        return results
+
+    def detect(self, page, source=None):
+        """
+        全部模板匹配一帧：有帧源（如 ScreencastFrameSource）时用其最新帧，
+        否则（或帧源还没有帧时）截图一次
+        """
+        if source is not None:
+            frame, clip, scale = source.latest()
+            if frame is not None:
+                return self.match(frame, clip, scale)
+        frame, clip = self.capture(page)
+        return self.match(frame, clip)
+
+class IncrementalMatcher:
+    """
+    增量匹配：包装 TemplateDetector，尽量不做整条区域的 matchTemplate。
+    1. 帧变化门控：帧缩成小灰度缩略图（每格是原图一小块的均值，可滤掉 JPEG
+       噪点），和上次匹配时的帧逐格比较，最大差值低于 diff_threshold 时直接
+       返回上次结果，不做任何匹配；
+    2. ROI 跟踪：记住每个模板上次的位置，先在其周围 margin 像素的小窗口里找；
+    3. 找不到时退回整条区域，再找不到（按钮移动或页面缩放变了）就按 scales
+       逐级缩放模板做金字塔搜索（总会包含原始比例 1.0，缩放恢复后能找回），
+       命中的缩放比之后一直沿用。
+    stats() / report() 给出各级命中次数、命中率和匹配耗时。
+    """
+    def __init__(self, detector, diff_threshold=8, margin=24, scales=(0.75, 0.9, 1.1, 1.25, 1.5), thumb_size=(128, 32)):
+        self.detector = detector
+        self.diff_threshold = diff_threshold
+        self.margin = margin
+        self.scales = scales
+        self.thumb_size = thumb_size
+        self.scale = 1.0        # 当前模板缩放比（页面缩放变化时由金字塔搜索更新）
+        self.tracks = {}        # name -> 上次命中位置 (x, y)，帧像素
+        self.scaled = {}        # (name, scale) -> 缩放后的模板
+        self.thumb = None
+        self.last_shape = None
+        self.last_results = None
+        self.counters = {"frames": 0, "unchanged": 0, "roi_hits": 0, "full_hits": 0, "pyramid_hits": 0, "misses": 0}
+        self.match_seconds = 0.0
+        self.max_match_seconds = 0.0
+
+    def region(self, page):
+        return self.detector.region(page)
+
+    def changed(self, frame):
+        """
+        和上次匹配时的帧相比是否有变化（缩略图逐格最大差值）。参考缩略图只在
+        判定为变化（随后会匹配）时更新，所以多帧累积的缓慢变化也会触发匹配
+        """
+        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY) if frame.ndim == 3 else frame
+        thumb = cv2.resize(gray, self.thumb_size, interpolation=cv2.INTER_AREA)
+        if self.thumb is not None and self.last_shape == frame.shape:
+            if int(cv2.absdiff(thumb, self.thumb).max()) < self.diff_threshold:
+                return False
+        self.thumb, self.last_shape = thumb, frame.shape
+        return True
+
+    def pattern(self, name, scale):
+        """按 scale 缩放后的模板（缓存）"""
+        key = (name, scale)
+        if key not in self.scaled:
+            base = self.detector.pattern(name)
+            if scale == 1.0:
+                self.scaled[key] = base
+            else:
+                h, w = base.shape[:2]
+                size = (max(1, round(w * scale)), max(1, round(h * scale)))
+                interpolation = cv2.INTER_AREA if scale < 1 else cv2.INTER_LINEAR
+                self.scaled[key] = cv2.resize(base, size, interpolation=interpolation)
+        return self.scaled[key]
+
+    def search_window(self, image, pattern, location):
+        """只在上次位置周围 margin 像素的窗口里搜索"""
+        h, w = pattern.shape[:2]
+        x, y = location
+        x0, y0 = max(0, x - self.margin), max(0, y - self.margin)
+        x1, y1 = min(image.shape[1], x + w + self.margin), min(image.shape[0], y + h + self.margin)
+        score, wx, wy = self.detector.search(image[y0:y1, x0:x1], pattern)
+        if wx is None:
+            return 0.0, None, None
+        return score, x0 + wx, y0 + wy
+
+    def match(self, frame, clip=None, scale=None):
+        """与 TemplateDetector.match 返回格式相同；画面没变时直接返回上次结果"""
+        if frame is None:
+            return {}
+        self.counters["frames"] += 1
+        if not self.changed(frame) and self.last_results is not None:
+            self.counters["unchanged"] += 1
+            return self.last_results
+
+        started = time.perf_counter()
+        image = self.detector.prepare(frame)
+        hits = {}  # name -> (score, x, y, 模板尺寸)
+        scores = {}
+
+        # 1. 上次位置附近的小窗口
+        for name, template in self.detector.templates.items():
+            if name not in self.tracks:
+                continue
+            pattern = self.pattern(name, self.scale)
+            score, x, y = self.search_window(image, pattern, self.tracks[name])
+            scores[name] = score
+            if x is not None and score >= template["threshold"]:
+                hits[name] = (score, x, y, pattern.shape[1::-1])
+                self.counters["roi_hits"] += 1
+
+        # 2. 整条区域（当前缩放比）
+        for name, template in self.detector.templates.items():
+            if name in hits:
+                continue
+            pattern = self.pattern(name, self.scale)
+            score, x, y = self.detector.search(image, pattern)
+            scores[name] = max(score, scores.get(name, 0.0))
+            if x is not None and score >= template["threshold"]:
+                hits[name] = (score, x, y, pattern.shape[1::-1])
+                self.counters["full_hits"] += 1
+
+        # 3. 当前缩放比下一个模板都没找到：多尺度金字塔，找到的缩放比之后沿用
+        if not hits:
+            # 原始比例总在候选里，页面缩放恢复后才能回到 1.0
+            for s in dict.fromkeys((1.0,) + tuple(self.scales)):
+                if s == self.scale:
+                    continue
+                found = {}
+                for name, template in self.detector.templates.items():
+                    pattern = self.pattern(name, s)
+                    score, x, y = self.detector.search(image, pattern)
+                    scores[name] = max(score, scores.get(name, 0.0))
+                    if x is not None and score >= template["threshold"]:
+                        found[name] = (score, x, y, pattern.shape[1::-1])
+                if found:
+                    print(f"模板缩放比 {self.scale} → {s}")
+                    self.scale = s
+                    self.tracks.clear()
+                    hits = found
+                    self.counters["pyramid_hits"] += len(found)
+                    break
+
+        results = {}
+        for name in self.detector.templates:
+            if name in hits:
+                score, x, y, size = hits[name]
+                self.tracks[name] = (x, y)
+                results[name] = {"found": True, "score": score, "location": self.detector.to_page(x, y, clip, scale), "size": size}
+            else:
+                self.counters["misses"] += 1
+                results[name] = {"found": False, "score": scores.get(name, 0.0), "location": None, "size": self.pattern(name, self.scale).shape[1::-1]}
+
+        elapsed = time.perf_counter() - started
+        self.match_seconds += elapsed
+        self.max_match_seconds = max(self.max_match_seconds, elapsed)
+        self.last_results = results
+        return results
+
+    def detect(self, page, source=None):
+        """同 TemplateDetector.detect：优先用帧源的最新帧，否则截图"""
+        if source is not None:
+            frame, clip, scale = source.latest()
+            if frame is not None:
+                return self.match(frame, clip, scale)
+        frame, clip = self.detector.capture(page)
+        return self.match(frame, clip)
+
+    def stats(self):
+        c = dict(self.counters)
+        matched = c["frames"] - c["unchanged"]
+        lookups = c["roi_hits"] + c["full_hits"] + c["pyramid_hits"] + c["misses"]
+        c["skip_rate"] = c["unchanged"] / c["frames"] if c["frames"] else 0.0
+        c["roi_hit_rate"] = c["roi_hits"] / lookups if lookups else 0.0
+        c["hit_rate"] = (lookups - c["misses"]) / lookups if lookups else 0.0
+        c["avg_match_ms"] = self.match_seconds / matched * 1000 if matched else 0.0
+        c["max_match_ms"] = self.max_match_seconds * 1000
+        c["scale"] = self.scale
+        return c
+
+    def report(self):
+        s = self.stats()
+        print(f"匹配统计: {s['frames']} 帧，{s['unchanged']} 帧未变化跳过 ({s['skip_rate']:.0%})，"
+              f"小窗口命中 {s['roi_hits']}，整条命中 {s['full_hits']}，金字塔命中 {s['pyramid_hits']}，未命中 {s['misses']}，"
+              f"平均 {s['avg_match_ms']:.1f}ms，最长 {s['max_match_ms']:.1f}ms")
+
+def make_clear_detector(button_on_path, button_off_path, threshold=0.95):
+    """
+    清屏按钮检测器：模板 "on"（已清屏）和 "off"（未清屏）。
+    两个按钮主要靠颜色区分，阈值 0.95 是按彩色匹配定的，所以不用灰度
+    """
+    detector = TemplateDetector(grayscale=False)
+    for name, path in (("on", button_on_path), ("off", button_off_path)):
+        if os.path.exists(path):
+            detector.add_template(name, path, threshold)
+        else:
+            print(f"模板图片不存在: {path}")
+    return detector
@@ -0,0 +1,146 @@
+# -*- coding: utf-8 -*-
+import time
+import base64
+import asyncio
+import threading
+from collections import deque
+import cv2
+import numpy as np
+
+class ScreencastFrameSource:
+    """
+    基于 CDP Page.startScreencast 的帧源：Chromium 在画面变化时主动推送
+    JPEG/PNG 帧，解码后直接裁剪为配置的区域（CSS 像素），放入小环形缓冲区。
+    检测器用 latest() 读取最新帧，不再每次往返 page.screenshot()。
+
+    超过 max_fps 的帧只确认（ack）并暂存原始数据，latest() 发现它比缓冲区
+    更新时才解码，所以一串变化的最后一帧不会丢。同步 API 下 CDP 事件只在
+    Playwright 调用期间派发（如 page.wait_for_timeout）；异步 API 下随事件
+    循环自动派发。lazy=True 时所有帧都只暂存、在 latest() 里解码，这样解码
+    发生在调用 latest() 的线程（如匹配线程池），不占用事件循环。
+    """
+    def __init__(self, page, region=None, max_fps=5, format="jpeg", quality=90, buffer_size=3, lazy=False):
+        self.page = page
+        self.region = region      # {"x", "y", "width", "height"}，None 为整个视口
+        self.max_fps = max_fps
+        self.format = format      # "jpeg" 或 "png"（无损，编码更慢）
+        self.quality = quality
+        self.lazy = lazy
+        self.frames = deque(maxlen=buffer_size)  # (帧, clip, scale, 时间戳)
+        self.lock = threading.Lock()
+        self.session = None
+        self.last_accepted = 0.0
+        self.pending = None  # 被限速跳过的最新原始帧 (data, metadata, 时间戳)
+        self.received = 0
+        self.decoded = 0
+        self.skipped = 0
+
+    def _params(self):
+        params = {"format": self.format, "everyNthFrame": 1}
+        if self.format == "jpeg":
+            params["quality"] = self.quality
+        return params
+
+    def _send(self, method, params=None):
+        # 同步 CDPSession 直接返回结果；异步 CDPSession 返回协程，交给事件循环
+        result = self.session.send(method, params or {})
+        if asyncio.iscoroutine(result):
+            return asyncio.ensure_future(result)
+        return result
+
+    def start(self):
+        """创建 CDP 会话并开始推送（同步 API）"""
+        self.session = self.page.context.new_cdp_session(self.page)
+        self.session.on("Page.screencastFrame", self._on_frame)
+        self.session.send("Page.startScreencast", self._params())
+        return self
+
+    async def start_async(self):
+        """创建 CDP 会话并开始推送（异步 API）"""
+        self.session = await self.page.context.new_cdp_session(self.page)
+        self.session.on("Page.screencastFrame", self._on_frame)
+        await self.session.send("Page.startScreencast", self._params())
+        return self
+
+    def decode(self, data):
+        """base64 帧直接解码为 BGR 数组（不经过 PIL）"""
+        return cv2.imdecode(np.frombuffer(base64.b64decode(data), np.uint8), cv2.IMREAD_COLOR)
+
+    def crop(self, frame, metadata):
+        """按 region 裁剪；返回 (区域帧, clip, 每 CSS 像素对应的帧像素数)"""
+        device_width = metadata.get("deviceWidth") or frame.shape[1]
+        scale = frame.shape[1] / device_width
+        if not self.region:
+            return frame, {"x": 0, "y": 0, "width": device_width, "height": frame.shape[0] / scale}, scale
+        r = self.region
+        x0, y0 = int(r["x"] * scale), int(r["y"] * scale)
+        x1, y1 = int((r["x"] + r["width"]) * scale), int((r["y"] + r["height"]) * scale)
+        # copy() 让环形缓冲区只持有区域，而不是整帧
+        return frame[y0:y1, x0:x1].copy(), dict(r), scale
+
+    def _on_frame(self, params):
+        # 必须确认每一帧，否则 Chromium 停止推送
+        self._send("Page.screencastFrameAck", {"sessionId": params["sessionId"]})
+        self.received += 1
+        now = time.monotonic()
+        metadata = params.get("metadata") or {}
+        if self.max_fps and now - self.last_accepted < 1.0 / self.max_fps:
+            self.skipped += 1
+            with self.lock:
+                self.pending = (params["data"], metadata, now)
+            return
+        if self.lazy:
+            self.last_accepted = now
+            with self.lock:
+                self.pending = (params["data"], metadata, now)
+            return
+        self.last_accepted = now
+        self._store(params["data"], metadata, now)
+
+    def _store(self, data, metadata, received_at):
+        frame = self.decode(data)
+        if frame is None:
+            return
+        frame, clip, scale = self.crop(frame, metadata)
+        with self.lock:
+            self.decoded += 1
+            self.pending = None
+            self.frames.append((frame, clip, scale, received_at))
+
+    def latest(self, max_age=None):
+        """最新一帧 (帧, clip, scale)；没有或超过 max_age 秒时返回 (None, None, None)"""
+        with self.lock:
+            pending = self.pending
+            self.pending = None
+        if pending is not None:
+            self._store(*pending)
+        with self.lock:
+            if not self.frames:
+                return None, None, None
+            frame, clip, scale, received_at = self.frames[-1]
+        if max_age is not None and time.monotonic() - received_at > max_age:
+            return None, None, None
+        return frame, clip, scale
+
+    def stop(self):
+        if self.session is None:
+            return
+        try:
+            self.session.send("Page.stopScreencast")
+            self.session.detach()
+        except Exception:
+            pass
+        self.session = None
+
+    async def stop_async(self):
+        if self.session is None:
+            return
+        try:
+            await self.session.send("Page.stopScreencast")
+            await self.session.detach()
+        except Exception:
+            pass
+        self.session = None
+
+    def stats(self):
+        return {"received": self.received, "decoded": self.decoded, "skipped": self.skipped}
@@ -0,0 +1,200 @@
+import os
+import json
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from http_client import client, DEFAULT_HEADERS
+from rate_control import rate, TransientError
+
+CHUNK_SIZE = 64 * 1024
+SEGMENT_SIZE = 4 * 1024 * 1024        # bytes per Range segment
+MIN_SEGMENTED_SIZE = 8 * 1024 * 1024  # smaller files use one stream
+MAX_SEGMENT_WORKERS = 4
+
+class RangeNotSupported(Exception):
+    """Server ignored a Range header (answered 200 instead of 206)"""
+
+def part_paths(output_path):
+    """Return (.part file, sidecar progress map) for an output path"""
+    return output_path + ".part", output_path + ".part.json"
+
+def probe_size(url, headers, timeout=None, http=client):
+    """
+    Ask for the first byte to learn the total size and whether Range works.
+    Returns (total_size or None, supports_range)
+    """
+    probe_headers = dict(headers)
+    probe_headers['Range'] = 'bytes=0-0'
+    response = http.get(url, headers=probe_headers, stream=True, timeout=timeout)
+    try:
+        response.raise_for_status()
+        if response.status_code == 206:
+            # Drain the one byte so the keep-alive connection goes back to the pool
+            response.content
+            content_range = response.headers.get('Content-Range', '')
+            # Format: "bytes 0-0/12345"
+            if '/' in content_range:
+                total = content_range.rsplit('/', 1)[1].strip()
+                if total.isdigit():
+                    return int(total), True
+            return None, False
+        length = response.headers.get('Content-Length')
+        return (int(length) if length and length.isdigit() else None), False
+    finally:
+        response.close()
+
+def load_progress(progress_path, total_size):
+    """Load the sidecar progress map if it belongs to a download of the same size"""
+    if not os.path.exists(progress_path):
+        return None
+    try:
+        with open(progress_path, "r", encoding='utf-8') as f:
+            progress = json.load(f)
+        if progress.get("size") == total_size and progress.get("segments"):
+            return progress
+    except Exception:
+        pass
+    return None
+
+def save_progress(progress_path, progress):
+    """Write the progress map via a temp file so a crash never leaves it half-written"""
+    tmp_path = progress_path + ".tmp"
+    with open(tmp_path, "w", encoding='utf-8') as f:
+        json.dump(progress, f)
+    os.replace(tmp_path, progress_path)
+
+def plan_segments(total_size, segment_size=SEGMENT_SIZE):
+    """Split [0, total_size) into inclusive byte ranges"""
+    segments = []
+    start = 0
+    while start < total_size:
+        end = min(start + segment_size, total_size) - 1
+        segments.append({"start": start, "end": end, "done": 0})
+        start = end + 1
+    return segments
+
+def download_segment(url, headers, part_path, segment, on_progress, timeout=None, http=client):
+    """Fetch the remaining bytes of one segment into its slot in the .part file"""
+    offset = segment["start"] + segment["done"]
+    if offset > segment["end"]:
+        return
+    range_headers = dict(headers)
+    range_headers['Range'] = f'bytes={offset}-{segment["end"]}'
+    response = http.get(url, headers=range_headers, stream=True, timeout=timeout)
+    try:
+        response.raise_for_status()
+        if response.status_code != 206:
+            raise RangeNotSupported(f"Expected 206 for segment, got {response.status_code}")
+        content_range = response.headers.get('Content-Range', '')
+        if not content_range.startswith(f'bytes {offset}-'):
+            raise RangeNotSupported(f"Unexpected Content-Range: {content_range}")
+
+        with open(part_path, 'r+b') as f:
+            f.seek(offset)
+            for chunk in response.iter_content(chunk_size=CHUNK_SIZE):
+                if not chunk:
+                    continue
+                remaining = segment["end"] - (segment["start"] + segment["done"]) + 1
+                chunk = chunk[:remaining]
+                f.write(chunk)
+                on_progress(segment, len(chunk))
+                rate.throttle(len(chunk))
+                if len(chunk) == remaining:
+                    break
+
+        if segment["start"] + segment["done"] <= segment["end"]:
+            raise TransientError(f"Segment {segment['start']}-{segment['end']} ended early")
+    finally:
+        response.close()
+
+def download_segmented(url, output_path, total_size, headers, max_workers=MAX_SEGMENT_WORKERS, segment_size=SEGMENT_SIZE, timeout=None, http=client):
+    """Download with parallel Range segments, resuming from the sidecar map"""
+    part_path, progress_path = part_paths(output_path)
+
+    progress = load_progress(progress_path, total_size)
+    if progress and os.path.exists(part_path):
+        done = sum(s["done"] for s in progress["segments"])
+        print(f"  ↩️  Resuming {os.path.basename(output_path)} at {done / 1024 / 1024:.2f}/{total_size / 1024 / 1024:.2f} MB")
+    else:
+        progress = {"url": url, "size": total_size, "segments": plan_segments(total_size, segment_size)}
+        with open(part_path, 'wb') as f:
+            f.truncate(total_size)
+        save_progress(progress_path, progress)
+    progress["url"] = url
+
+    lock = threading.Lock()
+    unsaved = [0]
+
+    def on_progress(segment, n):
+        with lock:
+            segment["done"] += n
+            unsaved[0] += n
+            # Persist roughly every segment's worth of bytes
+            if unsaved[0] >= segment_size:
+                save_progress(progress_path, progress)
+                unsaved[0] = 0
+
+    pending = [s for s in progress["segments"] if s["start"] + s["done"] <= s["end"]]
+    try:
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            futures = [executor.submit(rate.call, download_segment, url, headers, part_path, s, on_progress, timeout, http) for s in pending]
+            for future in futures:
+                future.result()
+    finally:
+        with lock:
+            save_progress(progress_path, progress)
+
+    os.replace(part_path, output_path)
+    os.remove(progress_path)
+    return True
+
+def download_single_stream(url, output_path, headers, timeout=None, http=client):
+    """Plain streaming download into .part, renamed when complete"""
+    part_path, progress_path = part_paths(output_path)
+    response = http.get(url, headers=headers, stream=True, timeout=timeout)
+    try:
+        response.raise_for_status()
+        with open(part_path, 'wb') as f:
+            for chunk in response.iter_content(chunk_size=CHUNK_SIZE):
+                if chunk:
+                    f.write(chunk)
+                    rate.throttle(len(chunk))
+        expected = response.headers.get('Content-Length')
+        if expected and expected.isdigit() and os.path.getsize(part_path) != int(expected):
+            raise TransientError(f"Incomplete download: {os.path.getsize(part_path)}/{expected} bytes")
+    finally:
+        response.close()
+
+    os.replace(part_path, output_path)
+    if os.path.exists(progress_path):
+        os.remove(progress_path)
+    return True
+
+def download_file(url, output_path, headers=None, timeout=None, max_workers=MAX_SEGMENT_WORKERS, segment_size=SEGMENT_SIZE, http=client):
+    """
+    Download url to output_path.
+
+    Large files are split into parallel HTTP Range segments written into
+    <output>.part with a <output>.part.json progress map, so an interrupted
+    download resumes where it stopped. The .part file is renamed onto
+    output_path only once every byte has arrived. Servers that ignore Range
+    get a single stream instead.
+
+    Every request goes through rate_control.rate: adaptive concurrency,
+    the bandwidth cap and jittered retries (a retried segment continues
+    from the bytes it already has). http defaults to the shared pooled
+    http_client.client; timeout=None uses its configured timeouts.
+    """
+    headers = headers or DEFAULT_HEADERS
+
+    total_size, supports_range = rate.call(probe_size, url, headers, timeout, http)
+    if supports_range and total_size and total_size >= MIN_SEGMENTED_SIZE:
+        try:
+            return download_segmented(url, output_path, total_size, headers, max_workers, segment_size, timeout, http)
+        except RangeNotSupported as e:
+            print(f"  ⚠️  {e}, falling back to single stream")
+            part_path, progress_path = part_paths(output_path)
+            if os.path.exists(progress_path):
+                os.remove(progress_path)
+
+    return rate.call(download_single_stream, url, output_path, headers, timeout, http)